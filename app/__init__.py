@@ -5,8 +5,21 @@ from . import models
 
 from .extensions import db, migrate, jwt, cors
 from .scheduler import init_scheduler
+from .cli import register_cli
 
-def create_app():
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def create_app(with_scheduler: bool | None = None):
+    """
+    with_scheduler=None — по переменной SCHEDULER_ENABLED (по умолчанию включён).
+    В проде планировщик лучше запускать отдельным процессом (run_scheduler.py),
+    а в веб-процессах выставлять SCHEDULER_ENABLED=false.
+    """
     load_dotenv()
 
     app = Flask(__name__)
@@ -42,7 +55,12 @@ def create_app():
     from .api import api_bp
     app.register_blueprint(api_bp, url_prefix="/api/v1")
 
+    register_cli(app)
+
     # Планировщик фоновых задач (начисление баллов за оценки и финализация месяцев)
-    init_scheduler(app)
+    if with_scheduler is None:
+        with_scheduler = _env_flag("SCHEDULER_ENABLED", default=True)
+    if with_scheduler:
+        init_scheduler(app)
 
     return app
@@ -16,6 +16,17 @@ from ..models.forum import ForumTopic, ForumMessage
 from ..models.journal_points import JournalProcessedMark
 from ..services.month_rollover_service import sync_profile_to_calendar_month
 from ..services.notification_service import create_notification
+from ..services import journal_service
+from ..services.recommendation_cache import get_cache_stats
+from ..services.reference_catalog import get_reference_catalog, reference_response
+from ..services.student_search import SEARCH_MODES, search_filter, search_rank_order
+from ..services.team_builder import DEFAULT_TEAM_SIZE, build_teams
+from ..utils.pagination import (
+    apply_keyset,
+    decode_keyset_cursor,
+    encode_keyset_cursor,
+    keyset_pagination,
+)
 
 admins_bp = Blueprint("admins", __name__)
 
@@ -198,7 +209,9 @@ def get_students():
     Query params:
         - page: int (default 1) - номер страницы
         - per_page: int (default 20, max 100) - количество на странице
-        - search: str - поиск по email, имени, фамилии
+        - search: str - поиск по email, имени, фамилии, отчеству и группе
+          (регистр и «ё»/«е» не различаются; без sort_by — по релевантности)
+        - search_mode: str - contains (default) | prefix (по началу слов, для подсказок)
         - group: str - фильтр по группе
         - has_profile: bool - фильтр по заполненности профиля (имя и фамилия)
         - has_skills: bool - фильтр по наличию навыков
@@ -207,6 +220,9 @@ def get_students():
         - interest_id: int - фильтр по интересу
         - sort_by: str - поле сортировки (email, first_name, last_name, group_name, created_at)
         - sort_order: str - порядок сортировки (asc, desc)
+        - after: str (optional) - режим курсора вместо page: пустое значение — первая
+          страница, дальше pagination.next_after предыдущего ответа
+        - include_total: bool (default false) - считать total в режиме курсора
     """
     admin_user, error = require_admin()
     if error:
@@ -219,6 +235,9 @@ def get_students():
 
     # Параметры поиска и фильтров
     search = request.args.get("search", "", type=str).strip()
+    search_mode = request.args.get("search_mode", "contains", type=str)
+    if search_mode not in SEARCH_MODES:
+        return {"message": f"search_mode must be one of: {', '.join(SEARCH_MODES)}"}, 400
     group_filter = request.args.get("group", "", type=str).strip()
     has_profile = request.args.get("has_profile", type=str)
     has_skills = request.args.get("has_skills", type=str)
@@ -240,17 +259,10 @@ def get_students():
         .filter(User.is_active == True)
     )
 
-    # Поиск
-    if search:
-        search_pattern = f"%{search}%"
-        query = query.filter(
-            or_(
-                User.email.ilike(search_pattern),
-                StudentProfile.first_name.ilike(search_pattern),
-                StudentProfile.last_name.ilike(search_pattern),
-                StudentProfile.group_name.ilike(search_pattern),
-            )
-        )
+    # Поиск по нормализованной строке (индекс pg_trgm)
+    search_clause = search_filter(search, search_mode) if search else None
+    if search_clause is not None:
+        query = query.filter(search_clause)
 
     # Фильтр по группе
     if group_filter:
@@ -334,8 +346,39 @@ def get_students():
         "total_som": StudentProfile.total_som,
     }
     sort_column = sort_columns.get(sort_by, User.created_at)
+
+    after = request.args.get("after")
+    if after is not None:
+        sort_name = sort_by if sort_by in sort_columns else "created_at"
+        direction = "asc" if sort_order == "asc" else "desc"
+        keys = [(sort_name, sort_column, direction), ("id", User.id, direction)]
+        try:
+            values = decode_keyset_cursor(keys, after)[0] if after else None
+        except ValueError:
+            return {"message": "invalid cursor"}, 400
+        per_page = max(per_page, 1)
+        total = None
+        if request.args.get("include_total", "false").lower() == "true":
+            total = query.count()
+        results = _with_questionnaire_counts(
+            apply_keyset(query, keys, values)
+        ).limit(per_page + 1).all()
+        next_after = None
+        if len(results) > per_page:
+            results = results[:per_page]
+            last_user, last_profile = results[-1][:2]
+            owner = last_user if sort_name in ("email", "created_at") else last_profile
+            last_value = getattr(owner, sort_name) if owner is not None else None
+            next_after = encode_keyset_cursor(keys, [last_value, last_user.id])
+        return {
+            "students": [_serialize_student_row(*row) for row in results],
+            "pagination": keyset_pagination(per_page, next_after, total),
+        }, 200
     
-    if sort_order == "asc":
+    if search_clause is not None and "sort_by" not in request.args:
+        dialect_name = db.session.get_bind().dialect.name
+        query = query.order_by(*search_rank_order(search, dialect_name), User.created_at.desc())
+    elif sort_order == "asc":
         query = query.order_by(sort_column.asc().nullslast())
     else:
         query = query.order_by(sort_column.desc().nullsfirst())
@@ -345,44 +388,10 @@ def get_students():
     
     # Пагинация
     offset = (page - 1) * per_page
-    results = query.offset(offset).limit(per_page).all()
+    results = _with_questionnaire_counts(query).offset(offset).limit(per_page).all()
 
     # Формируем ответ
-    students = []
-    for user, profile in results:
-        # Подсчёт навыков, интересов, ролей
-        skills_count = 0
-        interests_count = 0
-        roles_count = 0
-        
-        if profile:
-            skills_count = db.session.query(func.count(StudentSkill.skill_id)).filter(
-                StudentSkill.student_id == profile.id
-            ).scalar() or 0
-            
-            interests_count = db.session.query(func.count(StudentInterest.interest_id)).filter(
-                StudentInterest.student_id == profile.id
-            ).scalar() or 0
-            
-            roles_count = db.session.query(func.count(StudentRole.role_id)).filter(
-                StudentRole.student_id == profile.id
-            ).scalar() or 0
-
-        students.append({
-            "id": profile.id if profile else None,
-            "user_id": user.id,
-            "email": user.email,
-            "first_name": profile.first_name if profile else None,
-            "last_name": profile.last_name if profile else None,
-            "group_name": profile.group_name if profile else None,
-            "created_at": user.created_at.isoformat() if user.created_at else None,
-            "skills_count": skills_count,
-            "interests_count": interests_count,
-            "roles_count": roles_count,
-            "total_points": profile.total_points if profile else 0,
-            "total_som": profile.total_som if profile else 0,
-            "is_verified": bool(profile.student_workflow_id) if profile else False,
-        })
+    students = [_serialize_student_row(*row) for row in results]
 
     total_pages = (total + per_page - 1) // per_page if total > 0 else 0
 
@@ -399,6 +408,53 @@ def get_students():
     }, 200
 
 
+def _questionnaire_count(column, student_id_column):
+    return (
+        db.select(func.count(column))
+        .where(student_id_column == StudentProfile.id)
+        .correlate(StudentProfile)
+        .scalar_subquery()
+    )
+
+
+def _with_questionnaire_counts(query):
+    """
+    Добавляет к строкам (User, StudentProfile) число навыков, интересов и ролей —
+    коррелированными подзапросами в том же SELECT, а не запросами на каждую строку.
+    Вызывать после query.count(), чтобы подсчёт total их не выполнял.
+    """
+    return query.add_columns(
+        _questionnaire_count(StudentSkill.skill_id, StudentSkill.student_id).label("skills_count"),
+        _questionnaire_count(StudentInterest.interest_id, StudentInterest.student_id).label("interests_count"),
+        _questionnaire_count(StudentRole.role_id, StudentRole.student_id).label("roles_count"),
+    )
+
+
+def _serialize_student_row(
+    user: User,
+    profile: StudentProfile | None,
+    skills_count: int | None,
+    interests_count: int | None,
+    roles_count: int | None,
+) -> dict:
+    """Строка списка студентов админки."""
+    return {
+        "id": profile.id if profile else None,
+        "user_id": user.id,
+        "email": user.email,
+        "first_name": profile.first_name if profile else None,
+        "last_name": profile.last_name if profile else None,
+        "group_name": profile.group_name if profile else None,
+        "created_at": user.created_at.isoformat() if user.created_at else None,
+        "skills_count": (skills_count or 0) if profile else 0,
+        "interests_count": (interests_count or 0) if profile else 0,
+        "roles_count": (roles_count or 0) if profile else 0,
+        "total_points": profile.total_points if profile else 0,
+        "total_som": profile.total_som if profile else 0,
+        "is_verified": bool(profile.student_workflow_id) if profile else False,
+    }
+
+
 @admins_bp.delete("/admins/students/<int:user_id>")
 @jwt_required()
 def delete_student(user_id: int):
@@ -490,26 +546,7 @@ def get_skills_for_filter():
     if error:
         return error
 
-    categories = (
-        db.session.query(SkillCategory)
-        .order_by(SkillCategory.name)
-        .all()
-    )
-
-    result = []
-    for cat in categories:
-        skills = (
-            db.session.query(Skill)
-            .filter(Skill.category_id == cat.id)
-            .order_by(Skill.name)
-            .all()
-        )
-        result.append({
-            "category": {"id": cat.id, "name": cat.name},
-            "skills": [{"id": s.id, "name": s.name} for s in skills]
-        })
-
-    return {"skill_categories": result}, 200
+    return reference_response("filters_skills")
 
 
 @admins_bp.get("/admins/filters/roles")
@@ -522,15 +559,7 @@ def get_roles_for_filter():
     if error:
         return error
 
-    roles = (
-        db.session.query(Role)
-        .order_by(Role.name)
-        .all()
-    )
-
-    return {
-        "roles": [{"id": r.id, "code": r.code, "name": r.name} for r in roles]
-    }, 200
+    return reference_response("filters_roles")
 
 
 @admins_bp.get("/admins/filters/interests")
@@ -543,15 +572,7 @@ def get_interests_for_filter():
     if error:
         return error
 
-    interests = (
-        db.session.query(Interest)
-        .order_by(Interest.name)
-        .all()
-    )
-
-    return {
-        "interests": [{"id": i.id, "name": i.name} for i in interests]
-    }, 200
+    return reference_response("filters_interests")
 
 
 # ==================== СИСТЕМА БАЛЛОВ ====================
@@ -799,6 +820,11 @@ def add_student_points(student_id: int):
 def get_student_points_history(student_id: int):
     """
     Получить историю транзакций баллов студента.
+    Query params:
+        - page, per_page
+        - after: str (optional) - режим курсора вместо page: пустое значение — первая
+          страница, дальше pagination.next_after предыдущего ответа
+        - include_total: bool (default false) - считать total в режиме курсора
     """
     admin_user, error = require_admin()
     if error:
@@ -812,12 +838,44 @@ def get_student_points_history(student_id: int):
     per_page = request.args.get("per_page", 20, type=int)
     per_page = min(per_page, 100)
 
+    student_data = {
+        "id": profile.id,
+        "total_points": profile.total_points,
+        "total_som": profile.total_som,
+    }
     query = (
         db.session.query(PointTransaction)
         .filter(PointTransaction.student_id == student_id)
-        .order_by(PointTransaction.created_at.desc())
     )
 
+    after = request.args.get("after")
+    if after is not None:
+        keys = [
+            ("created_at", PointTransaction.created_at, "desc"),
+            ("id", PointTransaction.id, "desc"),
+        ]
+        try:
+            values = decode_keyset_cursor(keys, after)[0] if after else None
+        except ValueError:
+            return {"message": "invalid cursor"}, 400
+        per_page = max(per_page, 1)
+        total = None
+        if request.args.get("include_total", "false").lower() == "true":
+            total = query.count()
+        transactions = apply_keyset(query, keys, values).limit(per_page + 1).all()
+        next_after = None
+        if len(transactions) > per_page:
+            transactions = transactions[:per_page]
+            next_after = encode_keyset_cursor(
+                keys, [transactions[-1].created_at, transactions[-1].id]
+            )
+        return {
+            "transactions": [_serialize_point_transaction(t) for t in transactions],
+            "pagination": keyset_pagination(per_page, next_after, total),
+            "student": student_data,
+        }, 200
+
+    query = query.order_by(PointTransaction.created_at.desc())
     total = query.count()
     offset = (page - 1) * per_page
     transactions = query.offset(offset).limit(per_page).all()
@@ -825,25 +883,7 @@ def get_student_points_history(student_id: int):
     total_pages = (total + per_page - 1) // per_page if total > 0 else 0
 
     return {
-        "transactions": [
-            {
-                "id": t.id,
-                "points": t.points,
-                "som_earned": t.som_earned,
-                "description": t.description,
-                "category": {
-                    "id": t.category.id,
-                    "name": t.category.name,
-                    "is_penalty": t.category.is_penalty,
-                } if t.category else None,
-                "created_by": {
-                    "id": t.created_by_user.id,
-                    "email": t.created_by_user.email,
-                } if t.created_by_user else None,
-                "created_at": t.created_at.isoformat(),
-            }
-            for t in transactions
-        ],
+        "transactions": [_serialize_point_transaction(t) for t in transactions],
         "pagination": {
             "page": page,
             "per_page": per_page,
@@ -852,14 +892,29 @@ def get_student_points_history(student_id: int):
             "has_next": page < total_pages,
             "has_prev": page > 1,
         },
-        "student": {
-            "id": profile.id,
-            "total_points": profile.total_points,
-            "total_som": profile.total_som,
-        }
+        "student": student_data,
     }, 200
 
 
+def _serialize_point_transaction(t: PointTransaction) -> dict:
+    return {
+        "id": t.id,
+        "points": t.points,
+        "som_earned": t.som_earned,
+        "description": t.description,
+        "category": {
+            "id": t.category.id,
+            "name": t.category.name,
+            "is_penalty": t.category.is_penalty,
+        } if t.category else None,
+        "created_by": {
+            "id": t.created_by_user.id,
+            "email": t.created_by_user.email,
+        } if t.created_by_user else None,
+        "created_at": t.created_at.isoformat(),
+    }
+
+
 @admins_bp.get("/admins/students/<int:student_id>/journal-points")
 @jwt_required()
 def get_student_journal_points(student_id: int):
@@ -910,10 +965,7 @@ def get_admin_skill_categories():
     _, error = require_admin()
     if error:
         return error
-    items = db.session.execute(
-        db.select(SkillCategory).order_by(SkillCategory.name.asc())
-    ).scalars().all()
-    return [{"id": c.id, "name": c.name} for c in items], 200
+    return reference_response("skill_categories")
 
 
 @admins_bp.post("/admins/reference/skill-categories")
@@ -963,13 +1015,10 @@ def get_admin_skills():
     if error:
         return error
     category_id = request.args.get("category_id", type=int)
-    query = db.select(Skill).order_by(Skill.name.asc())
-    if category_id:
-        query = query.where(Skill.category_id == category_id)
-    skills = db.session.execute(query).scalars().all()
+    if not category_id:
+        return reference_response("skills")
     return [
-        {"id": s.id, "name": s.name, "category": {"id": s.category.id, "name": s.category.name}}
-        for s in skills
+        s for s in get_reference_catalog().skills if s["category"]["id"] == category_id
     ], 200
 
 
@@ -1023,10 +1072,7 @@ def get_admin_interests():
     _, error = require_admin()
     if error:
         return error
-    items = db.session.execute(
-        db.select(Interest).order_by(Interest.name.asc())
-    ).scalars().all()
-    return [{"id": i.id, "name": i.name} for i in items], 200
+    return reference_response("interests")
 
 
 @admins_bp.post("/admins/reference/interests")
@@ -1073,10 +1119,7 @@ def get_admin_roles():
     _, error = require_admin()
     if error:
         return error
-    items = db.session.execute(
-        db.select(Role).order_by(Role.name.asc())
-    ).scalars().all()
-    return [{"id": r.id, "code": r.code, "name": r.name} for r in items], 200
+    return reference_response("roles")
 
 
 @admins_bp.post("/admins/reference/roles")
@@ -1117,3 +1160,82 @@ def delete_role(role_id: int):
     db.session.delete(role)
     db.session.commit()
     return "", 204
+
+
+# ==================== КОМАНДЫ ====================
+
+@admins_bp.post("/admins/teams/build")
+@jwt_required()
+def build_student_teams():
+    """
+    Разбить студентов на команды (например, для хакатона) с покрытием ролей
+    и совпадением интересов. Ничего не сохраняет — возвращает предложенное разбиение.
+
+    Body:
+        - group_name: str — студенты группы (точное совпадение)
+        - student_ids: list[int] — ID профилей студентов
+          (нужно хотя бы одно из двух; если заданы оба — студенты из списка в этой группе)
+        - team_size: int (опционально, по умолчанию 4, от 2 до 12)
+        - roles: list[str] (опционально) — коды ролей, нужных каждой команде
+          (по умолчанию teamlead, backend, frontend, designer)
+        - weights: {"roles": float, "interests": float} (опционально)
+        - local_search: bool (опционально, по умолчанию true) — улучшать разбиение обменами
+    """
+    _, error = require_admin()
+    if error:
+        return error
+
+    data = request.get_json(silent=True) or {}
+    group_name = (data.get("group_name") or "").strip()
+    student_ids = data.get("student_ids")
+    if not group_name and student_ids is None:
+        return {"message": "group_name or student_ids is required"}, 400
+    if student_ids is not None and (
+        not isinstance(student_ids, list)
+        or not all(isinstance(i, int) and not isinstance(i, bool) for i in student_ids)
+    ):
+        return {"message": "student_ids must be a list of integers"}, 400
+
+    try:
+        team_size = int(data.get("team_size", DEFAULT_TEAM_SIZE))
+    except (TypeError, ValueError):
+        return {"message": "team_size must be an integer"}, 400
+
+    roles = data.get("roles")
+    if roles is not None and (not isinstance(roles, list) or not all(isinstance(r, str) for r in roles)):
+        return {"message": "roles must be a list of role codes"}, 400
+
+    # Неактивных студентов отбрасывает build_teams (skipped_student_ids)
+    query = db.select(StudentProfile.id)
+    if group_name:
+        query = query.where(StudentProfile.group_name == group_name)
+    if student_ids is not None:
+        query = query.where(StudentProfile.id.in_(student_ids))
+    profile_ids = db.session.execute(query).scalars().all()
+
+    try:
+        result = build_teams(
+            profile_ids,
+            team_size=team_size,
+            required_roles=roles,
+            weights=data.get("weights"),
+            local_search=bool(data.get("local_search", True)),
+        )
+    except ValueError as e:
+        return {"message": str(e)}, 400
+    return result, 200
+
+
+# ==================== МЕТРИКИ ====================
+
+@admins_bp.get("/admins/metrics")
+@jwt_required()
+def get_metrics():
+    """Метрики текущего процесса (воркера): пул соединений с БД журнала, кэш рекомендаций."""
+    _, error = require_admin()
+    if error:
+        return error
+    return {
+        "journal_pool": journal_service.get_pool_stats(),
+        "recommendation_cache": get_cache_stats(),
+    }, 200
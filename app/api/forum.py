@@ -2,14 +2,23 @@ from datetime import datetime, timedelta
 from flask import Blueprint, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from sqlalchemy import func
+from sqlalchemy.orm import joinedload
 
 from ..extensions import db
 from ..models.user import User
 from ..models.forum import ForumTopic, ForumMessage
+from ..services.forum_counters import on_message_created, on_message_deleted
 from ..services.notification_service import (
+    create_broadcast_notification,
     create_notification,
-    create_notifications_for_users,
-    get_active_student_user_ids,
+)
+from ..utils.pagination import (
+    apply_keyset,
+    decode_cursor,
+    decode_keyset_cursor,
+    encode_cursor,
+    encode_keyset_cursor,
+    keyset_pagination,
 )
 
 forum_bp = Blueprint("forum", __name__)
@@ -17,6 +26,9 @@ forum_bp = Blueprint("forum", __name__)
 # Время в минутах, в течение которого можно редактировать/удалять сообщение
 MESSAGE_EDIT_WINDOW_MINUTES = 30
 
+# Максимум ответов на корневое сообщение в одной выдаче
+MAX_REPLIES_PER_PAGE = 100
+
 
 def can_edit_message(message: ForumMessage, user: User) -> bool:
     """Проверяет, может ли пользователь редактировать сообщение"""
@@ -50,6 +62,54 @@ def can_delete_message(message: ForumMessage, user: User) -> bool:
     return time_passed <= timedelta(minutes=MESSAGE_EDIT_WINDOW_MINUTES)
 
 
+def _author_options(entity):
+    """Eager-load автора и его профилей — для to_dict() без запросов на каждую строку."""
+    return (
+        joinedload(entity.author).joinedload(User.student_profile),
+        joinedload(entity.author).joinedload(User.admin_profile),
+    )
+
+
+_REPLIES_ORDER = (ForumMessage.created_at.asc(), ForumMessage.id.asc())
+
+
+def _reply_cursor(reply: ForumMessage) -> str:
+    return encode_cursor({"created_at": reply.created_at.isoformat(), "id": reply.id})
+
+
+def _load_replies(root_ids: list[int], limit: int | None = None) -> dict[int, list[ForumMessage]]:
+    """
+    Ответы на корневые сообщения страницы одним IN-запросом (вместе с авторами).
+    limit — не больше limit + 1 ответа на корень: лишний ответ означает, что есть ещё.
+    """
+    if not root_ids:
+        return {}
+    if limit is None:
+        stmt = db.select(ForumMessage).where(ForumMessage.parent_id.in_(root_ids))
+    else:
+        ranked = (
+            db.select(
+                ForumMessage.id.label("reply_id"),
+                func.row_number()
+                .over(partition_by=ForumMessage.parent_id, order_by=_REPLIES_ORDER)
+                .label("rn"),
+            )
+            .where(ForumMessage.parent_id.in_(root_ids))
+            .subquery()
+        )
+        stmt = (
+            db.select(ForumMessage)
+            .join(ranked, ranked.c.reply_id == ForumMessage.id)
+            .where(ranked.c.rn <= limit + 1)
+        )
+    stmt = stmt.options(*_author_options(ForumMessage)).order_by(*_REPLIES_ORDER)
+
+    grouped: dict[int, list[ForumMessage]] = {}
+    for reply in db.session.execute(stmt).scalars():
+        grouped.setdefault(reply.parent_id, []).append(reply)
+    return grouped
+
+
 # ==================== TOPICS ====================
 
 @forum_bp.get("/forum/topics")
@@ -61,18 +121,63 @@ def get_topics():
         - page: int (default 1)
         - per_page: int (default 20)
         - pinned_first: bool (default true) - закрепленные темы сверху
+        - sort: created | activity (default created) - по дате создания
+          или по последней активности (последнее сообщение, иначе создание темы)
+        - after: str (optional) - режим курсора вместо page: пустое значение — первая
+          страница, дальше pagination.next_after предыдущего ответа
+        - include_total: bool (default false) - считать total в режиме курсора
     """
     page = request.args.get("page", 1, type=int)
     per_page = request.args.get("per_page", 20, type=int)
     per_page = min(per_page, 100)  # Ограничение
     pinned_first = request.args.get("pinned_first", "true").lower() == "true"
+    sort = request.args.get("sort", "created").lower()
+    if sort not in ("created", "activity"):
+        return {"message": "sort must be one of: created, activity"}, 400
+    after = request.args.get("after")
 
-    query = ForumTopic.query
-    
+    query = ForumTopic.query.options(*_author_options(ForumTopic))
+
+    if sort == "activity":
+        sort_key = func.coalesce(ForumTopic.last_message_at, ForumTopic.created_at)
+    else:
+        sort_key = ForumTopic.created_at
+    order = sort_key.desc()
+
+    if after is not None:
+        keys = [(sort, sort_key, "desc"), ("id", ForumTopic.id, "desc")]
+        if pinned_first:
+            keys.insert(0, ("pinned", ForumTopic.is_pinned, "desc"))
+        try:
+            values = decode_keyset_cursor(keys, after)[0] if after else None
+        except ValueError:
+            return {"message": "invalid cursor"}, 400
+        per_page = max(per_page, 1)
+        total = None
+        if request.args.get("include_total", "false").lower() == "true":
+            total = query.order_by(None).count()
+        topics = apply_keyset(query, keys, values).limit(per_page + 1).all()
+        next_after = None
+        if len(topics) > per_page:
+            topics = topics[:per_page]
+            last = topics[-1]
+            last_sort_value = (
+                (last.last_message_at or last.created_at) if sort == "activity" else last.created_at
+            )
+            last_values = [last_sort_value, last.id]
+            if pinned_first:
+                last_values.insert(0, last.is_pinned)
+            next_after = encode_keyset_cursor(keys, last_values)
+        return {
+            "topics": [topic.to_dict() for topic in topics],
+            "pagination": keyset_pagination(per_page, next_after, total),
+        }, 200
+    
+    # id — как в режиме курсора: стабильный порядок при равных датах и тот же индекс
     if pinned_first:
-        query = query.order_by(ForumTopic.is_pinned.desc(), ForumTopic.created_at.desc())
+        query = query.order_by(ForumTopic.is_pinned.desc(), order, ForumTopic.id.desc())
     else:
-        query = query.order_by(ForumTopic.created_at.desc())
+        query = query.order_by(order, ForumTopic.id.desc())
 
     pagination = query.paginate(page=page, per_page=per_page, error_out=False)
     
@@ -122,11 +227,9 @@ def create_topic():
     db.session.add(topic)
     db.session.flush()
 
-    student_ids = get_active_student_user_ids(
-        exclude_user_id=user.id if user.role == "student" else None
-    )
-    create_notifications_for_users(
-        user_ids=student_ids,
+    create_broadcast_notification(
+        audience_role="student",
+        exclude_user_id=user.id if user.role == "student" else None,
         notification_type="forum_new_topic",
         title="Новый топик на форуме",
         body=title,
@@ -244,6 +347,9 @@ def get_messages(topic_id: int):
     Query params:
         - page: int (default 1)
         - per_page: int (default 50)
+        - replies_limit: int (optional) - не больше N ответов на сообщение; тогда у сообщения
+          есть replies_has_more и replies_next_cursor для GET /forum/messages/<id>/replies
+        - after: str (optional) - режим курсора вместо page (см. GET /forum/topics)
     
     Возвращает сообщения с вложенными ответами (replies).
     """
@@ -255,21 +361,69 @@ def get_messages(topic_id: int):
     page = request.args.get("page", 1, type=int)
     per_page = request.args.get("per_page", 50, type=int)
     per_page = min(per_page, 100)
+    replies_limit = request.args.get("replies_limit", type=int)
+    if replies_limit is not None:
+        replies_limit = min(max(replies_limit, 0), MAX_REPLIES_PER_PAGE)
+
+    after = request.args.get("after")
 
     # Получаем только корневые сообщения (без parent_id)
-    query = ForumMessage.query.filter(
+    query = ForumMessage.query.options(*_author_options(ForumMessage)).filter(
         ForumMessage.topic_id == topic_id,
         ForumMessage.parent_id.is_(None)
-    ).order_by(ForumMessage.created_at.desc())
+    )
 
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    next_after = None
+    if after is not None:
+        keys = [
+            ("created_at", ForumMessage.created_at, "desc"),
+            ("id", ForumMessage.id, "desc"),
+        ]
+        try:
+            values = decode_keyset_cursor(keys, after)[0] if after else None
+        except ValueError:
+            return {"message": "invalid cursor"}, 400
+        per_page = max(per_page, 1)
+        roots = apply_keyset(query, keys, values).limit(per_page + 1).all()
+        if len(roots) > per_page:
+            roots = roots[:per_page]
+            next_after = encode_keyset_cursor(keys, [roots[-1].created_at, roots[-1].id])
+        pagination = None
+    else:
+        pagination = query.order_by(ForumMessage.created_at.desc()).paginate(
+            page=page, per_page=per_page, error_out=False
+        )
+        roots = pagination.items
+    replies_by_root = _load_replies([msg.id for msg in roots], replies_limit)
+
+    messages = []
+    for msg in roots:
+        replies = replies_by_root.get(msg.id, [])
+        if replies_limit is None:
+            messages.append(msg.to_dict(include_replies=True, replies=replies))
+            continue
+        has_more = len(replies) > replies_limit
+        replies = replies[:replies_limit]
+        data = msg.to_dict(include_replies=True, replies=replies)
+        data["replies_has_more"] = has_more
+        data["replies_next_cursor"] = (
+            _reply_cursor(replies[-1]) if has_more and replies else None
+        )
+        messages.append(data)
     
     # Общее количество всех сообщений (включая ответы)
     total_messages = topic.messages_count
     
+    if pagination is None:
+        return {
+            "topic": topic.to_dict(),
+            "messages": messages,
+            "pagination": keyset_pagination(per_page, next_after, total_messages),
+        }, 200
+
     return {
         "topic": topic.to_dict(),
-        "messages": [msg.to_dict(include_replies=True) for msg in pagination.items],
+        "messages": messages,
         "pagination": {
             "page": pagination.page,
             "per_page": pagination.per_page,
@@ -330,6 +484,7 @@ def create_message(topic_id: int):
     )
     db.session.add(message)
     db.session.flush()
+    on_message_created(message)
 
     if parent_id is not None:
         parent_message = db.session.get(ForumMessage, parent_id)
@@ -364,6 +519,53 @@ def get_message(message_id: int):
     return message.to_dict(include_replies=True), 200
 
 
+@forum_bp.get("/forum/messages/<int:message_id>/replies")
+@jwt_required()
+def get_message_replies(message_id: int):
+    """
+    Ответы на сообщение порциями (продолжение replies_limit из списка сообщений темы).
+    Query params:
+        - limit: int (default 20, max 100)
+        - cursor: str (optional) - replies_next_cursor / next_cursor предыдущей порции
+    """
+    message = db.session.get(ForumMessage, message_id)
+
+    if not message:
+        return {"message": "message not found"}, 404
+
+    limit = request.args.get("limit", 20, type=int)
+    limit = min(max(limit, 1), MAX_REPLIES_PER_PAGE)
+
+    query = (
+        db.select(ForumMessage)
+        .options(*_author_options(ForumMessage))
+        .where(ForumMessage.parent_id == message.id)
+        .order_by(*_REPLIES_ORDER)
+    )
+    cursor = request.args.get("cursor")
+    if cursor:
+        try:
+            values = decode_cursor(cursor)
+            after_created_at = datetime.fromisoformat(values["created_at"])
+            after_id = int(values["id"])
+        except (KeyError, TypeError, ValueError):
+            return {"message": "invalid cursor"}, 400
+        query = query.where(
+            db.tuple_(ForumMessage.created_at, ForumMessage.id)
+            > (after_created_at, after_id)
+        )
+
+    replies = db.session.execute(query.limit(limit + 1)).scalars().all()
+    has_more = len(replies) > limit
+    replies = replies[:limit]
+
+    return {
+        "replies": [reply.to_dict(include_replies=False) for reply in replies],
+        "has_more": has_more,
+        "next_cursor": _reply_cursor(replies[-1]) if has_more else None,
+    }, 200
+
+
 @forum_bp.patch("/forum/messages/<int:message_id>")
 @jwt_required()
 def update_message(message_id: int):
@@ -431,7 +633,10 @@ def delete_message(message_id: int):
             return {"message": "forbidden"}, 403
         return {"message": "delete time expired (30 minutes)"}, 403
     
+    topic_id = message.topic_id
     db.session.delete(message)
+    db.session.flush()
+    on_message_deleted(topic_id)
     db.session.commit()
     
     return {"message": "message deleted"}, 200
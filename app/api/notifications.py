@@ -4,6 +4,13 @@ from flask_jwt_extended import get_jwt_identity, jwt_required
 from ..extensions import db
 from ..models.notification import Notification
 from ..models.user import User
+from ..services.notification_service import deliver_pending_broadcasts
+from ..utils.pagination import (
+    apply_keyset,
+    decode_keyset_cursor,
+    encode_keyset_cursor,
+    keyset_pagination,
+)
 
 
 notifications_bp = Blueprint("notifications", __name__)
@@ -29,14 +36,16 @@ def get_my_notifications():
     if not user:
         return {"message": "user not found"}, 404
 
+    deliver_pending_broadcasts(user)
+
     page = request.args.get("page", 1, type=int)
     per_page = request.args.get("per_page", 20, type=int)
     per_page = min(max(per_page, 1), 100)
+    # after — режим курсора вместо page: пустое значение — первая страница,
+    # дальше pagination.next_after; total считается только при include_total=true
+    after = request.args.get("after")
 
     base_query = db.select(Notification).where(Notification.user_id == user.id)
-    total = db.session.execute(
-        db.select(db.func.count(Notification.id)).where(Notification.user_id == user.id)
-    ).scalar() or 0
     unread_count = db.session.execute(
         db.select(db.func.count(Notification.id)).where(
             Notification.user_id == user.id,
@@ -44,6 +53,37 @@ def get_my_notifications():
         )
     ).scalar() or 0
 
+    if after is not None:
+        keys = [
+            ("created_at", Notification.created_at, "desc"),
+            ("id", Notification.id, "desc"),
+        ]
+        try:
+            values = decode_keyset_cursor(keys, after)[0] if after else None
+        except ValueError:
+            return {"message": "invalid cursor"}, 400
+        total = None
+        if request.args.get("include_total", "false").lower() == "true":
+            total = db.session.execute(
+                db.select(db.func.count(Notification.id)).where(Notification.user_id == user.id)
+            ).scalar() or 0
+        items = db.session.execute(
+            apply_keyset(base_query, keys, values).limit(per_page + 1)
+        ).scalars().all()
+        next_after = None
+        if len(items) > per_page:
+            items = items[:per_page]
+            next_after = encode_keyset_cursor(keys, [items[-1].created_at, items[-1].id])
+        return {
+            "items": [_serialize_notification(item) for item in items],
+            "unread_count": int(unread_count),
+            "pagination": keyset_pagination(per_page, next_after, total),
+        }, 200
+
+    total = db.session.execute(
+        db.select(db.func.count(Notification.id)).where(Notification.user_id == user.id)
+    ).scalar() or 0
+
     offset = (max(page, 1) - 1) * per_page
     items = db.session.execute(
         base_query.order_by(Notification.created_at.desc()).offset(offset).limit(per_page)
@@ -88,6 +128,8 @@ def mark_all_notifications_as_read():
     if not user:
         return {"message": "user not found"}, 404
 
+    deliver_pending_broadcasts(user)
+
     db.session.query(Notification).filter(
         Notification.user_id == user.id,
         Notification.is_read.is_(False),
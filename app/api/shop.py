@@ -12,9 +12,9 @@ from ..models.user import User
 from ..models.student import StudentProfile
 from ..models.shop import ShopItem, ShopPurchaseRequest
 from ..services.notification_service import (
+    create_broadcast_notification,
     create_notifications_for_users,
     get_active_admin_user_ids,
-    get_active_student_user_ids,
 )
 
 
@@ -332,9 +332,8 @@ def admin_create_item():
     )
     db.session.add(item)
     db.session.flush()
-    student_ids = get_active_student_user_ids()
-    create_notifications_for_users(
-        user_ids=student_ids,
+    create_broadcast_notification(
+        audience_role="student",
         notification_type="shop_new_item",
         title="Новый товар в магазине",
         body=item.name,
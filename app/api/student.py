@@ -9,12 +9,28 @@ from ..models.skills import Skill
 from ..models.interests import Interest
 from ..models.roles import Role
 from ..models.points import PointTransaction
+from ..models.leaderboard import LeaderboardEntry
+from ..services.leaderboard_service import (
+    ensure_leaderboard_fresh,
+    get_leaderboard_total,
+    get_live_rank_window,
+    get_rank_window,
+    load_leaderboard_entries,
+)
 from ..services.recommendations_service import get_student_recommendations
+from ..services.similarity_index import mark_similarity_dirty
+from ..services.team_matching import get_team_recommendations
 from ..services.journal_service import (
     confirm_student_in_journal,
     StudentNotFound,
     MultipleStudentsFound,
 )
+from ..utils.pagination import (
+    apply_keyset,
+    decode_keyset_cursor,
+    encode_keyset_cursor,
+    keyset_pagination,
+)
 
 
 students_bp = Blueprint("students", __name__)
@@ -343,6 +359,7 @@ def put_my_skills():
             level=item["level"],
         ))
 
+    mark_similarity_dirty(profile.id)
     db.session.commit()
     return {"message": "skills updated"}, 200
 
@@ -388,6 +405,7 @@ def put_my_interests():
     for iid in ids:
         db.session.add(StudentInterest(student_id=profile.id, interest_id=iid))
 
+    mark_similarity_dirty(profile.id)
     db.session.commit()
     return {"message": "interests updated"}, 200
 
@@ -435,6 +453,7 @@ def put_my_roles():
     for rid in role_ids:
         db.session.add(StudentRole(student_id=profile.id, role_id=rid))
 
+    mark_similarity_dirty(profile.id)
     db.session.commit()
     return {"message": "roles updated"}, 200
 
@@ -520,6 +539,9 @@ def get_recommendations():
     Получить рекомендации студентов на основе навыков, интересов и ролей.
     
     Query params:
+        - mode: "team" (optional) - командный режим: взвешенная оценка по интересам,
+          ролям и уровням навыков (services/team_matching.py), параметры page, per_page
+          (default 20, max 100) и profile (профиль весов)
         - interests_page: int (default 1) - страница для рекомендаций по интересам
         - interests_per_page: int (default 20) - количество на странице для интересов
         - roles_page: int (default 1) - страница для рекомендаций по ролям
@@ -543,6 +565,20 @@ def get_recommendations():
         db.session.add(profile)
         db.session.commit()
 
+    mode = request.args.get("mode")
+    if mode == "team":
+        page = max(request.args.get("page", 1, type=int), 1)
+        per_page = min(max(request.args.get("per_page", 20, type=int), 1), 100)
+        try:
+            return get_team_recommendations(
+                profile.id, page=page, per_page=per_page,
+                weight_profile=request.args.get("profile") or None,
+            ), 200
+        except ValueError as e:
+            return {"message": str(e)}, 400
+    if mode:
+        return {"message": "mode must be team"}, 400
+
     # Получаем параметры пагинации из query string
     interests_page = request.args.get("interests_page", 1, type=int)
     interests_per_page = request.args.get("interests_per_page", 20, type=int)
@@ -576,6 +612,9 @@ def get_students_rating():
         - page: int (default 1)
         - per_page: int (default 20, max 100)
         - type: "total" | "month" (default "total")
+        - after: str (optional) - режим курсора вместо page: пустое значение — первая
+          страница, дальше pagination.next_after предыдущего ответа
+        - include_total: bool (default false) - считать total в режиме курсора
     
     type="total"  - рейтинг по накопительным баллам (total_points).
     type="month"  - рейтинг по баллам за текущий месяц (current_month_points).
@@ -590,55 +629,43 @@ def get_students_rating():
     per_page = request.args.get("per_page", 20, type=int)
     per_page = min(per_page, 100)
     rating_type = request.args.get("type", "total")
+    board = "month" if rating_type == "month" else "total"
 
-    # Базовый запрос - все активные студенты
-    query = (
-        db.select(StudentProfile)
-        .join(User, User.id == StudentProfile.user_id)
-        .where(User.is_active == True)
-    )
+    # Снимок рейтинга с готовыми местами (пересобирается, если баллы менялись)
+    ensure_leaderboard_fresh(board)
+    query = db.select(LeaderboardEntry).where(LeaderboardEntry.board == board)
 
-    if rating_type == "month":
-        query = query.order_by(
-            StudentProfile.current_month_points.desc(),
-            StudentProfile.first_name.asc()
-        )
-    else:
-        query = query.order_by(
-            StudentProfile.total_points.desc(),
-            StudentProfile.first_name.asc()
-        )
+    after = request.args.get("after")
+    if after is not None:
+        keys = [(f"{board}_rank", LeaderboardEntry.rank, "asc")]
+        try:
+            values = decode_keyset_cursor(keys, after)[0] if after else None
+        except ValueError:
+            return {"message": "invalid cursor"}, 400
+        per_page = max(per_page, 1)
+        total = None
+        if request.args.get("include_total", "false").lower() == "true":
+            total = get_leaderboard_total(board)
+        entries = load_leaderboard_entries(apply_keyset(query, keys, values).limit(per_page + 1))
+        next_after = None
+        if len(entries) > per_page:
+            entries = entries[:per_page]
+            next_after = encode_keyset_cursor(keys, [entries[-1]["rank"]])
+        return {
+            "students": entries,
+            "pagination": keyset_pagination(per_page, next_after, total),
+        }, 200
 
-    # Подсчёт общего количества
-    count_query = (
-        db.select(db.func.count(StudentProfile.id))
-        .join(User, User.id == StudentProfile.user_id)
-        .where(User.is_active == True)
-    )
-    total = db.session.execute(count_query).scalar() or 0
+    total = get_leaderboard_total(board)
 
-    # Пагинация
+    # Пагинация: место известно заранее, поэтому диапазон по первичному ключу (board, rank)
     offset = (page - 1) * per_page
-    profiles = db.session.execute(
-        query.offset(offset).limit(per_page)
-    ).scalars().all()
-
-    students = []
-    for idx, profile in enumerate(profiles):
-        rank = offset + idx + 1
-        student_user = db.session.get(User, profile.user_id)
-        students.append({
-            "rank": rank,
-            "id": profile.id,
-            "user_id": profile.user_id,
-            "email": student_user.email if student_user else None,
-            "first_name": profile.first_name,
-            "last_name": profile.last_name,
-            "group_name": profile.group_name,
-            "total_points": profile.total_points or 0,
-            "total_som": profile.total_som or 0,
-            "current_month_points": profile.current_month_points or 0,
-        })
+    students = load_leaderboard_entries(
+        query.where(
+            LeaderboardEntry.rank > offset,
+            LeaderboardEntry.rank <= offset + per_page,
+        ).order_by(LeaderboardEntry.rank)
+    )
 
     return {
         "students": students,
@@ -651,6 +678,52 @@ def get_students_rating():
     }, 200
 
 
+@students_bp.get("/students/me/rank")
+@jwt_required()
+def get_my_rank():
+    """
+    Место текущего студента в рейтинге и соседи вокруг него.
+
+    Query params:
+        - type: "total" | "month" (default "total")
+        - window: int (default 5, max 50) - сколько студентов выше и ниже показать
+    """
+    user_id = int(get_jwt_identity())
+    user = db.session.get(User, user_id)
+
+    if not user:
+        return {"message": "user not found"}, 404
+
+    if user.role != "student":
+        return {"message": "only student can access this endpoint"}, 403
+
+    profile = user.student_profile
+    if not profile:
+        return {"message": "student profile not found"}, 404
+
+    board = "month" if request.args.get("type", "total") == "month" else "total"
+    window = request.args.get("window", 5, type=int)
+    window = min(max(window, 0), 50)
+
+    ensure_leaderboard_fresh(board)
+    entry, neighbours = get_rank_window(board, profile.id, window)
+    if entry is not None:
+        rank = entry.rank
+        total = get_leaderboard_total(board)
+        items = neighbours
+    else:
+        # Студент ещё не попал в снимок (профиль создан после последней пересборки)
+        rank, total, items = get_live_rank_window(board, profile, window)
+
+    return {
+        "type": board,
+        "rank": rank,
+        "total": total,
+        "window": window,
+        "students": items,
+    }, 200
+
+
 @students_bp.get("/students/<int:student_id>")
 @jwt_required()
 def get_student_by_id(student_id: int):
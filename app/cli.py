@@ -0,0 +1,20 @@
+import click
+from flask import Flask
+
+from .services.forum_counters import check_topic_counters
+
+
+def register_cli(app: Flask) -> None:
+    @app.cli.command("forum-check-counters")
+    @click.option("--fix", is_flag=True, help="Исправить найденные расхождения.")
+    def forum_check_counters(fix: bool):
+        """Сверка messages_count / last_message_* тем форума с forum_messages."""
+        mismatches = check_topic_counters(fix=fix)
+        for item in mismatches:
+            click.echo(
+                f"topic {item.topic_id}: stored (count, last_id)={item.stored} actual={item.actual}"
+            )
+        status = "fixed" if fix else "found"
+        click.echo(f"{len(mismatches)} mismatched topic(s) {status}")
+        if mismatches and not fix:
+            raise SystemExit(1)
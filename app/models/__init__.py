@@ -10,6 +10,8 @@ from .roles import Role
 from .forum import ForumTopic, ForumMessage
 
 from .points import PointCategory, PointTransaction
-from .journal_points import JournalProcessedMark
+from .journal_points import JournalProcessedMark, JournalSyncState
+from .leaderboard import LeaderboardEntry, LeaderboardState
 from .shop import ShopItem, ShopPurchaseRequest
-from .notification import Notification
+from .notification import Notification, BroadcastNotification, NotificationBroadcastCursor
+from .cache import CacheVersion
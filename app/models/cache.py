@@ -0,0 +1,18 @@
+from datetime import datetime
+
+from ..extensions import db
+
+
+class CacheVersion(db.Model):
+    """
+    Версии ключей кэшей в памяти процессов (services/cache_bus.py).
+
+    Запись увеличивает version в своей транзакции; остальные воркеры узнают об этом через
+    Postgres NOTIFY или периодическим опросом таблицы и сбрасывают свой кэш по ключу.
+    """
+
+    __tablename__ = "cache_versions"
+
+    key = db.Column(db.String(100), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
@@ -15,20 +15,32 @@ class ForumTopic(db.Model):
     
     is_closed = db.Column(db.Boolean, default=False, nullable=False)
     is_pinned = db.Column(db.Boolean, default=False, nullable=False)
+
+    # Денормализованные счётчики — обновляются в services/forum_counters.py
+    messages_count = db.Column(db.Integer, default=0, server_default="0", nullable=False)
+    last_message_at = db.Column(db.DateTime, nullable=True)
+    last_message_id = db.Column(db.Integer, nullable=True)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
+    __table_args__ = (
+        db.Index("ix_forum_topics_pinned_created_id", "is_pinned", "created_at", "id"),
+        # sort=activity: ORDER BY [is_pinned DESC,] coalesce(...) DESC, id DESC — обратный проход
+        db.Index("ix_forum_topics_activity", db.func.coalesce(last_message_at, created_at)),
+        db.Index(
+            "ix_forum_topics_pinned_activity_id",
+            "is_pinned",
+            db.func.coalesce(last_message_at, created_at),
+            "id",
+        ),
+    )
+
     # Связи
     author = db.relationship("User", backref="forum_topics")
     messages = db.relationship("ForumMessage", back_populates="topic", cascade="all, delete-orphan", 
                                order_by="ForumMessage.created_at")
 
-    @property
-    def messages_count(self):
-        """Количество сообщений в теме"""
-        return len(self.messages)
-
     def to_dict(self, include_author=True):
         data = {
             "id": self.id,
@@ -85,12 +97,18 @@ class ForumMessage(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
+    __table_args__ = (
+        db.Index("ix_forum_messages_topic_id_created_at", "topic_id", "created_at"),
+        db.Index("ix_forum_messages_parent_id_created_at", "parent_id", "created_at"),
+    )
+
     # Связи
     topic = db.relationship("ForumTopic", back_populates="messages")
     author = db.relationship("User", backref="forum_messages")
     parent = db.relationship("ForumMessage", remote_side=[id], backref="replies")
 
-    def to_dict(self, include_author=True, include_replies=False):
+    def to_dict(self, include_author=True, include_replies=False, replies=None):
+        """replies — заранее загруженные ответы (пакетная загрузка страницы), иначе self.replies."""
         data = {
             "id": self.id,
             "content": self.content,
@@ -125,11 +143,14 @@ class ForumMessage(db.Model):
                 elif author.role == "admin" and author.admin_profile:
                     data["author"]["name"] = author.admin_profile.full_name
         
-        if include_replies and self.replies:
-            data["replies"] = [
-                reply.to_dict(include_author=True, include_replies=False)
-                for reply in self.replies
-            ]
+        if include_replies:
+            if replies is None:
+                replies = self.replies
+            if replies:
+                data["replies"] = [
+                    reply.to_dict(include_author=True, include_replies=False)
+                    for reply in replies
+                ]
         
         return data
 
@@ -67,3 +67,34 @@ class JournalProcessedMark(db.Model):
     student = db.relationship("StudentProfile", backref="journal_processed_marks")
     transaction = db.relationship("PointTransaction", backref="journal_mark", uselist=False)
 
+
+
+class JournalSyncState(db.Model):
+    """
+    Состояние инкрементальной синхронизации с сетевым журналом.
+
+    Хранит водяной знак (Mark.Issued, Mark.Version, MarkSet.Id, Mark.EducationTaskId)
+    последней обработанной оценки,
+    чтобы следующий прогон запрашивал у журнала только изменённые с тех пор оценки,
+    а также чекпоинты пакетной обработки за интервал дат (последний
+    закоммиченный StudentProfile.id), чтобы упавший прогон продолжался с места падения.
+    """
+
+    __tablename__ = "journal_sync_state"
+
+    # Имя потока синхронизации, например "marks_issued"
+    name = db.Column(db.String(64), primary_key=True)
+
+    issued_watermark = db.Column(db.DateTime, nullable=True)
+    version_watermark = db.Column(db.Integer, nullable=False, default=0)
+    # Уникальный хвост водяного знака (MarkSet.Id, Mark.EducationTaskId): страница оценок
+    # с одинаковыми (Issued, Version) всё равно пролистывается
+    mark_set_watermark = db.Column(db.Integer, nullable=False, default=0)
+    education_task_watermark = db.Column(db.Integer, nullable=False, default=0)
+
+    # Последний обработанный StudentProfile.id (чекпоинт пакетного прогона)
+    cursor_student_id = db.Column(db.Integer, nullable=True)
+
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
+    )
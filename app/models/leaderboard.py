@@ -0,0 +1,49 @@
+from datetime import datetime
+
+from ..extensions import db
+
+
+class LeaderboardEntry(db.Model):
+    """
+    Снимок рейтинга студентов с заранее посчитанными местами.
+
+    board: "total" — по total_points, "month" — по current_month_points.
+    Пересобирается целиком из student_profiles (services/leaderboard_service.py),
+    когда версия изменений рейтинга ушла вперёд от LeaderboardState.built_version.
+    email, last_name, group_name и total_som на место не влияют: в ответах они берутся
+    из текущих профилей, здесь — запасные значения.
+    """
+
+    __tablename__ = "leaderboard_entries"
+
+    board = db.Column(db.String(16), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+
+    student_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    email = db.Column(db.String(255), nullable=True)
+    first_name = db.Column(db.String(120), nullable=True)
+    last_name = db.Column(db.String(120), nullable=True)
+    group_name = db.Column(db.String(120), nullable=True)
+    total_points = db.Column(db.Integer, nullable=False, default=0)
+    total_som = db.Column(db.Integer, nullable=False, default=0)
+    current_month_points = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint("board", "student_id", name="uq_leaderboard_entries_board_student"),
+    )
+
+
+class LeaderboardState(db.Model):
+    """
+    Актуальность снимка рейтинга: built_version — версия ключа "leaderboard" в cache_versions,
+    с которой построен снимок (None — ещё не строился). Снимок устарел, если версия больше.
+    """
+
+    __tablename__ = "leaderboard_state"
+
+    board = db.Column(db.String(16), primary_key=True)
+    built_version = db.Column(db.BigInteger, nullable=True)
+    entries_count = db.Column(db.Integer, nullable=False, default=0)
+    refreshed_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
@@ -19,5 +19,55 @@ class Notification(db.Model):
     payload = db.Column(db.JSON, nullable=True)
     is_read = db.Column(db.Boolean, nullable=False, default=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    # Рассылка, из которой скопировано уведомление (см. deliver_pending_broadcasts)
+    broadcast_id = db.Column(
+        db.Integer,
+        db.ForeignKey("broadcast_notifications.id", ondelete="SET NULL", name="fk_notifications_broadcast_id"),
+        nullable=True,
+    )
+
+    __table_args__ = (
+        db.Index("ix_notifications_user_created_id", "user_id", "created_at", "id"),
+        db.Index("uq_notifications_user_broadcast", "user_id", "broadcast_id", unique=True),
+    )
 
     user = db.relationship("User", backref="notifications")
+
+
+class BroadcastNotification(db.Model):
+    """
+    Одно уведомление для всех активных пользователей роли audience_role.
+    Хранится одной строкой; в notifications конкретного пользователя копируется при чтении
+    (см. notification_service.deliver_pending_broadcasts).
+    """
+
+    __tablename__ = "broadcast_notifications"
+
+    id = db.Column(db.Integer, primary_key=True)
+    audience_role = db.Column(db.String(50), nullable=False, index=True)
+    exclude_user_id = db.Column(
+        db.Integer,
+        db.ForeignKey("users.id", ondelete="SET NULL"),
+        nullable=True,
+    )
+    type = db.Column(db.String(64), nullable=False)
+    title = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=True)
+    payload = db.Column(db.JSON, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class NotificationBroadcastCursor(db.Model):
+    """
+    До какого BroadcastNotification.id рассылки уже доставлены пользователю. Сдвигается только
+    за рассылки старше окна доставки — более новые проверяются по notifications.broadcast_id.
+    """
+
+    __tablename__ = "notification_broadcast_cursors"
+
+    user_id = db.Column(
+        db.Integer,
+        db.ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    last_broadcast_id = db.Column(db.Integer, nullable=False, default=0)
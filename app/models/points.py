@@ -55,6 +55,11 @@ class PointTransaction(db.Model):
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
+    __table_args__ = (
+        # История баллов студента (в т.ч. keyset-пагинация)
+        db.Index("ix_point_transactions_student_created_id", "student_id", "created_at", "id"),
+    )
+
     # Relationships
     student = db.relationship("StudentProfile", backref="point_transactions")
     category = db.relationship("PointCategory", back_populates="transactions")
@@ -17,6 +17,9 @@ class StudentProfile(db.Model):
     group_name = db.Column(db.String(120), nullable=True)
     birthday = db.Column(db.Date, nullable=True)
 
+    # Нормализованная строка для поиска в админке (см. services/student_search.py)
+    search_text = db.Column(db.Text, nullable=True)
+
     # Система баллов и валюты
     total_points = db.Column(db.Integer, default=0, nullable=False)  # Накопительные баллы (для общего рейтинга)
     total_som = db.Column(db.Integer, default=0, nullable=False)     # SOM (валюта для трат)
@@ -28,4 +31,17 @@ class StudentProfile(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
+    __table_args__ = (
+        # Порядок рейтинга: баллы desc, имя asc (NULL в конце), id asc — в том же направлении,
+        # что и ORDER BY рейтинга, иначе смешанный порядок не читается из индекса без сортировки
+        db.Index("ix_student_profiles_rating_total", total_points.desc(), "first_name", "id"),
+        db.Index("ix_student_profiles_rating_month", current_month_points.desc(), "first_name", "id"),
+        db.Index(
+            "ix_student_profiles_search_text_trgm",
+            "search_text",
+            postgresql_using="gin",
+            postgresql_ops={"search_text": "gin_trgm_ops"},
+        ),
+    )
+
     user = db.relationship("User", back_populates="student_profile")
@@ -17,5 +17,9 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
+    __table_args__ = (
+        db.Index("ix_users_role_created_id", "role", "created_at", "id"),
+    )
+
     student_profile = db.relationship("StudentProfile", back_populates="user", uselist=False)
     admin_profile = db.relationship("AdminProfile", back_populates="user", uselist=False)
@@ -1,7 +1,12 @@
 from datetime import date, timedelta
+import logging
 import os
+import threading
 
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.blocking import BlockingScheduler
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
 
 from .extensions import db
 from .services.grade_points_service import GradePointsService
@@ -17,35 +22,135 @@ def _get_journal_base_url() -> str:
     return os.getenv("JOURNAL_API_BASE_URL", "http://localhost:5000")
 
 
+def _is_enabled(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _get_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
 def _create_service() -> GradePointsService:
     base_url = _get_journal_base_url()
     return GradePointsService(journal_base_url=base_url, session=db.session)
 
 
-def init_scheduler(app):
+logger = logging.getLogger(__name__)
+
+# Ключ pg advisory lock, которым процессы делят лидерство планировщика
+SCHEDULER_LEADER_LOCK_KEY = 734_100_001
+
+
+class SchedulerLeaderLock:
+    """
+    Выбор единственного процесса, выполняющего задачи планировщика.
+
+    Postgres: session-level pg_try_advisory_lock на отдельном соединении (вне пула
+    приложения). Пока соединение живо — процесс лидер; при обрыве соединения Postgres
+    сам снимает блокировку, и лидерство забирает следующий процесс при срабатывании задачи.
+    Другие СУБД (SQLite локально): процесс всегда считается лидером.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+        self._engine = None
+        self._conn = None
+        self._mutex = threading.Lock()
+
+    def is_leader(self) -> bool:
+        with self._mutex:
+            with self.app.app_context():
+                url = db.engine.url
+            if url.get_backend_name() != "postgresql":
+                return True
+
+            if self._conn is not None:
+                try:
+                    self._conn.execute(text("SELECT 1"))
+                    return True
+                except Exception:
+                    logger.warning("[scheduler] Lost leader lock connection", exc_info=True)
+                    self._close()
+
+            if self._engine is None:
+                self._engine = create_engine(url, poolclass=NullPool)
+            conn = self._engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+            try:
+                acquired = conn.execute(
+                    text("SELECT pg_try_advisory_lock(:key)"),
+                    {"key": SCHEDULER_LEADER_LOCK_KEY},
+                ).scalar()
+            except Exception:
+                conn.close()
+                raise
+            if not acquired:
+                conn.close()
+                return False
+
+            self._conn = conn
+            logger.info("[scheduler] This process (pid=%s) is the scheduler leader", os.getpid())
+            return True
+
+    def _close(self) -> None:
+        try:
+            self._conn.close()
+        except Exception:
+            pass
+        self._conn = None
+
+
+def init_scheduler(app, blocking: bool = False):
     """
     Инициализация фонового планировщика задач.
 
     - Ежедневная задача в 03:00: обработка оценок за вчерашний день.
-    - Месячная задача в 02:00 первого числа: сначала доначисление оценок журнала за прошлый месяц,
-      затем перенос current_month_points всех студентов в total_points и SOM и обнуление месяца.
+    - Месячная задача в 02:00 первого числа: сначала доначисление оценок журнала за прошлый месяц
+      (сверка; отключается JOURNAL_MONTHLY_RECONCILE=false), затем перенос current_month_points
+      всех студентов в total_points и SOM и обнуление месяца.
+    - Инкрементальная синхронизация оценок по водяному знаку Mark.Issued раз в
+      JOURNAL_INCREMENTAL_SYNC_MINUTES минут (по умолчанию выключена).
 
     Часовой пояс: SCHEDULER_TIMEZONE (по умолчанию Europe/Moscow), чтобы «3 ночи»
     совпадало с локальным временем, а не UTC.
+
+    Планировщик может быть запущен в нескольких процессах (воркеры gunicorn,
+    отдельный run_scheduler.py), но задачи выполняет только лидер — см. SchedulerLeaderLock.
+    blocking=True — для отдельного процесса: start() блокирует поток.
     """
     tz = os.getenv("SCHEDULER_TIMEZONE", "Europe/Moscow")
-    scheduler = BackgroundScheduler(timezone=tz)
+    scheduler_cls = BlockingScheduler if blocking else BackgroundScheduler
+    scheduler = scheduler_cls(timezone=tz)
+    leader = SchedulerLeaderLock(app)
+
+    def _skip_unless_leader(job_name: str) -> bool:
+        try:
+            if leader.is_leader():
+                return False
+        except Exception:
+            app.logger.exception("[scheduler] Leader election failed, skipping %s", job_name)
+            return True
+        app.logger.info("[scheduler] Not the leader, skipping %s", job_name)
+        return True
 
     @scheduler.scheduled_job("cron", hour=3, minute=0)
     def daily_job():
+        if _skip_unless_leader("daily_job"):
+            return
         with app.app_context():
             yesterday = date.today() - timedelta(days=1)
             try:
                 service = _create_service()
                 processed = service.process_daily_scores(for_date=yesterday)
                 app.logger.info(
-                    "[scheduler] Daily journal points: processed=%s for %s",
+                    "[scheduler] Daily journal points: processed=%s skipped=%s for %s",
                     processed,
+                    service.last_stats.already_processed,
                     yesterday,
                 )
             except Exception:
@@ -53,6 +158,8 @@ def init_scheduler(app):
 
     @scheduler.scheduled_job("cron", day=1, hour=3, minute=00)
     def monthly_finalize_job():
+        if _skip_unless_leader("monthly_finalize_job"):
+            return
         with app.app_context():
             today = date.today()
             if today.month == 1:
@@ -61,17 +168,19 @@ def init_scheduler(app):
             else:
                 prev_year = today.year
                 prev_month = today.month - 1
-            try:
-                service = _create_service()
-                processed = service.finalize_month(year=prev_year, month=prev_month)
-                app.logger.info(
-                    "[scheduler] Monthly journal finalize: processed=%s for %s-%02d",
-                    processed,
-                    prev_year,
-                    prev_month,
-                )
-            except Exception:
-                app.logger.exception("[scheduler] Monthly journal finalize job failed")
+            if _is_enabled("JOURNAL_MONTHLY_RECONCILE", default=True):
+                try:
+                    service = _create_service()
+                    processed = service.finalize_month(year=prev_year, month=prev_month)
+                    app.logger.info(
+                        "[scheduler] Monthly journal finalize: processed=%s skipped=%s for %s-%02d",
+                        processed,
+                        service.last_stats.already_processed,
+                        prev_year,
+                        prev_month,
+                    )
+                except Exception:
+                    app.logger.exception("[scheduler] Monthly journal finalize job failed")
 
             try:
                 changed, moved = rollover_all_active_students(as_of=today)
@@ -83,5 +192,34 @@ def init_scheduler(app):
             except Exception:
                 app.logger.exception("[scheduler] Month rollover to total_points failed")
 
+    incremental_minutes = _get_int("JOURNAL_INCREMENTAL_SYNC_MINUTES", 0)
+    if incremental_minutes > 0:
+
+        @scheduler.scheduled_job(
+            "interval", minutes=incremental_minutes, max_instances=1, coalesce=True
+        )
+        def incremental_journal_job():
+            if _skip_unless_leader("incremental_journal_job"):
+                return
+            with app.app_context():
+                try:
+                    service = _create_service()
+                    processed = service.sync_incremental()
+                    app.logger.info(
+                        "[scheduler] Incremental journal sync: processed=%s skipped=%s",
+                        processed,
+                        service.last_stats.already_processed,
+                    )
+                except Exception:
+                    app.logger.exception("[scheduler] Incremental journal sync failed")
+
+    if not blocking:
+        # Кандидатура в лидеры сразу при старте, а не при первом срабатывании задачи
+        try:
+            leader.is_leader()
+        except Exception:
+            app.logger.exception("[scheduler] Leader election failed")
+
     scheduler.start()
+    return scheduler
 
@@ -0,0 +1,305 @@
+"""
+Инвалидация кэшей в памяти процессов между воркерами gunicorn.
+
+У каждого ключа кэша есть версия в таблице cache_versions. Запись увеличивает версию в своей
+транзакции (bump_cache_version), а процесс сравнивает версию, с которой построено значение
+в памяти, с последней известной ему версией ключа.
+
+Как воркер узнаёт о новых версиях:
+  - Postgres: фоновый поток держит отдельное соединение с LISTEN cache_invalidation,
+    bump делает pg_notify в той же транзакции — уведомление приходит сразу после commit.
+    Таблица дополнительно перечитывается раз в CACHE_BUS_SAFETY_POLL_SECONDS (60) на случай
+    уведомлений, потерянных при переподключении;
+  - без LISTEN (SQLite, соединение слушателя упало, CACHE_BUS_LISTEN=false): таблица
+    перечитывается при обращении к кэшу не чаще раза в CACHE_BUS_POLL_SECONDS (2).
+Процесс, сделавший запись, видит новую версию сразу после своего commit.
+
+Использование:
+
+    @cached_loader("reference_catalog", models=(Skill, Interest))
+    def load_catalog():
+        ...
+
+    load_catalog()             # значение из памяти или пересчёт (нужен контекст приложения)
+    load_catalog.invalidate()  # увеличить версию в текущей транзакции
+
+models — изменения этих моделей через ORM увеличивают версию ключа автоматически (after_flush).
+"""
+
+from __future__ import annotations
+
+import functools
+import logging
+import os
+import select
+import threading
+import time
+from datetime import datetime
+from itertools import chain
+from typing import Callable
+
+from sqlalchemy import create_engine, event, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from ..extensions import db
+from ..models.cache import CacheVersion
+
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "cache_invalidation"
+
+DEFAULT_POLL_SECONDS = 2
+DEFAULT_SAFETY_POLL_SECONDS = 60
+# Как часто слушатель проверяет, что соединение живо, если уведомлений нет
+LISTEN_KEEPALIVE_SECONDS = 30
+
+_PENDING_INFO_KEY = "cache_bus_pending"
+
+
+def _get_float(name: str, default: float) -> float:
+    try:
+        return max(float(os.getenv(name, default)), 0.0)
+    except ValueError:
+        return float(default)
+
+
+def _is_enabled(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+class CacheBus:
+    """Последние известные процессу версии ключей и способ их узнавать (LISTEN или опрос)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._versions: dict[str, int] = {}
+        self._polled_at: float | None = None
+        self._listener: threading.Thread | None = None
+        self._listening = False
+
+    def current_version(self, key: str) -> int:
+        self._ensure_listener()
+        if self._listening:
+            interval = _get_float("CACHE_BUS_SAFETY_POLL_SECONDS", DEFAULT_SAFETY_POLL_SECONDS)
+        else:
+            interval = _get_float("CACHE_BUS_POLL_SECONDS", DEFAULT_POLL_SECONDS)
+        if self._polled_at is None or time.monotonic() - self._polled_at >= interval:
+            self.poll()
+        return self._versions.get(key, 0)
+
+    def observe(self, key: str, version: int) -> None:
+        with self._lock:
+            if version > self._versions.get(key, 0):
+                self._versions[key] = version
+
+    def poll(self) -> None:
+        """Перечитывает cache_versions отдельным соединением (не трогая транзакцию запроса)."""
+        self._polled_at = time.monotonic()
+        try:
+            with db.engine.connect() as conn:
+                rows = conn.execute(db.select(CacheVersion.key, CacheVersion.version)).all()
+        except SQLAlchemyError:
+            logger.warning("[cache_bus] Failed to poll cache_versions", exc_info=True)
+            return
+        for key, version in rows:
+            self.observe(key, version)
+
+    def _ensure_listener(self) -> None:
+        # Поток запускается лениво в процессе, который обслуживает запросы
+        # (а не в мастере gunicorn до fork и не в CLI-командах)
+        if self._listener is not None and self._listener.is_alive():
+            return
+        if not _is_enabled("CACHE_BUS_LISTEN", default=True):
+            return
+        url = db.engine.url
+        if url.get_backend_name() != "postgresql":
+            return
+        with self._lock:
+            if self._listener is not None and self._listener.is_alive():
+                return
+            self._listener = threading.Thread(
+                target=self._listen_forever,
+                args=(url,),
+                name="cache-bus-listener",
+                daemon=True,
+            )
+            self._listener.start()
+
+    def _listen_forever(self, url) -> None:
+        engine = create_engine(url, poolclass=NullPool)
+        backoff = 1
+        while True:
+            try:
+                self._listen(engine)
+            except Exception:
+                logger.warning("[cache_bus] LISTEN connection lost", exc_info=True)
+            if self._listening:
+                backoff = 1
+            self._listening = False
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 60)
+
+    def _listen(self, engine) -> None:
+        raw = engine.raw_connection()
+        try:
+            conn = raw.driver_connection
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {CHANNEL}")
+                # После LISTEN — полное чтение: закрывает окно, пока соединения не было
+                cur.execute("SELECT key, version FROM cache_versions")
+                rows = cur.fetchall()
+            for key, version in rows:
+                self.observe(key, version)
+            self._listening = True
+            logger.info("[cache_bus] Listening on %s (pid=%s)", CHANNEL, os.getpid())
+
+            while True:
+                readable, _, _ = select.select([conn], [], [], LISTEN_KEEPALIVE_SECONDS)
+                if readable:
+                    conn.poll()
+                else:
+                    with conn.cursor() as cur:
+                        cur.execute("SELECT 1")
+                while conn.notifies:
+                    self._on_notify(conn.notifies.pop(0).payload)
+        finally:
+            raw.close()
+
+    def _on_notify(self, payload: str) -> None:
+        key, _, version = payload.rpartition(":")
+        try:
+            self.observe(key, int(version))
+        except ValueError:
+            logger.warning("[cache_bus] Bad notification payload: %r", payload)
+
+
+cache_bus = CacheBus()
+
+
+def bump_cache_version(key: str, session=None) -> int:
+    """
+    Увеличивает версию ключа в текущей транзакции (одним upsert). Другие процессы увидят её
+    после commit; при rollback версия не меняется.
+    """
+    session = session or db.session
+    dialect = session.get_bind().dialect.name
+    insert = pg_insert if dialect == "postgresql" else sqlite_insert
+    now = datetime.utcnow()
+    stmt = insert(CacheVersion).values(key=key, version=1, updated_at=now)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CacheVersion.key],
+        set_={"version": CacheVersion.version + 1, "updated_at": now},
+    ).returning(CacheVersion.version)
+    version = session.execute(stmt).scalar_one()
+
+    if dialect == "postgresql":
+        session.execute(db.select(func.pg_notify(CHANNEL, f"{key}:{version}")))
+    session.info.setdefault(_PENDING_INFO_KEY, {})[key] = version
+    return version
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending_versions(session):
+    for key, version in session.info.pop(_PENDING_INFO_KEY, {}).items():
+        cache_bus.observe(key, version)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _drop_pending_versions(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(_PENDING_INFO_KEY, None)
+
+
+class CachedLoader:
+    """Значение в памяти процесса, пересчитываемое при смене версии ключа."""
+
+    def __init__(self, key: str, loader: Callable, ttl: float | None = None) -> None:
+        self.key = key
+        self.ttl = ttl
+        self._loader = loader
+        self._lock = threading.Lock()
+        # (версия, время загрузки, значение) — заменяется целиком
+        self._entry: tuple[int, float, object] | None = None
+        functools.update_wrapper(self, loader)
+
+    def _fresh_value(self, version: int):
+        entry = self._entry
+        if entry is None or entry[0] != version:
+            return None, False
+        if self.ttl is not None and time.monotonic() - entry[1] >= self.ttl:
+            return None, False
+        return entry[2], True
+
+    def __call__(self):
+        version = cache_bus.current_version(self.key)
+        value, fresh = self._fresh_value(version)
+        if fresh:
+            return value
+        with self._lock:
+            value, fresh = self._fresh_value(version)
+            if fresh:
+                return value
+            # Версия зафиксирована до загрузки: bump во время загрузки вызовет повторную
+            value = self._loader()
+            self._entry = (version, time.monotonic(), value)
+            return value
+
+    def invalidate(self, session=None) -> int:
+        return bump_cache_version(self.key, session)
+
+    def clear(self) -> None:
+        """Сбрасывает значение только в текущем процессе."""
+        self._entry = None
+
+
+_loaders: dict[str, CachedLoader] = {}
+_model_keys: dict[type, set[str]] = {}
+
+
+def cached_loader(key: str, models: tuple = (), ttl: float | None = None):
+    """
+    Регистрирует загрузчик кэша по ключу. models — классы моделей, изменение которых
+    через ORM увеличивает версию ключа; ttl — предельный возраст значения в секундах.
+    """
+
+    def decorator(loader: Callable) -> CachedLoader:
+        if key in _loaders:
+            raise ValueError(f"cache key {key!r} is already registered")
+        cached = CachedLoader(key, loader, ttl=ttl)
+        _loaders[key] = cached
+        for model in models:
+            _model_keys.setdefault(model, set()).add(key)
+        return cached
+
+    return decorator
+
+
+def _keys_for(obj) -> set[str]:
+    keys = set()
+    for model, model_keys in _model_keys.items():
+        if isinstance(obj, model):
+            keys |= model_keys
+    return keys
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_on_flush(session, flush_context):
+    if not _model_keys:
+        return
+    keys = set()
+    for obj in chain(session.new, session.deleted):
+        keys |= _keys_for(obj)
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            keys |= _keys_for(obj)
+    for key in sorted(keys):
+        bump_cache_version(key, session)
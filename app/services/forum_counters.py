@@ -0,0 +1,143 @@
+"""
+Денормализованные счётчики тем форума: messages_count, last_message_at, last_message_id.
+
+Обновляются одним UPDATE в той же транзакции, что и создание/удаление сообщения:
+строка темы блокируется на время UPDATE, поэтому параллельные сообщения не теряют инкременты.
+updated_at темы при этом не меняется — это время правки самой темы, а не активности в ней.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from sqlalchemy import case, func, select
+
+from ..extensions import db
+from ..models.forum import ForumMessage, ForumTopic
+
+
+def _last_message_subquery(topic_id: int, column):
+    return (
+        select(column)
+        .where(ForumMessage.topic_id == topic_id)
+        .order_by(ForumMessage.created_at.desc(), ForumMessage.id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+
+
+def on_message_created(message: ForumMessage) -> None:
+    """Вызывать после flush нового сообщения (нужны id и created_at)."""
+    is_latest = db.or_(
+        ForumTopic.last_message_at.is_(None),
+        ForumTopic.last_message_at <= message.created_at,
+    )
+    db.session.execute(
+        db.update(ForumTopic)
+        .where(ForumTopic.id == message.topic_id)
+        .values(
+            messages_count=ForumTopic.messages_count + 1,
+            last_message_at=case((is_latest, message.created_at), else_=ForumTopic.last_message_at),
+            last_message_id=case((is_latest, message.id), else_=ForumTopic.last_message_id),
+            updated_at=ForumTopic.updated_at,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def on_message_deleted(topic_id: int) -> None:
+    """Вызывать после flush удаления сообщения: уменьшает счётчик и пересчитывает последнее сообщение."""
+    db.session.execute(
+        db.update(ForumTopic)
+        .where(ForumTopic.id == topic_id)
+        .values(
+            messages_count=case(
+                (ForumTopic.messages_count > 0, ForumTopic.messages_count - 1),
+                else_=0,
+            ),
+            last_message_at=_last_message_subquery(topic_id, ForumMessage.created_at),
+            last_message_id=_last_message_subquery(topic_id, ForumMessage.id),
+            updated_at=ForumTopic.updated_at,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+@dataclass
+class CounterMismatch:
+    topic_id: int
+    stored: tuple[int, int | None]
+    actual: tuple[int, int | None]
+
+
+def check_topic_counters(fix: bool = False) -> list[CounterMismatch]:
+    """
+    Сверяет счётчики всех тем с forum_messages. fix=True — исправляет расхождения и делает commit.
+
+    Возвращает список расхождений (messages_count, last_message_id): сохранённое vs фактическое.
+    """
+    counts = (
+        select(
+            ForumMessage.topic_id.label("topic_id"),
+            func.count(ForumMessage.id).label("cnt"),
+        )
+        .group_by(ForumMessage.topic_id)
+        .subquery()
+    )
+    ranked = (
+        select(
+            ForumMessage.topic_id.label("topic_id"),
+            ForumMessage.id.label("message_id"),
+            ForumMessage.created_at.label("created_at"),
+            func.row_number()
+            .over(
+                partition_by=ForumMessage.topic_id,
+                order_by=(ForumMessage.created_at.desc(), ForumMessage.id.desc()),
+            )
+            .label("rn"),
+        )
+        .subquery()
+    )
+    last = select(ranked).where(ranked.c.rn == 1).subquery()
+
+    rows = db.session.execute(
+        select(
+            ForumTopic.id,
+            ForumTopic.messages_count,
+            ForumTopic.last_message_id,
+            func.coalesce(counts.c.cnt, 0),
+            last.c.message_id,
+            last.c.created_at,
+        )
+        .outerjoin(counts, counts.c.topic_id == ForumTopic.id)
+        .outerjoin(last, last.c.topic_id == ForumTopic.id)
+        .order_by(ForumTopic.id)
+    ).all()
+
+    mismatches = []
+    for topic_id, stored_count, stored_last_id, actual_count, actual_last_id, actual_last_at in rows:
+        if (stored_count, stored_last_id) == (actual_count, actual_last_id):
+            continue
+        mismatches.append(
+            CounterMismatch(
+                topic_id=topic_id,
+                stored=(stored_count, stored_last_id),
+                actual=(actual_count, actual_last_id),
+            )
+        )
+        if fix:
+            db.session.execute(
+                db.update(ForumTopic)
+                .where(ForumTopic.id == topic_id)
+                .values(
+                    messages_count=actual_count,
+                    last_message_id=actual_last_id,
+                    last_message_at=actual_last_at,
+                    updated_at=ForumTopic.updated_at,
+                )
+                .execution_options(synchronize_session=False)
+            )
+
+    if fix and mismatches:
+        db.session.commit()
+    return mismatches
@@ -2,19 +2,22 @@ from __future__ import annotations
 
 import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from dataclasses import dataclass
 from datetime import date, datetime, timedelta
 from decimal import Decimal
 from typing import Iterable, Mapping, Any
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from ..extensions import db
 from ..models.student import StudentProfile
-from ..models.journal_points import JournalProcessedMark
-from ..models.points import PointTransaction
+from ..models.journal_points import JournalProcessedMark, JournalSyncState
 from . import journal_service
-from .notification_service import create_notification
+from .journal_ingest_writer import JournalIngestWriter
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +32,104 @@ class JournalMark:
     issued: datetime | None
     lesson_date: date | None
 
+    @property
+    def key(self) -> tuple[int, int, int, int]:
+        """Ключ оценки, совпадающий с uq_journal_mark_once."""
+        return (
+            self.student_workflow_id,
+            self.mark_set_id,
+            self.education_task_id,
+            self.version,
+        )
+
+
+@dataclass
+class IngestStats:
+    """Итоги одного прогона начисления: сколько оценок пришло и что с ними стало."""
+
+    fetched: int = 0
+    already_processed: int = 0
+    zero_points: int = 0
+    unlinked: int = 0
+    created: int = 0
+
+
+# Имя строки journal_sync_state для инкрементальной синхронизации по Mark.Issued
+INCREMENTAL_SYNC_STATE = "marks_issued"
+# Префикс строк journal_sync_state с чекпоинтами прогонов за интервал дат
+RANGE_CHECKPOINT_PREFIX = "range:"
+
+DEFAULT_INCREMENTAL_PAGE_SIZE = 5000
+
+DEFAULT_STUDENT_BATCH_SIZE = 500
+
+
+def get_incremental_page_size() -> int:
+    try:
+        size = int(os.getenv("JOURNAL_INCREMENTAL_PAGE_SIZE", str(DEFAULT_INCREMENTAL_PAGE_SIZE)))
+    except ValueError:
+        size = DEFAULT_INCREMENTAL_PAGE_SIZE
+    return max(size, 1)
+
+
+def get_student_batch_size() -> int:
+    try:
+        size = int(os.getenv("JOURNAL_STUDENT_BATCH_SIZE", str(DEFAULT_STUDENT_BATCH_SIZE)))
+    except ValueError:
+        size = DEFAULT_STUDENT_BATCH_SIZE
+    return max(size, 1)
+
+
+# Сколько ключей оценок проверяем в journal_processed_marks одним запросом
+PROCESSED_KEYS_CHUNK_SIZE = 500
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def get_http_concurrency() -> int:
+    return max(int(_env_float("JOURNAL_HTTP_CONCURRENCY", 8)), 1)
+
+
+def get_http_timeout_seconds() -> float:
+    return max(_env_float("JOURNAL_HTTP_TIMEOUT_SECONDS", 30), 1)
+
+
+def get_http_deadline_seconds() -> float:
+    return max(_env_float("JOURNAL_HTTP_DEADLINE_SECONDS", 900), 1)
+
+
+def _build_http_session() -> requests.Session:
+    """
+    HTTP-сессия к журналу: keep-alive соединения на весь прогон и повтор
+    с экспоненциальной задержкой на сетевые ошибки и 502/503/504.
+    Все запросы к журналу только читают, поэтому повторять можно и POST.
+    """
+    retry = Retry(
+        total=max(int(_env_float("JOURNAL_HTTP_RETRIES", 3)), 0),
+        backoff_factor=_env_float("JOURNAL_HTTP_BACKOFF_SECONDS", 0.5),
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({"GET", "POST"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=get_http_concurrency(),
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class _BulkEndpointUnsupported(Exception):
+    """Журнал не умеет пакетный эндпоинт оценок (404/405)."""
+
 
 def mark_to_points(value: int) -> int:
     """
@@ -52,14 +153,17 @@ class GradePointsService:
     """
     Сервис для начисления баллов студентам за оценки из сетевого журнала.
 
-    Работает в два режима:
+    Режимы работы:
       - ежедневная обработка за конкретный день (обычно "вчера");
-      - финализация за весь месяц.
+      - финализация за весь месяц (сверка, догоняет пропущенное);
+      - инкрементальная синхронизация по водяному знаку Mark.Issued.
     """
 
     def __init__(self, journal_base_url: str, session: db.Session | None = None) -> None:
         self.journal_base_url = journal_base_url.rstrip("/")
         self.session = session or db.session
+        self.last_stats = IngestStats()
+        self._http = _build_http_session()
 
     # ===== Публичные методы =====
 
@@ -87,118 +191,535 @@ class GradePointsService:
 
         return self._process_range(month_start, next_month_start)
 
+    def sync_incremental(self, page_size: int | None = None) -> int:
+        """
+        Инкрементальная синхронизация: запрашивает у журнала только оценки,
+        выставленные/изменённые после сохранённого водяного знака
+        (Mark.Issued, Mark.Version, MarkSet.Id, Mark.EducationTaskId), и двигает водяной знак.
+        Ключ уникален, поэтому страница с одинаковыми Issued и Version тоже пролистывается. Коммит — на каждую страницу, вместе с водяным знаком,
+        так что прерванный прогон продолжится с последней записанной страницы.
+
+        При первом запуске водяной знак ставится на начало текущего месяца.
+        Возвращает количество новых обработанных оценок.
+        """
+        stats = IngestStats()
+        self.last_stats = stats
+        page_size = page_size or get_incremental_page_size()
+        today = date.today()
+        default_month_start = date(today.year, today.month, 1)
+
+        processed_count = 0
+        while True:
+            state = self._lock_sync_state(INCREMENTAL_SYNC_STATE)
+            if state.issued_watermark is None:
+                state.issued_watermark = datetime(today.year, today.month, 1)
+                state.version_watermark = 0
+                state.mark_set_watermark = 0
+                state.education_task_watermark = 0
+            watermark = (
+                state.issued_watermark,
+                state.version_watermark,
+                state.mark_set_watermark or 0,
+                state.education_task_watermark or 0,
+            )
+
+            items = self._fetch_marks_issued_since(*watermark, page_size)
+            if items is None:
+                self.session.rollback()
+                break
+
+            marks = [jm for jm in map(self._journal_row_to_mark, items) if jm is not None]
+            stats.fetched += len(marks)
+
+            workflow_ids = {jm.student_workflow_id for jm in marks}
+            profiles = (
+                self.session.execute(
+                    db.select(
+                        StudentProfile.id,
+                        StudentProfile.user_id,
+                        StudentProfile.student_workflow_id,
+                    ).where(StudentProfile.student_workflow_id.in_(workflow_ids))
+                ).all()
+                if workflow_ids
+                else []
+            )
+            processed_count += self._ingest_marks(
+                profiles_by_workflow_id={p.student_workflow_id: p for p in profiles},
+                marks=marks,
+                default_month_start=default_month_start,
+                stats=stats,
+            )
+
+            issued_marks = [jm for jm in marks if jm.issued is not None]
+            new_watermark = max(
+                [watermark]
+                + [
+                    (
+                        jm.issued.replace(tzinfo=None),
+                        jm.version,
+                        jm.mark_set_id,
+                        jm.education_task_id,
+                    )
+                    for jm in issued_marks
+                ]
+            )
+            (
+                state.issued_watermark,
+                state.version_watermark,
+                state.mark_set_watermark,
+                state.education_task_watermark,
+            ) = new_watermark
+            self.session.commit()
+
+            if len(items) < page_size:
+                break
+            if new_watermark == watermark:
+                # Полная страница без единой оценки с Issued — двигаться некуда
+                logger.warning(
+                    "[grade_points] Водяной знак не сдвинулся на полной странице (%s оценок) "
+                    "после Issued=%s Version=%s",
+                    page_size,
+                    watermark[0],
+                    watermark[1],
+                )
+                break
+
+        logger.info(
+            "[grade_points] Инкрементальная синхронизация: получено=%s, уже учтено=%s, "
+            "без баллов=%s, не связано=%s, новых=%s",
+            stats.fetched,
+            stats.already_processed,
+            stats.zero_points,
+            stats.unlinked,
+            stats.created,
+        )
+        return processed_count
+
     # ===== Внутренняя логика =====
 
+    @staticmethod
+    def _range_checkpoint_name(from_date: date, to_date: date) -> str:
+        return f"{RANGE_CHECKPOINT_PREFIX}{from_date.isoformat()}:{to_date.isoformat()}"
+
+    def _drop_stale_range_checkpoints(self, from_date: date) -> None:
+        """
+        Удаляет чекпоинты интервалов, закончившихся до from_date: их прогоны упали
+        и не перезапускались, иначе строки копились бы в journal_sync_state.
+        Ручной перезапуск такого интервала просто начнётся с первой пачки —
+        уже учтённые оценки повторно не начисляются.
+        """
+        names = self.session.execute(
+            db.select(JournalSyncState.name).where(
+                JournalSyncState.name.like(f"{RANGE_CHECKPOINT_PREFIX}%")
+            )
+        ).scalars().all()
+        stale = []
+        for name in names:
+            try:
+                range_end = date.fromisoformat(name.rsplit(":", 1)[1])
+            except (IndexError, ValueError):
+                continue
+            if range_end < from_date:
+                stale.append(name)
+        if not stale:
+            return
+        self.session.execute(
+            db.delete(JournalSyncState).where(JournalSyncState.name.in_(stale))
+        )
+        self.session.commit()
+        logger.info(
+            "[grade_points] Удалены чекпоинты незавершённых прогонов: %s",
+            ", ".join(sorted(stale)),
+        )
+
+    def _lock_sync_state(self, name: str) -> JournalSyncState:
+        """Строка состояния синхронизации под блокировкой (параллельные прогоны ждут друг друга)."""
+        state = self.session.execute(
+            db.select(JournalSyncState)
+            .where(JournalSyncState.name == name)
+            .with_for_update()
+        ).scalar_one_or_none()
+        if state is None:
+            state = JournalSyncState(name=name, version_watermark=0)
+            self.session.add(state)
+            self.session.flush()
+        return state
+
+    def _fetch_marks_issued_since(
+        self,
+        issued_after: datetime,
+        version_after: int,
+        mark_set_after: int,
+        education_task_after: int,
+        limit: int,
+    ) -> list[Mapping[str, Any]] | None:
+        """Страница оценок после водяного знака; None — журнал недоступен."""
+        if os.getenv("JOURNAL_DB_SERVER"):
+            try:
+                return journal_service.fetch_marks_issued_since(
+                    issued_after, version_after, mark_set_after, education_task_after, limit
+                )
+            except Exception:
+                logger.exception(
+                    "[grade_points] Ошибка чтения новых оценок из журнала (pyodbc)"
+                )
+                return None
+
+        url = f"{self.journal_base_url}/marks/issued-since"
+        params = {
+            "issued_after": issued_after.isoformat(),
+            "version_after": version_after,
+            "mark_set_after": mark_set_after,
+            "education_task_after": education_task_after,
+            "limit": limit,
+        }
+        try:
+            resp = self._http.get(url, params=params, timeout=get_http_timeout_seconds())
+            resp.raise_for_status()
+            payload = resp.json()
+            if isinstance(payload, dict) and payload.get("error"):
+                logger.error(
+                    "[grade_points] Журнал API вернул ошибку: %s url=%s",
+                    payload.get("error"),
+                    url,
+                )
+                return None
+            return list(payload.get("items", []))
+        except requests.RequestException:
+            logger.exception(
+                "[grade_points] Не удалось вызвать JOURNAL_API_BASE_URL=%s "
+                "(убедитесь, что запущен localdb.py на отдельном порту)",
+                self.journal_base_url,
+            )
+            return None
+
+
     def _process_range(self, from_date: date, to_date: date) -> int:
+        """
+        Обработка интервала дат уроков пачками студентов (JOURNAL_STUDENT_BATCH_SIZE).
+
+        Студенты читаются keyset-пагинацией по StudentProfile.id только нужными колонками
+        (без ORM-объектов в identity map), каждая пачка коммитится вместе с чекпоинтом
+        в journal_sync_state. Упавший прогон за тот же интервал продолжится
+        с первой незакоммиченной пачки; после успешного прогона чекпоинт удаляется.
+        Чекпоинты интервалов, закончившихся раньше текущего (упавшие и не перезапущенные
+        прогоны), удаляются при старте.
+
+        JOURNAL_HTTP_DEADLINE_SECONDS — срок на весь прогон, а не на пачку: если он истёк,
+        следующая пачка не запрашивается, чекпоинт остаётся, и следующий запуск
+        за тот же интервал продолжит с него.
+        """
+        stats = IngestStats()
+        self.last_stats = stats
+        deadline = time.monotonic() + get_http_deadline_seconds()
+        batch_size = get_student_batch_size()
+        checkpoint_name = self._range_checkpoint_name(from_date, to_date)
+        self._drop_stale_range_checkpoints(from_date)
+        default_month_start = date(from_date.year, from_date.month, 1)
+
         processed_count = 0
+        students_seen = 0
+        completed = True
+        while True:
+            checkpoint = self._lock_sync_state(checkpoint_name)
+            last_student_id = checkpoint.cursor_student_id or 0
+            if students_seen == 0 and last_student_id:
+                logger.info(
+                    "[grade_points] %s..%s: продолжаем с чекпоинта student_id>%s",
+                    from_date,
+                    to_date,
+                    last_student_id,
+                )
 
-        # Берём только студентов, у которых есть связь с журналом
-        profiles: Iterable[StudentProfile] = (
-            self.session.execute(
-                db.select(StudentProfile).where(
-                    StudentProfile.student_workflow_id.isnot(None)
+            # Берём только студентов, у которых есть связь с журналом
+            students = self.session.execute(
+                db.select(
+                    StudentProfile.id,
+                    StudentProfile.user_id,
+                    StudentProfile.student_workflow_id,
+                )
+                .where(
+                    StudentProfile.student_workflow_id.isnot(None),
+                    StudentProfile.id > last_student_id,
+                )
+                .order_by(StudentProfile.id)
+                .limit(batch_size)
+            ).all()
+            if not students:
+                break
+            if time.monotonic() >= deadline:
+                logger.error(
+                    "[grade_points] %s..%s: не уложились в JOURNAL_HTTP_DEADLINE_SECONDS, "
+                    "прогон остановлен на чекпоинте student_id>%s",
+                    from_date,
+                    to_date,
+                    last_student_id,
                 )
+                self.session.rollback()
+                completed = False
+                break
+            students_seen += len(students)
+
+            # Оценки студентов пачки тянем разом, а не отдельным запросом на студента
+            marks_by_student = self._fetch_marks_for_students(
+                student_workflow_ids=[s.student_workflow_id for s in students],
+                from_date=from_date,
+                to_date=to_date,
+                deadline=deadline,
             )
-            .scalars()
-            .all()
-        )
-        profile_list = list(profiles)
-        if not profile_list:
+            chunk_marks = [jm for marks in marks_by_student.values() for jm in marks]
+            stats.fetched += len(chunk_marks)
+            processed_count += self._ingest_marks(
+                profiles_by_workflow_id={s.student_workflow_id: s for s in students},
+                marks=chunk_marks,
+                default_month_start=default_month_start,
+                stats=stats,
+            )
+
+            checkpoint.cursor_student_id = students[-1].id
+            self.session.commit()
+
+            if len(students) < batch_size:
+                break
+
+        if completed:
+            # Прогон завершён — чекпоинт больше не нужен
+            self.session.execute(
+                db.delete(JournalSyncState).where(JournalSyncState.name == checkpoint_name)
+            )
+            self.session.commit()
+
+        if students_seen == 0:
             logger.warning(
                 "[grade_points] Нет студентов с заполненным student_workflow_id — "
                 "начисление из журнала пропущено"
             )
 
-        for profile in profile_list:
-            student_workflow_id = profile.student_workflow_id
-            if not student_workflow_id:
+        logger.info(
+            "[grade_points] %s..%s: студентов=%s, получено=%s, уже учтено=%s, "
+            "без баллов=%s, новых=%s",
+            from_date,
+            to_date,
+            students_seen,
+            stats.fetched,
+            stats.already_processed,
+            stats.zero_points,
+            stats.created,
+        )
+        return processed_count
+
+    def _ingest_marks(
+        self,
+        profiles_by_workflow_id: Mapping[int, Any],
+        marks: list[JournalMark],
+        default_month_start: date,
+        stats: IngestStats,
+    ) -> int:
+        """
+        Начисляет баллы за ещё не учтённые оценки (без коммита).
+        profiles_by_workflow_id: StudentWorkFlowId -> строка/объект с полями id и user_id.
+        Возвращает количество новых обработанных оценок.
+        """
+        # Уже учтённые оценки загружаем одним набором и дальше фильтруем в памяти
+        seen_keys = self._load_processed_keys(marks)
+        writer = JournalIngestWriter(self.session)
+
+        for jm in marks:
+            profile = profiles_by_workflow_id.get(jm.student_workflow_id)
+            if profile is None:
+                # Студент журнала не связан ни с одним профилем в нашей системе
+                stats.unlinked += 1
                 continue
 
-            marks = self._fetch_marks_for_student(
-                student_workflow_id=student_workflow_id,
-                from_date=from_date,
-                to_date=to_date,
-            )
-            if not marks:
+            if jm.key in seen_keys:
+                stats.already_processed += 1
+                continue
+            # Одна и та же оценка может прийти дважды в одном ответе журнала
+            seen_keys.add(jm.key)
+
+            points = mark_to_points(jm.value)
+            if points == 0:
+                # Можно не записывать нулевые, чтобы не раздувать таблицу
+                stats.zero_points += 1
                 continue
 
-            for jm in marks:
-                if self._is_mark_already_processed(jm):
-                    continue
+            # Месяц, за который учтён балл
+            month_start = (
+                date(jm.lesson_date.year, jm.lesson_date.month, 1)
+                if jm.lesson_date
+                else default_month_start
+            )
 
-                points = mark_to_points(jm.value)
-                if points == 0:
-                    # Можно не записывать нулевые, чтобы не раздувать таблицу
-                    continue
+            # Просто добавляем к текущему месяцу, перенос в total_points/SOM делает существующая логика
+            writer.add(
+                student_id=profile.id,
+                user_id=profile.user_id,
+                mark=jm,
+                points=points,
+                month_start=month_start,
+            )
 
-                # Обновляем месячный счёт профиля
-                month_start = date(jm.lesson_date.year, jm.lesson_date.month, 1) if jm.lesson_date else date(
-                    from_date.year, from_date.month, 1
-                )
+        writer.flush()
+        # Оценки, которые успел записать параллельный прогон, — тоже «уже учтённые»
+        stats.already_processed += writer.skipped
+        stats.created += writer.written
+        return writer.written
+
+    def _fetch_marks_for_students(
+        self,
+        student_workflow_ids: list[int],
+        from_date: date,
+        to_date: date,
+        deadline: float,
+    ) -> dict[int, list[JournalMark]]:
+        """
+        Оценки многих студентов за интервал, сгруппированные по StudentWorkFlowId.
+        deadline — time.monotonic(), до которого должны уложиться HTTP-запросы всего прогона.
+
+        pyodbc: один запрос с IN-списком на чанк по одному соединению.
+        HTTP: POST {JOURNAL_API_BASE_URL}/students/marks/by-date-range на чанк:
+            body:     {"student_workflow_ids": [...], "from": "YYYY-MM-DD", "to": "YYYY-MM-DD"}
+            response: {"items": [...]} — строки того же формата, что и у
+                      /students/{id}/marks/by-date-range (с колонкой StudentWorkFlowId).
+        Если журнал ещё не умеет bulk-эндпоинт (404/405), откатываемся на запросы по студенту.
+        """
+        ids = sorted({int(i) for i in student_workflow_ids if i})
+        result: dict[int, list[JournalMark]] = {}
+        if not ids:
+            return result
 
-                # Просто добавляем к текущему месяцу, перенос в total_points/SOM делает существующая логика
-                profile.current_month_points = (profile.current_month_points or 0) + points
+        chunk_size = journal_service.get_bulk_chunk_size()
+        items: list[Mapping[str, Any]] = []
 
-                transaction = PointTransaction(
-                    student_id=profile.id,
-                    category_id=None,
-                    points=points,
-                    som_earned=points // 5 if points > 0 else 0,
-                    description=f"Оценка в журнале: {jm.value}",
-                    created_by=None,
+        if os.getenv("JOURNAL_DB_SERVER"):
+            try:
+                items = journal_service.fetch_marks_by_lesson_date_range_bulk(
+                    ids, from_date, to_date, chunk_size=chunk_size
                 )
-                self.session.add(transaction)
-                self.session.flush()  # чтобы получить transaction.id
-
-                if points > 0:
-                    create_notification(
-                        user_id=profile.user_id,
-                        notification_type="points_added",
-                        title="Начислены баллы",
-                        body=f"За оценку {jm.value} начислено {points} баллов.",
-                        payload={
-                            "transaction_id": transaction.id,
-                            "points": points,
-                            "source": "journal",
-                        },
-                    )
-                elif points < 0:
-                    create_notification(
-                        user_id=profile.user_id,
-                        notification_type="points_deducted",
-                        title="Списаны баллы",
-                        body=f"За оценку {jm.value} списано {abs(points)} баллов.",
-                        payload={
-                            "transaction_id": transaction.id,
-                            "points": points,
-                            "source": "journal",
-                        },
-                    )
+            except Exception:
+                logger.exception(
+                    "[grade_points] Ошибка пакетного чтения оценок из журнала (pyodbc), "
+                    "студентов=%s",
+                    len(ids),
+                )
+                return result
+        else:
+            url = f"{self.journal_base_url}/students/marks/by-date-range"
+            chunks = [ids[start:start + chunk_size] for start in range(0, len(ids), chunk_size)]
+            try:
+                chunk_items = self._run_http_tasks(
+                    lambda chunk: self._post_marks_chunk(url, chunk, from_date, to_date),
+                    chunks,
+                    deadline,
+                )
+            except _BulkEndpointUnsupported:
+                logger.warning(
+                    "[grade_points] Журнал API не поддерживает %s — "
+                    "запрашиваем оценки по одному студенту",
+                    url,
+                )
+                return self._fetch_marks_per_student(ids, from_date, to_date, deadline)
+            for chunk_result in chunk_items:
+                items.extend(chunk_result or [])
+
+        for item in items:
+            jm = self._journal_row_to_mark(item)
+            if jm is not None:
+                result.setdefault(jm.student_workflow_id, []).append(jm)
+        return result
 
-                processed_mark = JournalProcessedMark(
-                    student_id=profile.id,
-                    student_workflow_id=jm.student_workflow_id,
-                    mark_set_id=jm.mark_set_id,
-                    education_task_id=jm.education_task_id,
-                    version=jm.version,
-                    mark_value=jm.value,
-                    issued_at=jm.issued,
-                    lesson_date=jm.lesson_date,
-                    points=points,
-                    transaction_id=transaction.id,
-                    month_start=month_start,
-                    processed_at=datetime.utcnow(),
+    def _post_marks_chunk(
+        self,
+        url: str,
+        chunk: list[int],
+        from_date: date,
+        to_date: date,
+    ) -> list[Mapping[str, Any]]:
+        body = {
+            "student_workflow_ids": chunk,
+            "from": from_date.isoformat(),
+            "to": to_date.isoformat(),
+        }
+        try:
+            resp = self._http.post(url, json=body, timeout=get_http_timeout_seconds())
+            if resp.status_code in (404, 405):
+                raise _BulkEndpointUnsupported(url)
+            resp.raise_for_status()
+            payload = resp.json()
+            if isinstance(payload, dict) and payload.get("error"):
+                logger.error(
+                    "[grade_points] Журнал API вернул ошибку: %s url=%s",
+                    payload.get("error"),
+                    url,
                 )
-                self.session.add(processed_mark)
+                return []
+            return list(payload.get("items", []))
+        except requests.RequestException:
+            logger.exception(
+                "[grade_points] Не удалось вызвать JOURNAL_API_BASE_URL=%s "
+                "(убедитесь, что запущен localdb.py на отдельном порту)",
+                self.journal_base_url,
+            )
+            return []
 
-                processed_count += 1
+    def _fetch_marks_per_student(
+        self,
+        student_workflow_ids: list[int],
+        from_date: date,
+        to_date: date,
+        deadline: float,
+    ) -> dict[int, list[JournalMark]]:
+        marks_lists = self._run_http_tasks(
+            lambda student_workflow_id: self._fetch_marks_for_student(
+                student_workflow_id=student_workflow_id,
+                from_date=from_date,
+                to_date=to_date,
+            ),
+            student_workflow_ids,
+            deadline,
+        )
+        result: dict[int, list[JournalMark]] = {}
+        for student_workflow_id, marks in zip(student_workflow_ids, marks_lists):
+            if marks:
+                result[student_workflow_id] = marks
+        return result
 
-        if processed_count > 0:
-            self.session.commit()
-        else:
-            self.session.rollback()
+    def _run_http_tasks(self, fn, args: list, deadline: float) -> list:
+        """
+        Параллельно выполняет fn(arg) для каждого arg в пуле потоков
+        (JOURNAL_HTTP_CONCURRENCY). Возвращает результаты в порядке args;
+        для задач, упавших или не успевших до deadline, — None.
+        _BulkEndpointUnsupported пробрасывается наружу.
 
-        return processed_count
+        Потоки только ходят в журнал по HTTP — в БД пишет вызывающий поток.
+        """
+        if not args:
+            return []
+        results: list = [None] * len(args)
+        executor = ThreadPoolExecutor(
+            max_workers=min(get_http_concurrency(), len(args)),
+            thread_name_prefix="journal-http",
+        )
+        try:
+            futures = {executor.submit(fn, arg): idx for idx, arg in enumerate(args)}
+            done, not_done = wait(futures, timeout=max(deadline - time.monotonic(), 0))
+            for future in done:
+                try:
+                    results[futures[future]] = future.result()
+                except _BulkEndpointUnsupported:
+                    raise
+                except Exception:
+                    logger.exception("[grade_points] Ошибка запроса к журналу")
+            if not_done:
+                logger.error(
+                    "[grade_points] Не уложились в JOURNAL_HTTP_DEADLINE_SECONDS: "
+                    "пропущено запросов к журналу %s из %s",
+                    len(not_done),
+                    len(args),
+                )
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        return results
 
     def _fetch_marks_for_student(
         self,
@@ -227,7 +748,7 @@ class GradePointsService:
                 "to": to_date.isoformat(),
             }
             try:
-                resp = requests.get(url, params=params, timeout=30)
+                resp = self._http.get(url, params=params, timeout=get_http_timeout_seconds())
                 resp.raise_for_status()
                 payload = resp.json()
                 if isinstance(payload, dict) and payload.get("error"):
@@ -301,14 +822,31 @@ class GradePointsService:
             logger.warning("[grade_points] Пропуск строки оценки: %r", item, exc_info=True)
             return None
 
-    def _is_mark_already_processed(self, jm: JournalMark) -> bool:
-        exists = self.session.execute(
-            db.select(JournalProcessedMark.id).where(
-                JournalProcessedMark.student_workflow_id == jm.student_workflow_id,
-                JournalProcessedMark.mark_set_id == jm.mark_set_id,
-                JournalProcessedMark.education_task_id == jm.education_task_id,
-                JournalProcessedMark.version == jm.version,
-            )
-        ).scalar_one_or_none()
-        return exists is not None
-
+    def _load_processed_keys(
+        self, marks: Iterable[JournalMark]
+    ) -> set[tuple[int, int, int, int]]:
+        """
+        Ключи (student_workflow_id, mark_set_id, education_task_id, version) из переданных
+        оценок, которые уже есть в journal_processed_marks. Один запрос на чанк ключей
+        вместо отдельного SELECT на каждую оценку.
+        """
+        keys = list({jm.key for jm in marks})
+        found: set[tuple[int, int, int, int]] = set()
+        key_columns = db.tuple_(
+            JournalProcessedMark.student_workflow_id,
+            JournalProcessedMark.mark_set_id,
+            JournalProcessedMark.education_task_id,
+            JournalProcessedMark.version,
+        )
+        for start in range(0, len(keys), PROCESSED_KEYS_CHUNK_SIZE):
+            chunk = keys[start:start + PROCESSED_KEYS_CHUNK_SIZE]
+            rows = self.session.execute(
+                db.select(
+                    JournalProcessedMark.student_workflow_id,
+                    JournalProcessedMark.mark_set_id,
+                    JournalProcessedMark.education_task_id,
+                    JournalProcessedMark.version,
+                ).where(key_columns.in_(chunk))
+            ).all()
+            found.update(tuple(row) for row in rows)
+        return found
@@ -0,0 +1,224 @@
+"""
+Пакетная запись результатов начисления баллов за оценки журнала.
+
+Вместо flush на каждую оценку (ради transaction.id) копим пачку и пишем её
+несколькими statement'ами:
+  1. INSERT journal_processed_marks ... ON CONFLICT DO NOTHING RETURNING — оценки,
+     которые параллельный прогон (пакетный за интервал или инкрементальный) уже
+     записал, пропускаются без IntegrityError и отката всей пачки;
+  2. INSERT point_transactions ... RETURNING id — только для реально вставленных оценок;
+  3. UPDATE journal_processed_marks SET transaction_id, INSERT notifications;
+  4. UPDATE student_profiles SET current_month_points = current_month_points + delta —
+     одна агрегированная дельта на студента.
+"""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import TYPE_CHECKING
+
+from sqlalchemy import bindparam
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from ..extensions import db
+from ..models.journal_points import JournalProcessedMark
+from ..models.notification import Notification
+from ..models.points import PointTransaction
+from ..models.student import StudentProfile
+from .leaderboard_service import mark_leaderboard_stale
+
+if TYPE_CHECKING:
+    from .grade_points_service import JournalMark
+
+
+DEFAULT_WRITE_BATCH_SIZE = 1000
+
+
+def get_write_batch_size() -> int:
+    try:
+        size = int(os.getenv("JOURNAL_WRITE_BATCH_SIZE", str(DEFAULT_WRITE_BATCH_SIZE)))
+    except ValueError:
+        size = DEFAULT_WRITE_BATCH_SIZE
+    return max(size, 1)
+
+
+@dataclass
+class _PendingMark:
+    student_id: int
+    user_id: int
+    mark: "JournalMark"
+    points: int
+    month_start: date
+
+
+class JournalIngestWriter:
+    """
+    Накопитель новых оценок журнала. add() только складывает оценку в пачку;
+    запись происходит при заполнении пачки или явном flush(). Коммит — на вызывающей стороне.
+    """
+
+    def __init__(self, session=None, batch_size: int | None = None) -> None:
+        self.session = session or db.session
+        self.batch_size = batch_size or get_write_batch_size()
+        self.written = 0
+        # Оценки, которые к моменту записи уже учёл другой прогон
+        self.skipped = 0
+        self._pending: list[_PendingMark] = []
+
+    def add(
+        self,
+        *,
+        student_id: int,
+        user_id: int,
+        mark: "JournalMark",
+        points: int,
+        month_start: date,
+    ) -> None:
+        self._pending.append(
+            _PendingMark(
+                student_id=student_id,
+                user_id=user_id,
+                mark=mark,
+                points=points,
+                month_start=month_start,
+            )
+        )
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> int:
+        """Записывает накопленную пачку. Возвращает число записанных оценок."""
+        pending = self._pending
+        if not pending:
+            return 0
+        self._pending = []
+
+        now = datetime.utcnow()
+        dialect = self.session.get_bind().dialect.name
+        insert = pg_insert if dialect == "postgresql" else sqlite_insert
+        processed = JournalProcessedMark.__table__
+        inserted_rows = self.session.execute(
+            insert(processed)
+            .on_conflict_do_nothing(
+                index_elements=[
+                    processed.c.student_workflow_id,
+                    processed.c.mark_set_id,
+                    processed.c.education_task_id,
+                    processed.c.version,
+                ]
+            )
+            .returning(
+                processed.c.id,
+                processed.c.student_workflow_id,
+                processed.c.mark_set_id,
+                processed.c.education_task_id,
+                processed.c.version,
+            ),
+            [
+                {
+                    "student_id": item.student_id,
+                    "student_workflow_id": item.mark.student_workflow_id,
+                    "mark_set_id": item.mark.mark_set_id,
+                    "education_task_id": item.mark.education_task_id,
+                    "version": item.mark.version,
+                    "mark_value": item.mark.value,
+                    "issued_at": item.mark.issued,
+                    "lesson_date": item.mark.lesson_date,
+                    "points": item.points,
+                    "transaction_id": None,
+                    "month_start": item.month_start,
+                    "processed_at": now,
+                }
+                for item in pending
+            ],
+        ).all()
+        processed_ids = {tuple(row[1:]): row[0] for row in inserted_rows}
+        inserted = [item for item in pending if item.mark.key in processed_ids]
+        self.skipped += len(pending) - len(inserted)
+        if not inserted:
+            return 0
+
+        transaction_ids = self.session.execute(
+            db.insert(PointTransaction).returning(
+                PointTransaction.id, sort_by_parameter_order=True
+            ),
+            [
+                {
+                    "student_id": item.student_id,
+                    "category_id": None,
+                    "points": item.points,
+                    "som_earned": item.points // 5 if item.points > 0 else 0,
+                    "description": f"Оценка в журнале: {item.mark.value}",
+                    "created_by": None,
+                }
+                for item in inserted
+            ],
+        ).scalars().all()
+
+        notifications = []
+        links = []
+        deltas: dict[int, int] = {}
+        for item, transaction_id in zip(inserted, transaction_ids):
+            jm = item.mark
+            points = item.points
+            if points > 0:
+                notifications.append({
+                    "user_id": item.user_id,
+                    "type": "points_added",
+                    "title": "Начислены баллы",
+                    "body": f"За оценку {jm.value} начислено {points} баллов.",
+                    "payload": {
+                        "transaction_id": transaction_id,
+                        "points": points,
+                        "source": "journal",
+                    },
+                    "is_read": False,
+                })
+            elif points < 0:
+                notifications.append({
+                    "user_id": item.user_id,
+                    "type": "points_deducted",
+                    "title": "Списаны баллы",
+                    "body": f"За оценку {jm.value} списано {abs(points)} баллов.",
+                    "payload": {
+                        "transaction_id": transaction_id,
+                        "points": points,
+                        "source": "journal",
+                    },
+                    "is_read": False,
+                })
+
+            links.append({"b_id": processed_ids[jm.key], "b_transaction_id": transaction_id})
+            deltas[item.student_id] = deltas.get(item.student_id, 0) + points
+
+        self.session.execute(
+            db.update(processed)
+            .where(processed.c.id == bindparam("b_id"))
+            .values(transaction_id=bindparam("b_transaction_id")),
+            links,
+        )
+        if notifications:
+            self.session.execute(db.insert(Notification), notifications)
+
+        delta_rows = [
+            {"b_student_id": student_id, "b_delta": delta}
+            for student_id, delta in deltas.items()
+            if delta != 0
+        ]
+        if delta_rows:
+            profiles = StudentProfile.__table__
+            self.session.execute(
+                db.update(profiles)
+                .where(profiles.c.id == bindparam("b_student_id"))
+                .values(
+                    current_month_points=profiles.c.current_month_points + bindparam("b_delta")
+                ),
+                delta_rows,
+            )
+            mark_leaderboard_stale(self.session)
+
+        self.written += len(inserted)
+        return len(inserted)
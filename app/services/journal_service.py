@@ -1,13 +1,19 @@
 import logging
 import os
-from datetime import date
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Iterable
 
 import pyodbc
+from sqlalchemy import event, exc as sa_exc
+from sqlalchemy.pool import QueuePool
 
 logger = logging.getLogger(__name__)
 
 
-def get_conn():
+def _build_conn_str() -> str:
     server = os.getenv("JOURNAL_DB_SERVER")
     db_name = os.getenv("JOURNAL_DB_NAME")
     user = os.getenv("JOURNAL_DB_USER")
@@ -15,7 +21,7 @@ def get_conn():
     encrypt = os.getenv("JOURNAL_DB_ENCRYPT")
     trust_cert = os.getenv("JOURNAL_DB_TRUST_SERVER_CERT")
 
-    conn_str = (
+    return (
         "DRIVER={ODBC Driver 18 for SQL Server};"
         f"SERVER={server};"
         f"DATABASE={db_name};"
@@ -25,11 +31,200 @@ def get_conn():
         f"TrustServerCertificate={trust_cert};"
     )
 
-    conn = pyodbc.connect(conn_str, timeout=5)
-    logger.debug("Connected to journal DB %s at %s", db_name, server)
+
+def _connect():
+    conn = pyodbc.connect(_build_conn_str(), timeout=5)
+    logger.debug(
+        "Connected to journal DB %s at %s",
+        os.getenv("JOURNAL_DB_NAME"),
+        os.getenv("JOURNAL_DB_SERVER"),
+    )
     return conn
 
 
+# ===== Пул соединений с БД журнала =====
+#
+# Пул живёт в пределах процесса: после форка (gunicorn pre-fork) дочерний процесс
+# создаёт свой пул. Унаследованный пул он не закрывает и не отдаёт сборщику мусора:
+# pyodbc закрывает соединение при удалении объекта, а сокеты этих соединений
+# продолжает использовать родитель. Ссылки на такие пулы живут до конца процесса.
+
+_pool: QueuePool | None = None
+_pool_pid: int | None = None
+_pool_lock = threading.Lock()
+_inherited_pools: list[QueuePool] = []
+
+_stats_lock = threading.Lock()
+_stats = {
+    "checkouts": 0,
+    "wait_seconds_total": 0.0,
+    "wait_seconds_max": 0.0,
+    "exhausted": 0,
+    "connects": 0,
+    "recycled_idle": 0,
+    "failed_pings": 0,
+    "invalidated": 0,
+}
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _inc_stat(name: str, value: float = 1) -> None:
+    with _stats_lock:
+        _stats[name] += value
+
+
+def _on_connect(dbapi_connection, connection_record):
+    _inc_stat("connects")
+
+
+def _on_checkin(dbapi_connection, connection_record):
+    if dbapi_connection is not None:
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    """
+    Проверка соединения при выдаче из пула: слишком долго простаивавшее
+    соединение пересоздаём, остальные проверяем «SELECT 1».
+    DisconnectionError заставляет пул выбросить соединение и открыть новое.
+    """
+    idle_timeout = _env_int("JOURNAL_DB_POOL_IDLE_TIMEOUT", 300)
+    checked_in_at = connection_record.info.get("checked_in_at")
+    if (
+        idle_timeout > 0
+        and checked_in_at is not None
+        and time.monotonic() - checked_in_at > idle_timeout
+    ):
+        _inc_stat("recycled_idle")
+        raise sa_exc.DisconnectionError("journal connection idle for too long")
+
+    try:
+        cur = dbapi_connection.cursor()
+        cur.execute("SELECT 1")
+        cur.fetchall()
+        cur.close()
+    except pyodbc.Error as e:
+        _inc_stat("failed_pings")
+        raise sa_exc.DisconnectionError("journal connection ping failed") from e
+
+
+def _forget_inherited_pool() -> None:
+    """Отцепляет пул родителя, не закрывая его соединений."""
+    global _pool, _pool_pid
+    if _pool is not None:
+        _inherited_pools.append(_pool)
+    _pool = None
+    _pool_pid = None
+
+
+def _after_fork_in_child() -> None:
+    global _pool_lock, _stats_lock
+    # Блокировки могли быть захвачены другим потоком родителя в момент fork
+    _pool_lock = threading.Lock()
+    _stats_lock = threading.Lock()
+    _forget_inherited_pool()
+    for name in _stats:
+        _stats[name] = 0
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def _get_pool() -> QueuePool:
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is not None and _pool_pid == pid:
+        return _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid != pid:
+            # Форк мимо os.register_at_fork — отцепляем так же
+            _forget_inherited_pool()
+        if _pool is None:
+            pool = QueuePool(
+                _connect,
+                pool_size=max(_env_int("JOURNAL_DB_POOL_SIZE", 5), 1),
+                max_overflow=max(_env_int("JOURNAL_DB_POOL_MAX_OVERFLOW", 5), 0),
+                timeout=max(_env_int("JOURNAL_DB_POOL_TIMEOUT", 10), 1),
+                recycle=_env_int("JOURNAL_DB_POOL_RECYCLE", 1800),
+                use_lifo=True,
+            )
+            event.listen(pool, "connect", _on_connect)
+            event.listen(pool, "checkin", _on_checkin)
+            event.listen(pool, "checkout", _on_checkout)
+            _pool = pool
+            _pool_pid = pid
+    return _pool
+
+
+def get_pool_stats() -> dict:
+    """Метрики пула журнала текущего процесса (ожидание соединения, исчерпание пула)."""
+    with _stats_lock:
+        stats = dict(_stats)
+    checkouts = stats["checkouts"]
+    stats["wait_seconds_avg"] = (
+        stats["wait_seconds_total"] / checkouts if checkouts else 0.0
+    )
+    pool = _pool if _pool_pid == os.getpid() else None
+    stats["pid"] = os.getpid()
+    stats["pool"] = (
+        {
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        }
+        if pool is not None
+        else None
+    )
+    return stats
+
+
+@contextmanager
+def get_conn():
+    """
+    Соединение с БД журнала из пула процесса. На выходе из with соединение
+    возвращается в пул (с rollback), при ошибке драйвера — выбрасывается.
+
+    Настройки: JOURNAL_DB_POOL_SIZE, JOURNAL_DB_POOL_MAX_OVERFLOW,
+    JOURNAL_DB_POOL_TIMEOUT (ожидание свободного соединения, сек),
+    JOURNAL_DB_POOL_RECYCLE (макс. возраст соединения, сек),
+    JOURNAL_DB_POOL_IDLE_TIMEOUT (макс. простой в пуле, сек).
+    """
+    pool = _get_pool()
+    started = time.monotonic()
+    try:
+        conn = pool.connect()
+    except sa_exc.TimeoutError:
+        _inc_stat("exhausted")
+        logger.warning(
+            "Journal DB pool exhausted: no free connection within %ss (%s)",
+            pool.timeout(),
+            pool.status(),
+        )
+        raise
+    waited = time.monotonic() - started
+    with _stats_lock:
+        _stats["checkouts"] += 1
+        _stats["wait_seconds_total"] += waited
+        _stats["wait_seconds_max"] = max(_stats["wait_seconds_max"], waited)
+
+    try:
+        yield conn
+    except pyodbc.Error:
+        _inc_stat("invalidated")
+        conn.invalidate()
+        raise
+    finally:
+        conn.close()
+
+
 class StudentNotFound(Exception):
     pass
 
@@ -112,6 +307,57 @@ def confirm_student_in_journal(
     return student_workflow_id
 
 
+_MARKS_SELECT_SQL = """
+    SELECT
+        swf.Id                       AS StudentWorkFlowId,
+        sewf.Id                      AS StudentEntryWorkFlowId,
+        ms.Id                        AS MarkSetId,
+
+        m.EducationTaskId,
+        m.Version,
+        m.IssuerId,
+        m.Issued,
+        m.Value,
+        m.IsRequired,
+
+        gl.[Date]                    AS LessonDate,
+        gl.[Name]                    AS LessonName,
+        ss.[Name]                    AS SubjectName,
+
+        et.[Topic]                   AS TaskTopic,
+        et.[Type]                    AS TaskType
+    FROM dbo.StudentWorkFlow swf
+    JOIN dbo.StudentEntryWorkFlow sewf
+        ON sewf.StudentWorkFlowId = swf.Id
+
+    JOIN dbo.MarkSet ms
+        ON ms.StudentEntryWorkFlowId = sewf.Id
+
+    JOIN dbo.Mark m
+        ON m.MarkSetId = ms.Id
+
+    JOIN dbo.EducationTask et
+        ON et.Id = m.EducationTaskId
+
+    JOIN dbo.GradebookLesson gl
+        ON gl.Id = et.GradebookLessonId
+
+    JOIN dbo.ScheduleSubject ss
+        ON ss.Id = gl.ScheduleSubjectId
+"""
+
+# SQL Server ограничивает число параметров запроса (2100), поэтому IN-список режем на чанки
+DEFAULT_BULK_CHUNK_SIZE = 500
+
+
+def get_bulk_chunk_size() -> int:
+    try:
+        size = int(os.getenv("JOURNAL_FETCH_BATCH_SIZE", str(DEFAULT_BULK_CHUNK_SIZE)))
+    except ValueError:
+        size = DEFAULT_BULK_CHUNK_SIZE
+    return min(max(size, 1), 2000)
+
+
 def fetch_student_marks_by_lesson_date_range(
     student_workflow_id: int,
     from_date: date,
@@ -121,44 +367,7 @@ def fetch_student_marks_by_lesson_date_range(
     Оценки студента за интервал по дате урока (GradebookLesson.Date).
     from_date включительно, to_date — верхняя граница (исключая), как в localdb.py.
     """
-    sql = """
-        SELECT
-            swf.Id                       AS StudentWorkFlowId,
-            sewf.Id                      AS StudentEntryWorkFlowId,
-            ms.Id                        AS MarkSetId,
-
-            m.EducationTaskId,
-            m.Version,
-            m.IssuerId,
-            m.Issued,
-            m.Value,
-            m.IsRequired,
-
-            gl.[Date]                    AS LessonDate,
-            gl.[Name]                    AS LessonName,
-            ss.[Name]                    AS SubjectName,
-
-            et.[Topic]                   AS TaskTopic,
-            et.[Type]                    AS TaskType
-        FROM dbo.StudentWorkFlow swf
-        JOIN dbo.StudentEntryWorkFlow sewf
-            ON sewf.StudentWorkFlowId = swf.Id
-
-        JOIN dbo.MarkSet ms
-            ON ms.StudentEntryWorkFlowId = sewf.Id
-
-        JOIN dbo.Mark m
-            ON m.MarkSetId = ms.Id
-
-        JOIN dbo.EducationTask et
-            ON et.Id = m.EducationTaskId
-
-        JOIN dbo.GradebookLesson gl
-            ON gl.Id = et.GradebookLessonId
-
-        JOIN dbo.ScheduleSubject ss
-            ON ss.Id = gl.ScheduleSubjectId
-
+    sql = _MARKS_SELECT_SQL + """
         WHERE swf.Id = ?
           AND swf.EndId IS NULL
           AND sewf.EndId IS NULL
@@ -176,3 +385,84 @@ def fetch_student_marks_by_lesson_date_range(
         cols = [c[0] for c in cur.description]
         return [dict(zip(cols, row)) for row in cur.fetchall()]
 
+
+def fetch_marks_by_lesson_date_range_bulk(
+    student_workflow_ids: Iterable[int],
+    from_date: date,
+    to_date: date,
+    chunk_size: int | None = None,
+) -> list[dict]:
+    """
+    Оценки сразу многих студентов за интервал по дате урока — тот же набор колонок,
+    что и в fetch_student_marks_by_lesson_date_range, но одним соединением и
+    запросом на чанк StudentWorkFlowId (IN-список).
+
+    Строки разных студентов различаются по колонке StudentWorkFlowId.
+    """
+    ids = sorted({int(i) for i in student_workflow_ids if i is not None})
+    if not ids:
+        return []
+
+    chunk_size = chunk_size or get_bulk_chunk_size()
+    from_s = from_date.isoformat()
+    to_s = to_date.isoformat()
+
+    result: list[dict] = []
+    with get_conn() as conn:
+        cur = conn.cursor()
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            placeholders = ", ".join("?" for _ in chunk)
+            sql = _MARKS_SELECT_SQL + f"""
+                WHERE swf.Id IN ({placeholders})
+                  AND swf.EndId IS NULL
+                  AND sewf.EndId IS NULL
+                  AND gl.[Date] >= ?
+                  AND gl.[Date] <  ?
+
+                ORDER BY swf.Id, gl.[Date] DESC, m.Issued DESC, m.EducationTaskId;
+            """
+            cur.execute(sql, *chunk, from_s, to_s)
+            cols = [c[0] for c in cur.description]
+            result.extend(dict(zip(cols, row)) for row in cur.fetchall())
+    return result
+
+
+def fetch_marks_issued_since(
+    issued_after: datetime,
+    version_after: int,
+    mark_set_after: int,
+    education_task_after: int,
+    limit: int,
+) -> list[dict]:
+    """
+    Оценки, выставленные/изменённые после водяного знака
+    (Mark.Issued, Mark.Version, MarkSet.Id, Mark.EducationTaskId), по возрастанию этого же
+    ключа. Граница строгая: ключ уникален, поэтому ни одна оценка не теряется и не приходит
+    повторно, даже если целая страница имеет одинаковые Issued и Version.
+    """
+    sql = _MARKS_SELECT_SQL + """
+        WHERE swf.EndId IS NULL
+          AND sewf.EndId IS NULL
+          AND (
+                m.Issued > ?
+             OR (m.Issued = ? AND m.Version > ?)
+             OR (m.Issued = ? AND m.Version = ? AND ms.Id > ?)
+             OR (m.Issued = ? AND m.Version = ? AND ms.Id = ? AND m.EducationTaskId > ?)
+          )
+
+        ORDER BY m.Issued, m.Version, ms.Id, m.EducationTaskId
+        OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY;
+    """
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            sql,
+            issued_after,
+            issued_after, version_after,
+            issued_after, version_after, mark_set_after,
+            issued_after, version_after, mark_set_after, education_task_after,
+            limit,
+        )
+        cols = [c[0] for c in cur.description]
+        return [dict(zip(cols, row)) for row in cur.fetchall()]
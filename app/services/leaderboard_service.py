@@ -0,0 +1,383 @@
+"""
+Рейтинг студентов: снимок с заранее посчитанными местами (leaderboard_entries).
+
+- Изменения, влияющие на место (баллы, имя, активность, появление/удаление профиля),
+  увеличивают версию ключа "leaderboard" в cache_versions. ORM-изменения ловит обработчик
+  after_flush ниже, Core-UPDATE (журнал, закрытие месяца) вызывают mark_leaderboard_stale
+  явно. Версия увеличивается после commit пишущей транзакции отдельной короткой
+  транзакцией — пишущие транзакции не держат общую строку до своего commit и не ждут
+  пересборку снимка.
+- Снимок устарел, если версия больше LeaderboardState.built_version. Пересборка запоминает
+  версию до INSERT ... SELECT row_number() OVER (...): запись, закоммиченная позже,
+  увеличит версию уже после неё, и снимок снова станет устаревшим. Пересборка идёт при
+  чтении (ensure_leaderboard_fresh) не чаще LEADERBOARD_MIN_REFRESH_SECONDS; пока она идёт,
+  параллельные читатели отдают предыдущий снимок.
+- Поля, не влияющие на место (email, фамилия, группа, total_som), в ответах читаются
+  из текущих профилей и снимок не инвалидируют.
+- Место студента и соседи — поиск по уникальному индексу (board, student_id) и
+  диапазону первичного ключа (board, rank).
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, inspect, literal
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from ..extensions import db
+from ..models.cache import CacheVersion
+from ..models.leaderboard import LeaderboardEntry, LeaderboardState
+from ..models.student import StudentProfile
+from ..models.user import User
+from ..utils.pagination import apply_keyset, keyset_predicate
+from .cache_bus import bump_cache_version
+
+
+logger = logging.getLogger(__name__)
+
+BOARDS = ("total", "month")
+
+DEFAULT_MIN_REFRESH_SECONDS = 5
+
+# Ключ в cache_versions: версия изменений, влияющих на рейтинг
+LEADERBOARD_VERSION_KEY = "leaderboard"
+
+_PENDING_INFO_KEY = "leaderboard_changed"
+
+# Поля, от которых зависит место в рейтинге и состав рейтинга
+_PROFILE_RATING_FIELDS = (
+    "total_points",
+    "current_month_points",
+    "first_name",
+    "user_id",
+)
+_USER_RATING_FIELDS = ("is_active",)
+
+
+def get_min_refresh_seconds() -> float:
+    try:
+        return max(float(os.getenv("LEADERBOARD_MIN_REFRESH_SECONDS", DEFAULT_MIN_REFRESH_SECONDS)), 0.0)
+    except ValueError:
+        return float(DEFAULT_MIN_REFRESH_SECONDS)
+
+
+def _points_column(board: str):
+    return StudentProfile.current_month_points if board == "month" else StudentProfile.total_points
+
+
+def mark_leaderboard_stale(session=None) -> None:
+    """
+    Помечает снимки устаревшими после commit текущей транзакции (при rollback — нет).
+    В самой транзакции ничего не пишет и не блокирует.
+    """
+    session = session or db.session
+    session.info[_PENDING_INFO_KEY] = True
+
+
+def _bump_leaderboard_version(bind) -> None:
+    # Отдельная транзакция: строка версии блокируется только на время одного upsert
+    try:
+        with Session(bind=bind.engine) as session:
+            bump_cache_version(LEADERBOARD_VERSION_KEY, session)
+            session.commit()
+    except SQLAlchemyError:
+        logger.exception("[leaderboard] Не удалось увеличить версию рейтинга")
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_on_commit(session):
+    if session.info.pop(_PENDING_INFO_KEY, False):
+        _bump_leaderboard_version(session.get_bind())
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _drop_pending_change(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(_PENDING_INFO_KEY, None)
+
+
+def _touches_rating(obj) -> bool:
+    if isinstance(obj, StudentProfile):
+        fields = _PROFILE_RATING_FIELDS
+    elif isinstance(obj, User):
+        fields = _USER_RATING_FIELDS
+    else:
+        return False
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in fields)
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_stale_on_flush(session, flush_context):
+    changed = any(isinstance(obj, StudentProfile) for obj in session.new) or any(
+        isinstance(obj, StudentProfile) for obj in session.deleted
+    )
+    if not changed:
+        changed = any(_touches_rating(obj) for obj in session.dirty)
+    if changed:
+        mark_leaderboard_stale(session)
+
+
+def _current_version() -> int:
+    return db.session.execute(
+        db.select(CacheVersion.version).where(CacheVersion.key == LEADERBOARD_VERSION_KEY)
+    ).scalar() or 0
+
+
+def _is_stale(state: LeaderboardState, version: int) -> bool:
+    return state.built_version is None or state.built_version < version
+
+
+def _lock_state(board: str) -> LeaderboardState | None:
+    """
+    Строка состояния под блокировкой без ожидания. None — её уже держит другой процесс
+    (пересборка идёт прямо сейчас).
+    """
+    state = db.session.execute(
+        db.select(LeaderboardState)
+        .where(LeaderboardState.board == board)
+        .with_for_update(skip_locked=True)
+    ).scalar_one_or_none()
+    if state is not None:
+        return state
+    if db.session.get(LeaderboardState, board) is not None:
+        return None
+    try:
+        with db.session.begin_nested():
+            state = LeaderboardState(board=board, entries_count=0)
+            db.session.add(state)
+    except IntegrityError:
+        return None
+    return state
+
+
+def refresh_leaderboard(board: str, force: bool = False) -> bool:
+    """
+    Пересобирает снимок board, если он устарел (или force). Делает commit.
+    Возвращает True, если снимок был пересобран.
+    """
+    state = _lock_state(board)
+    if state is None:
+        db.session.rollback()
+        return False
+    # Версия — до чтения профилей: изменения после неё снова сделают снимок устаревшим
+    version = _current_version()
+    if not (force or _is_stale(state, version)):
+        db.session.rollback()
+        return False
+
+    points = _points_column(board)
+    ranked = (
+        db.select(
+            literal(board).label("board"),
+            db.func.row_number()
+            .over(
+                order_by=(
+                    points.desc(),
+                    StudentProfile.first_name.asc().nullslast(),
+                    StudentProfile.id.asc(),
+                )
+            )
+            .label("rank"),
+            StudentProfile.id,
+            StudentProfile.user_id,
+            User.email,
+            StudentProfile.first_name,
+            StudentProfile.last_name,
+            StudentProfile.group_name,
+            db.func.coalesce(StudentProfile.total_points, 0),
+            db.func.coalesce(StudentProfile.total_som, 0),
+            db.func.coalesce(StudentProfile.current_month_points, 0),
+        )
+        .join(User, User.id == StudentProfile.user_id)
+        .where(User.is_active.is_(True))
+    )
+
+    db.session.execute(db.delete(LeaderboardEntry).where(LeaderboardEntry.board == board))
+    result = db.session.execute(
+        db.insert(LeaderboardEntry).from_select(
+            [
+                "board",
+                "rank",
+                "student_id",
+                "user_id",
+                "email",
+                "first_name",
+                "last_name",
+                "group_name",
+                "total_points",
+                "total_som",
+                "current_month_points",
+            ],
+            ranked,
+        )
+    )
+
+    state.built_version = version
+    state.entries_count = max(result.rowcount or 0, 0)
+    state.refreshed_at = datetime.utcnow()
+    db.session.commit()
+    return True
+
+
+def ensure_leaderboard_fresh(board: str) -> None:
+    """Пересобирает устаревший снимок, но не чаще LEADERBOARD_MIN_REFRESH_SECONDS."""
+    state = db.session.get(LeaderboardState, board)
+    if state is not None:
+        if not _is_stale(state, _current_version()):
+            return
+        min_interval = timedelta(seconds=get_min_refresh_seconds())
+        if state.refreshed_at and datetime.utcnow() - state.refreshed_at < min_interval:
+            return
+    refresh_leaderboard(board)
+
+
+def get_leaderboard_total(board: str) -> int:
+    state = db.session.get(LeaderboardState, board)
+    return state.entries_count if state else 0
+
+
+def get_rank_window(
+    board: str, student_id: int, window: int
+) -> tuple[LeaderboardEntry | None, list[dict]]:
+    """
+    Место студента в снимке и window соседей сверху и снизу (включая его самого).
+    (None, []) — студента нет в рейтинге.
+    """
+    entry = db.session.execute(
+        db.select(LeaderboardEntry).where(
+            LeaderboardEntry.board == board,
+            LeaderboardEntry.student_id == student_id,
+        )
+    ).scalar_one_or_none()
+    if entry is None:
+        return None, []
+
+    neighbours = load_leaderboard_entries(
+        db.select(LeaderboardEntry)
+        .where(
+            LeaderboardEntry.board == board,
+            LeaderboardEntry.rank.between(entry.rank - window, entry.rank + window),
+        )
+        .order_by(LeaderboardEntry.rank)
+    )
+    return entry, neighbours
+
+
+def load_leaderboard_entries(query) -> list[dict]:
+    """
+    Выполняет select(LeaderboardEntry)... и сериализует строки снимка; поля, не влияющие
+    на место, берутся из текущих профилей (по первичному ключу).
+    """
+    rows = db.session.execute(
+        query.outerjoin(StudentProfile, StudentProfile.id == LeaderboardEntry.student_id)
+        .outerjoin(User, User.id == StudentProfile.user_id)
+        .add_columns(
+            StudentProfile.id,
+            User.email,
+            StudentProfile.last_name,
+            StudentProfile.group_name,
+            StudentProfile.total_som,
+        )
+    ).all()
+    items = []
+    for entry, profile_id, email, last_name, group_name, total_som in rows:
+        item = serialize_leaderboard_entry(entry)
+        if profile_id is not None:
+            item.update(
+                email=email,
+                last_name=last_name,
+                group_name=group_name,
+                total_som=total_som or 0,
+            )
+        items.append(item)
+    return items
+
+
+def _rating_keys(board: str, reverse: bool = False) -> list:
+    """Порядок рейтинга (как в снимке); reverse — обратный, для строк «выше» студента."""
+    keys = [
+        ("points", _points_column(board), "desc"),
+        ("first_name", StudentProfile.first_name, "asc"),
+        ("id", StudentProfile.id, "asc"),
+    ]
+    if reverse:
+        keys = [(name, column, "asc" if d == "desc" else "desc") for name, column, d in keys]
+    return keys
+
+
+def get_live_rank_window(board: str, profile: StudentProfile, window: int) -> tuple[int, int, list[dict]]:
+    """
+    Место и соседи напрямую по student_profiles (если студента ещё нет в снимке):
+    место = 1 + число строк «выше» по индексу рейтинга, соседи — keyset-выборки в обе стороны.
+
+    Возвращает (rank, total, neighbours).
+    """
+    values = [getattr(profile, _points_column(board).key), profile.first_name, profile.id]
+    active = (
+        db.select(StudentProfile, User.email)
+        .join(User, User.id == StudentProfile.user_id)
+        .where(User.is_active.is_(True))
+    )
+
+    above_count = db.session.execute(
+        db.select(db.func.count(StudentProfile.id))
+        .join(User, User.id == StudentProfile.user_id)
+        .where(User.is_active.is_(True), keyset_predicate(_rating_keys(board, reverse=True), values))
+    ).scalar() or 0
+    total = db.session.execute(
+        db.select(db.func.count(StudentProfile.id))
+        .join(User, User.id == StudentProfile.user_id)
+        .where(User.is_active.is_(True))
+    ).scalar() or 0
+    rank = above_count + 1
+
+    above = db.session.execute(
+        apply_keyset(active, _rating_keys(board, reverse=True), values).limit(window)
+    ).all()
+    below = db.session.execute(
+        apply_keyset(active, _rating_keys(board), values).limit(window)
+    ).all()
+    email = db.session.execute(db.select(User.email).where(User.id == profile.user_id)).scalar()
+
+    rows = list(reversed(above)) + [(profile, email)] + list(below)
+    first_rank = rank - len(above)
+    neighbours = [
+        _serialize_profile_row(row_profile, row_email, first_rank + idx)
+        for idx, (row_profile, row_email) in enumerate(rows)
+    ]
+    return rank, total, neighbours
+
+
+def _serialize_profile_row(profile: StudentProfile, email: str | None, rank: int) -> dict:
+    return {
+        "rank": rank,
+        "id": profile.id,
+        "user_id": profile.user_id,
+        "email": email,
+        "first_name": profile.first_name,
+        "last_name": profile.last_name,
+        "group_name": profile.group_name,
+        "total_points": profile.total_points or 0,
+        "total_som": profile.total_som or 0,
+        "current_month_points": profile.current_month_points or 0,
+    }
+
+
+def serialize_leaderboard_entry(entry: LeaderboardEntry) -> dict:
+    return {
+        "rank": entry.rank,
+        "id": entry.student_id,
+        "user_id": entry.user_id,
+        "email": entry.email,
+        "first_name": entry.first_name,
+        "last_name": entry.last_name,
+        "group_name": entry.group_name,
+        "total_points": entry.total_points or 0,
+        "total_som": entry.total_som or 0,
+        "current_month_points": entry.current_month_points or 0,
+    }
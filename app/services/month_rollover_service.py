@@ -9,14 +9,43 @@ from __future__ import annotations
 
 from datetime import date
 
-from sqlalchemy import select
+from sqlalchemy import case, or_, select
 
 from ..extensions import db
+from ..models.notification import Notification
 from ..models.student import StudentProfile
 from ..models.user import User
+from .leaderboard_service import mark_leaderboard_stale
 from .notification_service import create_notification
 
 
+def _month_closed_notifications(user_id: int, mp: int) -> list[dict]:
+    """Уведомления о закрытии месяца с mp баллами (аргументы для create_notification)."""
+    if mp == 0:
+        return []
+    som_add = max(0, mp) // 5
+    items = [
+        {
+            "user_id": user_id,
+            "notification_type": "month_points_closed",
+            "title": "Баллы за месяц перенесены в общий счет",
+            "body": f"Перенесено {mp} баллов за прошлый месяц.",
+            "payload": {"moved_points": mp, "som_added": som_add},
+        }
+    ]
+    if som_add > 0:
+        items.append(
+            {
+                "user_id": user_id,
+                "notification_type": "som_added",
+                "title": "Начислены SOM",
+                "body": f"Вам начислено {som_add} SOM за прошлый месяц.",
+                "payload": {"som_added": som_add, "moved_points": mp},
+            }
+        )
+    return items
+
+
 def sync_profile_to_calendar_month(
     profile: StudentProfile,
     today: date | None = None,
@@ -43,52 +72,119 @@ def sync_profile_to_calendar_month(
             som_add = positive // 5
             if som_add > 0:
                 profile.total_som = (profile.total_som or 0) + som_add
-            create_notification(
-                user_id=profile.user_id,
-                notification_type="month_points_closed",
-                title="Баллы за месяц перенесены в общий счет",
-                body=f"Перенесено {mp} баллов за прошлый месяц.",
-                payload={"moved_points": mp, "som_added": som_add},
-            )
-            if som_add > 0:
-                create_notification(
-                    user_id=profile.user_id,
-                    notification_type="som_added",
-                    title="Начислены SOM",
-                    body=f"Вам начислено {som_add} SOM за прошлый месяц.",
-                    payload={"som_added": som_add, "moved_points": mp},
-                )
+            for kwargs in _month_closed_notifications(profile.user_id, mp):
+                create_notification(**kwargs)
 
     profile.current_month_points = 0
     profile.current_month_started_at = month_start
     return True
 
 
-def rollover_all_active_students(as_of: date | None = None) -> tuple[int, int]:
+def _stale_profiles_filter(month_start: date):
+    profiles = StudentProfile.__table__
+    return (
+        User.role == "student",
+        User.is_active.is_(True),
+        or_(
+            profiles.c.current_month_started_at.is_(None),
+            profiles.c.current_month_started_at != month_start,
+        ),
+    )
+
+
+def _rollover_set_based(month_start: date) -> list[tuple[int, int]]:
     """
-    Синхронизирует всех активных студентов с календарным месяцем as_of (по умолчанию сегодня).
+    Один UPDATE ... FROM (SELECT ... FOR UPDATE) ... RETURNING по всем «устаревшим» профилям.
+    Подзапрос блокирует строки и фиксирует перенесённые баллы, поэтому RETURNING отдаёт
+    ровно то значение current_month_points, которое ушло в total_points.
 
-    Вызывать 1-го числа после finalize_month за предыдущий месяц.
+    Возвращает [(user_id, moved_points), ...].
+    """
+    profiles = StudentProfile.__table__
+    stale = (
+        select(
+            profiles.c.id.label("profile_id"),
+            profiles.c.current_month_points.label("moved"),
+        )
+        .join(User, User.id == profiles.c.user_id)
+        .where(*_stale_profiles_filter(month_start))
+        .with_for_update(of=profiles)
+        .subquery("stale")
+    )
+    moved = stale.c.moved
+    stmt = (
+        db.update(profiles)
+        .where(profiles.c.id == stale.c.profile_id)
+        .values(
+            total_points=profiles.c.total_points + moved,
+            # SOM: max(0, mp) // 5 — как в sync_profile_to_calendar_month
+            total_som=profiles.c.total_som + case((moved > 0, moved // 5), else_=0),
+            current_month_points=0,
+            current_month_started_at=month_start,
+        )
+        .returning(profiles.c.user_id, moved)
+    )
+    return [(row[0], row[1] or 0) for row in db.session.execute(stmt)]
 
-    Возвращает (число профилей с изменениями, сумма баллов, ушедших в total_points).
+
+def _rollover_per_profile(month_start: date) -> list[tuple[int, int]]:
+    """
+    Построчный вариант для СУБД без RETURNING из FROM-таблиц (SQLite в локальной разработке).
     """
-    as_of = as_of or date.today()
     stmt = (
         select(StudentProfile)
         .join(User, User.id == StudentProfile.user_id)
-        .where(User.role == "student", User.is_active.is_(True))
+        .where(*_stale_profiles_filter(month_start))
     )
-    profiles = db.session.execute(stmt).scalars().all()
+    result = []
+    for profile in db.session.execute(stmt).scalars():
+        mp = profile.current_month_points or 0
+        profile.total_points = (profile.total_points or 0) + mp
+        profile.total_som = (profile.total_som or 0) + max(0, mp) // 5
+        profile.current_month_points = 0
+        profile.current_month_started_at = month_start
+        result.append((profile.user_id, mp))
+    return result
 
-    changed = 0
-    total_moved = 0
-    for profile in profiles:
-        mp_before = profile.current_month_points or 0
-        if sync_profile_to_calendar_month(profile, as_of):
-            changed += 1
-            if mp_before != 0:
-                total_moved += mp_before
 
+def rollover_all_active_students(as_of: date | None = None) -> tuple[int, int]:
+    """
+    Синхронизирует всех активных студентов с календарным месяцем as_of (по умолчанию сегодня).
+
+    Вызывать 1-го числа после finalize_month за предыдущий месяц.
+    Результат тот же, что у sync_profile_to_calendar_month по каждому профилю, но на Postgres
+    это один UPDATE и один пакетный INSERT уведомлений. Повторный запуск ничего не меняет:
+    обработанные профили уже помечены текущим месяцем.
+
+    Возвращает (число профилей с изменениями, сумма баллов, ушедших в total_points).
+    """
+    as_of = as_of or date.today()
+    month_start = date(as_of.year, as_of.month, 1)
+
+    if db.session.get_bind().dialect.name == "postgresql":
+        rows = _rollover_set_based(month_start)
+    else:
+        rows = _rollover_per_profile(month_start)
+    if rows:
+        mark_leaderboard_stale()
+
+    notifications = [
+        {
+            "user_id": kwargs["user_id"],
+            "type": kwargs["notification_type"],
+            "title": kwargs["title"],
+            "body": kwargs["body"],
+            "payload": kwargs["payload"],
+            "is_read": False,
+        }
+        for user_id, mp in rows
+        for kwargs in _month_closed_notifications(user_id, mp)
+    ]
+    if notifications:
+        db.session.execute(db.insert(Notification), notifications)
+
+    changed = len(rows)
+    total_moved = sum(mp for _, mp in rows)
     if changed:
         db.session.commit()
     return changed, total_moved
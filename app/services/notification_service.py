@@ -1,12 +1,34 @@
 from __future__ import annotations
 
+import os
+from datetime import datetime, timedelta
 from typing import Iterable
 
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+
 from ..extensions import db
-from ..models.notification import Notification
+from ..models.notification import (
+    BroadcastNotification,
+    Notification,
+    NotificationBroadcastCursor,
+)
 from ..models.user import User
 
 
+# Рассылки моложе этого окна ещё могут быть в незакоммиченных транзакциях с меньшим id,
+# поэтому курсор за них не сдвигается (см. deliver_pending_broadcasts)
+DEFAULT_BROADCAST_SETTLE_SECONDS = 300
+
+
+def get_broadcast_settle_seconds() -> float:
+    try:
+        return max(float(os.getenv("BROADCAST_SETTLE_SECONDS", DEFAULT_BROADCAST_SETTLE_SECONDS)), 0.0)
+    except ValueError:
+        return float(DEFAULT_BROADCAST_SETTLE_SECONDS)
+
+
 def create_notification(
     *,
     user_id: int,
@@ -47,6 +69,145 @@ def create_notifications_for_users(
     return len(unique_ids)
 
 
+def create_broadcast_notification(
+    *,
+    audience_role: str,
+    notification_type: str,
+    title: str,
+    body: str | None = None,
+    payload: dict | None = None,
+    exclude_user_id: int | None = None,
+) -> BroadcastNotification:
+    """
+    Уведомление всем активным пользователям роли audience_role одной строкой —
+    время запроса не зависит от числа пользователей. Пользователь получает его
+    в свои notifications при следующем чтении (deliver_pending_broadcasts).
+    """
+    broadcast = BroadcastNotification(
+        audience_role=audience_role,
+        exclude_user_id=exclude_user_id,
+        type=notification_type,
+        title=title,
+        body=body,
+        payload=payload or None,
+    )
+    db.session.add(broadcast)
+    return broadcast
+
+
+def _claim_broadcasts(user_id: int, last_id: int, new_last_id: int, has_cursor: bool) -> bool:
+    """
+    Сдвигает курсор пользователя с last_id на new_last_id. False — если курсор уже сдвинул
+    параллельный запрос (тогда рассылки доставляет он, повторно не копируем).
+    """
+    if has_cursor:
+        result = db.session.execute(
+            db.update(NotificationBroadcastCursor)
+            .where(
+                NotificationBroadcastCursor.user_id == user_id,
+                NotificationBroadcastCursor.last_broadcast_id == last_id,
+            )
+            .values(last_broadcast_id=new_last_id)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    try:
+        with db.session.begin_nested():
+            db.session.execute(
+                db.insert(NotificationBroadcastCursor).values(
+                    user_id=user_id,
+                    last_broadcast_id=new_last_id,
+                )
+            )
+    except IntegrityError:
+        return False
+    return True
+
+
+def deliver_pending_broadcasts(user: User) -> int:
+    """
+    Копирует в notifications пользователя рассылки, появившиеся после его курсора
+    (только для его роли и не старше его регистрации — как раньше, когда получатели
+    выбирались в момент создания). Делает commit, если что-то доставлено или курсор сдвинулся.
+
+    id рассылки выделяется до commit, поэтому рассылка с меньшим id может стать видимой
+    позже рассылки с большим. Курсор сдвигается только до рассылок старше
+    BROADCAST_SETTLE_SECONDS (их транзакции уже завершены); более новые доставляются сразу,
+    а повторная доставка исключается по notifications.broadcast_id.
+
+    Возвращает число доставленных уведомлений.
+    """
+    if not user.is_active:
+        return 0
+
+    cursor = db.session.get(NotificationBroadcastCursor, user.id)
+    last_id = cursor.last_broadcast_id if cursor else 0
+    settled_before = datetime.utcnow() - timedelta(seconds=get_broadcast_settle_seconds())
+    new_last_id = db.session.execute(
+        db.select(db.func.max(BroadcastNotification.id)).where(
+            BroadcastNotification.id > last_id,
+            BroadcastNotification.created_at < settled_before,
+        )
+    ).scalar()
+
+    delivered = (
+        db.select(Notification.id)
+        .where(
+            Notification.user_id == user.id,
+            Notification.broadcast_id == BroadcastNotification.id,
+        )
+        .exists()
+    )
+    broadcasts = db.session.execute(
+        db.select(BroadcastNotification)
+        .where(
+            BroadcastNotification.id > last_id,
+            BroadcastNotification.audience_role == user.role,
+            BroadcastNotification.created_at >= user.created_at,
+            db.or_(
+                BroadcastNotification.exclude_user_id.is_(None),
+                BroadcastNotification.exclude_user_id != user.id,
+            ),
+            ~delivered,
+        )
+        .order_by(BroadcastNotification.id)
+    ).scalars().all()
+    if new_last_id is None and not broadcasts:
+        return 0
+
+    if new_last_id is not None and not _claim_broadcasts(
+        user.id, last_id, new_last_id, has_cursor=cursor is not None
+    ):
+        db.session.rollback()
+        return 0
+
+    inserted = 0
+    if broadcasts:
+        insert = pg_insert if db.session.get_bind().dialect.name == "postgresql" else sqlite_insert
+        # Параллельный запрос мог доставить ту же (ещё не закрытую курсором) рассылку
+        result = db.session.execute(
+            insert(Notification)
+            .values([
+                {
+                    "user_id": user.id,
+                    "type": item.type,
+                    "title": item.title,
+                    "body": item.body,
+                    "payload": item.payload,
+                    "is_read": False,
+                    "created_at": item.created_at,
+                    "broadcast_id": item.id,
+                }
+                for item in broadcasts
+            ])
+            .on_conflict_do_nothing(index_elements=["user_id", "broadcast_id"])
+        )
+        inserted = max(result.rowcount or 0, 0)
+    db.session.commit()
+    return inserted
+
+
 def get_active_student_user_ids(exclude_user_id: int | None = None) -> list[int]:
     query = db.select(User.id).where(User.role == "student", User.is_active.is_(True))
     if exclude_user_id is not None:
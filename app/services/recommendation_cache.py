@@ -0,0 +1,209 @@
+"""
+Кэш ранжированных рекомендаций в памяти процесса.
+
+Для студента хранится список лучших кандидатов с оценками (не больше
+RECOMMENDATION_CACHE_DEPTH, по умолчанию 500) и общее число кандидатов; страница — срез
+этого списка, профили кандидатов страницы по-прежнему читаются из БД. Страницы глубже
+сохранённого списка считаются без кэша.
+
+Ключ — кортеж, первый элемент которого — вид рекомендаций ("interests", "roles", "team"),
+второй — profile_id студента; остальное — всё, от чего ещё зависит ранжирование
+(маска интересов/ролей, профиль весов). Для каждого вида регистрируется сигнатура кандидата
+(register_kind): значение, от которого зависит оценка кандидата по этому ключу.
+
+Актуальность — по индексу services/similarity_index.py (add_publish_listener):
+  - запись действительна только для версии индекса, с которой посчитана;
+  - при частичном обновлении индекса удаляются записи изменённых студентов и записи,
+    где у изменённого кандидата поменялась сигнатура или активность (анкета, деактивация);
+    остальные переносятся на новую версию;
+  - полная пересборка индекса (изменения из другого процесса) очищает кэш.
+Кроме того, записи живут не дольше RECOMMENDATION_CACHE_TTL_SECONDS (300), а при
+превышении RECOMMENDATION_CACHE_MAX_ENTRIES (2000) вытесняются давно не использованные.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable
+
+from .similarity_index import SimilarityIndex, add_publish_listener
+
+
+DEFAULT_MAX_ENTRIES = 2000
+DEFAULT_TTL_SECONDS = 300
+DEFAULT_DEPTH = 500
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(int(os.getenv(name, str(default))), 0)
+    except ValueError:
+        return default
+
+
+def get_max_entries() -> int:
+    return _env_int("RECOMMENDATION_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)
+
+
+def get_ttl_seconds() -> int:
+    return _env_int("RECOMMENDATION_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)
+
+
+def get_depth() -> int:
+    return _env_int("RECOMMENDATION_CACHE_DEPTH", DEFAULT_DEPTH)
+
+
+@dataclass
+class _Entry:
+    version: int
+    created_at: float
+    total: int
+    # [(profile_id, ...оценки)] по убыванию оценки
+    items: list
+    # items содержит всех кандидатов, а не только первые depth
+    complete: bool
+
+
+_lock = threading.Lock()
+_entries: OrderedDict[tuple, _Entry] = OrderedDict()
+# Версия последнего опубликованного индекса (None — индекс ещё не строился)
+_index_version: int | None = None
+# вид -> signature(index, key, profile_id)
+_signatures: dict[str, Callable[[SimilarityIndex, tuple, int], object]] = {}
+
+_stats = {
+    "hits": 0,
+    "misses": 0,
+    "bypassed": 0,
+    "expired": 0,
+    "evicted": 0,
+    "invalidated": 0,
+    "clears": 0,
+}
+
+
+def register_kind(kind: str, signature: Callable[[SimilarityIndex, tuple, int], object]) -> None:
+    """
+    signature(index, key, profile_id) — от чего зависит оценка кандидата profile_id
+    для ключа key; активность кандидата сравнивается отдельно.
+    """
+    _signatures[kind] = signature
+
+
+def get_ranked(
+    index: SimilarityIndex,
+    key: tuple,
+    compute: Callable[[int, int], tuple[int, list]],
+    offset: int,
+    limit: int,
+) -> tuple[int, list]:
+    """
+    (total, items страницы) для ключа. compute(offset, limit) -> (total, items) считает
+    ранжирование по index; при промахе вызывается с (0, depth) и результат сохраняется.
+    """
+    if key[0] not in _signatures:
+        raise ValueError(f"unknown recommendation kind {key[0]!r}")
+    ttl = get_ttl_seconds()
+    depth = get_depth()
+    max_entries = get_max_entries()
+    if not ttl or not depth or not max_entries:
+        return compute(offset, limit)
+
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and time.monotonic() - entry.created_at >= ttl:
+            del _entries[key]
+            _stats["expired"] += 1
+            entry = None
+        if entry is not None and entry.version != index.version:
+            entry = None
+        if entry is not None and not _covers(entry, offset, limit):
+            _stats["bypassed"] += 1
+        elif entry is not None:
+            _entries.move_to_end(key)
+            _stats["hits"] += 1
+            return entry.total, entry.items[offset:offset + limit]
+        else:
+            _stats["misses"] += 1
+    if entry is not None:
+        return compute(offset, limit)
+
+    total, items = compute(0, depth)
+    entry = _Entry(
+        version=index.version,
+        created_at=time.monotonic(),
+        total=total,
+        items=items,
+        complete=len(items) < depth,
+    )
+    with _lock:
+        # Индекс мог обновиться, пока считали: результат по старой версии не сохраняем
+        if _index_version is None or _index_version == index.version:
+            _entries[key] = entry
+            _entries.move_to_end(key)
+            while len(_entries) > max_entries:
+                _entries.popitem(last=False)
+                _stats["evicted"] += 1
+    if _covers(entry, offset, limit):
+        return total, items[offset:offset + limit]
+    return compute(offset, limit)
+
+
+def _covers(entry: _Entry, offset: int, limit: int) -> bool:
+    return entry.complete or offset + limit <= len(entry.items)
+
+
+def clear() -> None:
+    """Очищает кэш текущего процесса."""
+    with _lock:
+        _entries.clear()
+        _stats["clears"] += 1
+
+
+def get_cache_stats() -> dict:
+    """Метрики кэша текущего процесса."""
+    with _lock:
+        stats = dict(_stats)
+        stats["entries"] = len(_entries)
+    lookups = stats["hits"] + stats["misses"] + stats["bypassed"]
+    stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+    stats["pid"] = os.getpid()
+    return stats
+
+
+def _on_index_published(previous: SimilarityIndex | None, index: SimilarityIndex) -> None:
+    global _index_version
+    with _lock:
+        _index_version = index.version
+        if not _entries:
+            return
+        if previous is None or index.changed is None or index.changed[0] != previous.version:
+            _entries.clear()
+            _stats["clears"] += 1
+            return
+        changed = index.changed[1]
+        for key in list(_entries):
+            entry = _entries[key]
+            if entry.version != previous.version or key[1] in changed or _affected(
+                _signatures[key[0]], key, changed, previous, index
+            ):
+                del _entries[key]
+                _stats["invalidated"] += 1
+            else:
+                entry.version = index.version
+
+
+def _affected(signature, key: tuple, changed, previous: SimilarityIndex, index: SimilarityIndex) -> bool:
+    for profile_id in changed:
+        if previous.is_active(profile_id) != index.is_active(profile_id):
+            return True
+        if signature(previous, key, profile_id) != signature(index, key, profile_id):
+            return True
+    return False
+
+
+add_publish_listener(_on_index_published)
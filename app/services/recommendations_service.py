@@ -1,15 +1,45 @@
 """
 Сервис для генерации рекомендаций студентов на основе навыков, интересов и ролей.
+
+Число запросов не зависит от размера страницы: общие интересы и роли всех студентов страницы
+загружаются одним запросом (student_id IN (...)), а названия берутся из кэша справочников.
+
+Подсчёт совпадений по умолчанию идёт по матрицам признаков в памяти (NumPy,
+services/team_matching.py, построены из индекса services/similarity_index.py);
+RECOMMENDATIONS_ENGINE=sql — прежний путь через GROUP BY в БД. Ранжированные списки индексного
+пути кэшируются по студенту (services/recommendation_cache.py): листание страниц берёт срез
+готового списка.
 """
+import os
+from collections import defaultdict
 from typing import List, Dict, Any
 from sqlalchemy import func, and_
 
 from ..extensions import db
 from ..models.student import StudentProfile
-from ..models.student_questionnaire import StudentInterest, StudentRole, StudentSkill
+from ..models.student_questionnaire import StudentInterest, StudentRole
 from ..models.user import User
-from ..models.interests import Interest
-from ..models.roles import Role
+from .recommendation_cache import get_ranked, register_kind
+from .reference_catalog import get_reference_catalog
+from .similarity_index import bits_to_ids, ids_to_bits
+from .team_matching import get_team_matrix, rank_common_interests, rank_complementary_roles
+
+
+# Ключи кэша: (вид, profile_id студента, маска его интересов/ролей)
+register_kind("interests", lambda index, key, profile_id: (index.interest_bits(profile_id) & key[2]).bit_count())
+register_kind("roles", lambda index, key, profile_id: (index.role_bits(profile_id) & ~key[2]).bit_count())
+
+
+def _use_index() -> bool:
+    return os.getenv("RECOMMENDATIONS_ENGINE", "index").strip().lower() != "sql"
+
+
+def _group_by_student(rows) -> Dict[int, List[int]]:
+    """[(student_id, item_id), ...] -> {student_id: [item_id, ...]} (item_id по возрастанию)."""
+    grouped = defaultdict(list)
+    for student_id, item_id in rows:
+        grouped[student_id].append(item_id)
+    return grouped
 
 
 def get_student_recommendations(
@@ -58,7 +88,11 @@ def get_student_recommendations(
     
     # Если у студента есть интересы - ищем по общим интересам
     if current_interests:
-        recommendations_by_interests_data = _get_recommendations_by_interests(
+        get_by_interests = (
+            _get_recommendations_by_interests_indexed if _use_index()
+            else _get_recommendations_by_interests
+        )
+        recommendations_by_interests_data = get_by_interests(
             student_id, current_interests, interests_page, interests_per_page
         )
     else:
@@ -76,7 +110,11 @@ def get_student_recommendations(
     
     # Если у студента есть роли - ищем по дополняющим ролям
     if current_roles:
-        recommendations_by_roles_data = _get_recommendations_by_roles(
+        get_by_roles = (
+            _get_recommendations_by_roles_indexed if _use_index()
+            else _get_recommendations_by_roles
+        )
+        recommendations_by_roles_data = get_by_roles(
             student_id, current_roles, roles_page, roles_per_page
         )
     else:
@@ -150,32 +188,33 @@ def _get_recommendations_by_interests(
         .join(User, StudentProfile.user_id == User.id)
         .join(subquery, StudentProfile.id == subquery.c.student_id)
         .where(User.is_active == True)
-        .order_by(subquery.c.common_interests_count.desc())
+        .order_by(subquery.c.common_interests_count.desc(), StudentProfile.id.asc())
         .offset(offset)
         .limit(per_page)
     ).all()
     
-    recommendations = []
-    for profile, user, common_count in results:
-        # Получаем общие интересы для отображения
-        common_interests = db.session.execute(
-            db.select(StudentInterest.interest_id)
+    # Общие интересы всех студентов страницы — одним запросом
+    common_by_student = {}
+    if results:
+        common_by_student = _group_by_student(db.session.execute(
+            db.select(StudentInterest.student_id, StudentInterest.interest_id)
             .where(
                 and_(
-                    StudentInterest.student_id == profile.id,
+                    StudentInterest.student_id.in_([profile.id for profile, _, _ in results]),
                     StudentInterest.interest_id.in_(current_interest_ids)
                 )
             )
-        ).scalars().all()
-        
-        # Получаем названия общих интересов
-        interest_names = []
-        if common_interests:
-            interests = db.session.execute(
-                db.select(Interest.name)
-                .where(Interest.id.in_(common_interests))
-            ).scalars().all()
-            interest_names = list(interests)
+            .order_by(StudentInterest.student_id, StudentInterest.interest_id)
+        ).all())
+    interest_names_by_id = get_reference_catalog().interest_names
+    
+    recommendations = []
+    for profile, user, common_count in results:
+        interest_names = [
+            interest_names_by_id[interest_id]
+            for interest_id in common_by_student.get(profile.id, [])
+            if interest_id in interest_names_by_id
+        ]
         
         recommendations.append({
             "student_id": profile.id,
@@ -252,30 +291,28 @@ def _get_recommendations_by_roles(
         .join(User, StudentProfile.user_id == User.id)
         .join(subquery, StudentProfile.id == subquery.c.student_id)
         .where(User.is_active == True)
-        .order_by(subquery.c.roles_count.desc())
+        .order_by(subquery.c.roles_count.desc(), StudentProfile.id.asc())
         .offset(offset)
         .limit(per_page)
     ).all()
     
+    # Все роли студентов страницы — одним запросом
+    roles_by_student = {}
+    if results:
+        roles_by_student = _group_by_student(db.session.execute(
+            db.select(StudentRole.student_id, StudentRole.role_id)
+            .where(StudentRole.student_id.in_([profile.id for profile, _, _ in results]))
+            .order_by(StudentRole.student_id, StudentRole.role_id)
+        ).all())
+    roles_by_id = get_reference_catalog().roles_by_id
+    
     recommendations = []
     for profile, user, roles_count in results:
-        # Получаем роли рекомендованного студента
-        student_roles = db.session.execute(
-            db.select(StudentRole.role_id)
-            .where(StudentRole.student_id == profile.id)
-        ).scalars().all()
-        
-        # Получаем роли рекомендованного студента
-        roles_data = []
-        if student_roles:
-            roles = db.session.execute(
-                db.select(Role)
-                .where(Role.id.in_(student_roles))
-            ).scalars().all()
-            roles_data = [
-                {"id": role.id, "code": role.code, "name": role.name}
-                for role in roles
-            ]
+        roles_data = [
+            dict(roles_by_id[role_id])
+            for role_id in roles_by_student.get(profile.id, [])
+            if role_id in roles_by_id
+        ]
         
         recommendations.append({
             "student_id": profile.id,
@@ -300,3 +337,119 @@ def _get_recommendations_by_roles(
             "has_prev": page > 1
         }
     }
+
+
+def _pagination(page: int, per_page: int, total_count: int) -> Dict[str, Any]:
+    total_pages = (total_count + per_page - 1) // per_page if total_count > 0 else 0
+    return {
+        "page": page,
+        "per_page": per_page,
+        "total": total_count,
+        "pages": total_pages,
+        "has_next": page < total_pages,
+        "has_prev": page > 1
+    }
+
+
+def _load_profiles(profile_ids: List[int]) -> Dict[int, Any]:
+    """Профили и пользователи страницы одним запросом: {profile_id: (profile, user)}."""
+    if not profile_ids:
+        return {}
+    rows = db.session.execute(
+        db.select(StudentProfile, User)
+        .join(User, StudentProfile.user_id == User.id)
+        .where(StudentProfile.id.in_(profile_ids))
+    ).all()
+    return {profile.id: (profile, user) for profile, user in rows}
+
+
+def _get_recommendations_by_interests_indexed(
+    current_student_id: int,
+    current_interest_ids: List[int],
+    page: int = 1,
+    per_page: int = 20
+) -> Dict[str, Any]:
+    """То же, что _get_recommendations_by_interests, но совпадения считаются по индексу."""
+    matrix = get_team_matrix()
+    index = matrix.index
+    current_bits = ids_to_bits(current_interest_ids)
+    total_count, matches = get_ranked(
+        index,
+        ("interests", current_student_id, current_bits),
+        lambda offset, limit: rank_common_interests(
+            matrix, current_student_id, current_interest_ids, offset, limit
+        ),
+        (page - 1) * per_page,
+        per_page,
+    )
+    profiles = _load_profiles([profile_id for profile_id, _ in matches])
+    interest_names_by_id = get_reference_catalog().interest_names
+
+    recommendations = []
+    for profile_id, common_count in matches:
+        if profile_id not in profiles:
+            continue
+        profile, user = profiles[profile_id]
+        common_ids = bits_to_ids(index.interest_bits(profile_id) & current_bits)
+        recommendations.append({
+            "student_id": profile.id,
+            "user_id": user.id,
+            "email": user.email,
+            "first_name": profile.first_name,
+            "last_name": profile.last_name,
+            "group_name": profile.group_name,
+            "common_interests_count": common_count,
+            "common_interests": [
+                interest_names_by_id[interest_id]
+                for interest_id in common_ids
+                if interest_id in interest_names_by_id
+            ],
+            "match_type": "interests"
+        })
+
+    return {"items": recommendations, "pagination": _pagination(page, per_page, total_count)}
+
+
+def _get_recommendations_by_roles_indexed(
+    current_student_id: int,
+    current_role_ids: List[int],
+    page: int = 1,
+    per_page: int = 20
+) -> Dict[str, Any]:
+    """То же, что _get_recommendations_by_roles, но совпадения считаются по индексу."""
+    matrix = get_team_matrix()
+    index = matrix.index
+    total_count, matches = get_ranked(
+        index,
+        ("roles", current_student_id, ids_to_bits(current_role_ids)),
+        lambda offset, limit: rank_complementary_roles(
+            matrix, current_student_id, current_role_ids, offset, limit
+        ),
+        (page - 1) * per_page,
+        per_page,
+    )
+    profiles = _load_profiles([profile_id for profile_id, _ in matches])
+    roles_by_id = get_reference_catalog().roles_by_id
+
+    recommendations = []
+    for profile_id, roles_count in matches:
+        if profile_id not in profiles:
+            continue
+        profile, user = profiles[profile_id]
+        recommendations.append({
+            "student_id": profile.id,
+            "user_id": user.id,
+            "email": user.email,
+            "first_name": profile.first_name,
+            "last_name": profile.last_name,
+            "group_name": profile.group_name,
+            "roles_count": roles_count,
+            "roles": [
+                dict(roles_by_id[role_id])
+                for role_id in bits_to_ids(index.role_bits(profile_id))
+                if role_id in roles_by_id
+            ],
+            "match_type": "roles"
+        })
+
+    return {"items": recommendations, "pagination": _pagination(page, per_page, total_count)}
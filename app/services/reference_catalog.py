@@ -0,0 +1,118 @@
+"""
+Кэш справочников в памяти процесса: категории навыков, навыки, интересы, роли.
+
+Справочники меняются несколько раз в год, а читаются на каждом открытии анкеты и фильтров.
+Снимок собирается четырьмя запросами и держит готовый JSON каждого ответа со строгим ETag —
+эндпоинты отдают его без обращения к БД и отвечают 304 на If-None-Match.
+
+Снимок — кэш с ключом "reference_catalog" в шине инвалидации (services/cache_bus.py):
+любое ORM-изменение справочников (админка, seed_data.py) увеличивает версию ключа,
+и каждый воркер пересобирает снимок при следующем чтении.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass, field
+
+from flask import Response, current_app, request
+
+from ..extensions import db
+from ..models.interests import Interest
+from ..models.roles import Role
+from ..models.skills import Skill, SkillCategory
+from .cache_bus import cached_loader
+
+
+CACHE_CONTROL = "private, no-cache"
+
+
+@dataclass
+class ReferenceCatalog:
+    """Снимок справочников. Не изменять — один объект разделяют все потоки воркера."""
+
+    skill_categories: list[dict]
+    skills: list[dict]
+    interests: list[dict]
+    roles: list[dict]
+    category_names: dict[int, str] = field(default_factory=dict)
+    skill_names: dict[int, str] = field(default_factory=dict)
+    skill_category_ids: dict[int, int] = field(default_factory=dict)
+    interest_names: dict[int, str] = field(default_factory=dict)
+    role_names: dict[int, str] = field(default_factory=dict)
+    roles_by_id: dict[int, dict] = field(default_factory=dict)
+    # ключ ответа -> (тело JSON, ETag)
+    payloads: dict[str, tuple[bytes, str]] = field(default_factory=dict)
+
+
+def _encode(payload) -> tuple[bytes, str]:
+    # Тот же JSON, что отдал бы jsonify (форматирование зависит от настроек приложения)
+    body = current_app.json.response(payload).get_data()
+    return body, hashlib.sha256(body).hexdigest()[:32]
+
+
+@cached_loader("reference_catalog", models=(SkillCategory, Skill, Interest, Role))
+def get_reference_catalog() -> ReferenceCatalog:
+    """Текущий снимок справочников (пересобирается после изменений). Нужен контекст приложения."""
+    categories = db.session.execute(
+        db.select(SkillCategory.id, SkillCategory.name).order_by(SkillCategory.name.asc())
+    ).all()
+    skills = db.session.execute(
+        db.select(Skill.id, Skill.name, Skill.category_id).order_by(Skill.name.asc())
+    ).all()
+    interests = db.session.execute(
+        db.select(Interest.id, Interest.name).order_by(Interest.name.asc())
+    ).all()
+    roles = db.session.execute(
+        db.select(Role.id, Role.code, Role.name).order_by(Role.name.asc())
+    ).all()
+
+    category_names = {cat_id: name for cat_id, name in categories}
+    catalog = ReferenceCatalog(
+        skill_categories=[{"id": cat_id, "name": name} for cat_id, name in categories],
+        skills=[
+            {
+                "id": skill_id,
+                "name": name,
+                "category": {"id": category_id, "name": category_names.get(category_id)},
+            }
+            for skill_id, name, category_id in skills
+        ],
+        interests=[{"id": interest_id, "name": name} for interest_id, name in interests],
+        roles=[{"id": role_id, "code": code, "name": name} for role_id, code, name in roles],
+        category_names=category_names,
+        skill_names={skill_id: name for skill_id, name, _ in skills},
+        skill_category_ids={skill_id: category_id for skill_id, _, category_id in skills},
+        interest_names={interest_id: name for interest_id, name in interests},
+        role_names={role_id: name for role_id, _, name in roles},
+    )
+    catalog.roles_by_id = {role["id"]: role for role in catalog.roles}
+
+    skills_by_category: dict[int, list[dict]] = {cat_id: [] for cat_id, _ in categories}
+    for skill_id, name, category_id in skills:
+        skills_by_category.setdefault(category_id, []).append({"id": skill_id, "name": name})
+
+    catalog.payloads = {
+        "skill_categories": _encode(catalog.skill_categories),
+        "skills": _encode(catalog.skills),
+        "interests": _encode(catalog.interests),
+        "roles": _encode(catalog.roles),
+        "filters_skills": _encode({
+            "skill_categories": [
+                {"category": {"id": cat_id, "name": name}, "skills": skills_by_category[cat_id]}
+                for cat_id, name in categories
+            ]
+        }),
+        "filters_roles": _encode({"roles": catalog.roles}),
+        "filters_interests": _encode({"interests": catalog.interests}),
+    }
+    return catalog
+
+
+def reference_response(key: str) -> Response:
+    """Готовый ответ справочника с ETag и Cache-Control; 304, если If-None-Match совпал."""
+    body, etag = get_reference_catalog().payloads[key]
+    response = Response(body, mimetype=current_app.json.mimetype)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return response.make_conditional(request)
@@ -0,0 +1,254 @@
+"""
+Индекс интересов и ролей студентов в памяти процесса для рекомендаций.
+
+Интересы и роли каждого студента хранятся битовыми масками в int (бит = id интереса/роли),
+уровни навыков — словарями. Из индекса строятся матрицы признаков NumPy
+(services/team_matching.py), по которым ранжируются все режимы рекомендаций; сам индекс —
+источник данных для матриц, сигнатур кэша рекомендаций и подписей в ответах.
+
+Актуальность — через шину инвалидации (services/cache_bus.py), ключ "similarity_index":
+  - изменения анкеты (ORM-объекты StudentInterest/StudentRole/StudentSkill, профили, User.is_active,
+    а также mark_similarity_dirty из эндпоинтов с bulk DELETE) увеличивают версию ключа;
+  - процесс, сделавший запись, после commit обновляет в индексе только этих студентов;
+  - остальные процессы, увидев чужую версию, пересобирают индекс целиком (четыре запроса),
+    но не чаще SIMILARITY_INDEX_MIN_REBUILD_SECONDS (по умолчанию 10) — до этого отдают
+    предыдущий индекс.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from typing import Callable
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from ..extensions import db
+from ..models.student import StudentProfile
+from ..models.student_questionnaire import StudentInterest, StudentRole, StudentSkill
+from ..models.user import User
+from .cache_bus import bump_cache_version, cache_bus
+
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = "similarity_index"
+
+DEFAULT_MIN_REBUILD_SECONDS = 10
+
+_PENDING_INFO_KEY = "similarity_index_pending"
+
+
+def get_min_rebuild_seconds() -> float:
+    try:
+        return max(float(os.getenv("SIMILARITY_INDEX_MIN_REBUILD_SECONDS", DEFAULT_MIN_REBUILD_SECONDS)), 0.0)
+    except ValueError:
+        return float(DEFAULT_MIN_REBUILD_SECONDS)
+
+
+def ids_to_bits(ids) -> int:
+    bits = 0
+    for item_id in ids:
+        bits |= 1 << item_id
+    return bits
+
+
+def bits_to_ids(bits: int) -> list[int]:
+    """Номера установленных битов по возрастанию."""
+    ids = []
+    while bits:
+        lowest = bits & -bits
+        ids.append(lowest.bit_length() - 1)
+        bits ^= lowest
+    return ids
+
+
+@dataclass
+class SimilarityIndex:
+    """Снимок индекса. Не изменяется после публикации: обновление создаёт новый объект."""
+
+    version: int
+    built_at: float
+    # profile_id -> маска; студенты без интересов/ролей не хранятся
+    interests: dict[int, int] = field(default_factory=dict)
+    roles: dict[int, int] = field(default_factory=dict)
+    # profile_id -> {skill_id: level}
+    skills: dict[int, dict[int, int]] = field(default_factory=dict)
+    # profile_id -> User.is_active
+    active: dict[int, bool] = field(default_factory=dict)
+    profile_by_user: dict[int, int] = field(default_factory=dict)
+    # Для частичного обновления: (версия предыдущего индекса, изменённые profile_id)
+    changed: tuple[int, frozenset[int]] | None = None
+
+    def interest_bits(self, profile_id: int) -> int:
+        return self.interests.get(profile_id, 0)
+
+    def role_bits(self, profile_id: int) -> int:
+        return self.roles.get(profile_id, 0)
+
+    def is_active(self, profile_id: int) -> bool:
+        return self.active.get(profile_id, False)
+
+
+def _load(index: SimilarityIndex, profile_ids=None, user_ids=None) -> set[int] | None:
+    """
+    Загружает студентов в index (все или только указанных). Для частичной загрузки сначала
+    удаляет их старые данные — так учитываются удалённые профили и очищенные анкеты.
+    Возвращает затронутые profile_id (None — полная загрузка).
+    """
+    profiles_query = db.select(StudentProfile.id, StudentProfile.user_id, User.is_active).join(
+        User, User.id == StudentProfile.user_id
+    )
+    interests_query = db.select(StudentInterest.student_id, StudentInterest.interest_id)
+    roles_query = db.select(StudentRole.student_id, StudentRole.role_id)
+    skills_query = db.select(StudentSkill.student_id, StudentSkill.skill_id, StudentSkill.level)
+
+    if profile_ids is not None or user_ids is not None:
+        profile_ids = set(profile_ids or ())
+        user_ids = set(user_ids or ())
+        profile_ids |= {index.profile_by_user[uid] for uid in user_ids if uid in index.profile_by_user}
+        rows = db.session.execute(
+            profiles_query.where(
+                db.or_(StudentProfile.id.in_(profile_ids), StudentProfile.user_id.in_(user_ids))
+            )
+        ).all()
+        profile_ids |= {profile_id for profile_id, _, _ in rows}
+        for profile_id in profile_ids:
+            index.interests.pop(profile_id, None)
+            index.roles.pop(profile_id, None)
+            index.skills.pop(profile_id, None)
+            index.active.pop(profile_id, None)
+        for user_id in [uid for uid, pid in index.profile_by_user.items() if pid in profile_ids]:
+            del index.profile_by_user[user_id]
+        interests_query = interests_query.where(StudentInterest.student_id.in_(profile_ids))
+        roles_query = roles_query.where(StudentRole.student_id.in_(profile_ids))
+        skills_query = skills_query.where(StudentSkill.student_id.in_(profile_ids))
+    else:
+        rows = db.session.execute(profiles_query).all()
+
+    for profile_id, user_id, is_active in rows:
+        index.active[profile_id] = bool(is_active)
+        index.profile_by_user[user_id] = profile_id
+    for profile_id, interest_id in db.session.execute(interests_query):
+        index.interests[profile_id] = index.interests.get(profile_id, 0) | (1 << interest_id)
+    for profile_id, role_id in db.session.execute(roles_query):
+        index.roles[profile_id] = index.roles.get(profile_id, 0) | (1 << role_id)
+    for profile_id, skill_id, level in db.session.execute(skills_query):
+        index.skills.setdefault(profile_id, {})[skill_id] = level
+    return profile_ids
+
+
+_lock = threading.Lock()
+_index: SimilarityIndex | None = None
+_publish_listeners: list[Callable[[SimilarityIndex | None, SimilarityIndex], None]] = []
+# Версии ключа, созданные этим процессом: version -> (profile_ids, user_ids)
+_local_changes: dict[int, tuple[set[int], set[int]]] = {}
+
+
+def get_similarity_index() -> SimilarityIndex:
+    """Актуальный индекс (см. описание модуля). Нужен контекст приложения."""
+    global _index
+    version = cache_bus.current_version(CACHE_KEY)
+    index = _index
+    if index is not None and index.version >= version:
+        return index
+
+    with _lock:
+        index = _index
+        if index is not None and index.version >= version:
+            return index
+
+        if index is not None:
+            needed = range(index.version + 1, version + 1)
+            if all(v in _local_changes for v in needed):
+                profile_ids, user_ids = set(), set()
+                for v in needed:
+                    profile_ids |= _local_changes[v][0]
+                    user_ids |= _local_changes[v][1]
+                updated = replace(
+                    index,
+                    version=version,
+                    interests=dict(index.interests),
+                    roles=dict(index.roles),
+                    skills=dict(index.skills),
+                    active=dict(index.active),
+                    profile_by_user=dict(index.profile_by_user),
+                )
+                touched = _load(updated, profile_ids, user_ids)
+                updated.changed = (index.version, frozenset(touched))
+                _publish(updated, index)
+                return updated
+            if time.monotonic() - index.built_at < get_min_rebuild_seconds():
+                return index
+
+        rebuilt = SimilarityIndex(version=version, built_at=time.monotonic())
+        _load(rebuilt)
+        _publish(rebuilt, index)
+        return rebuilt
+
+
+def add_publish_listener(listener: Callable[[SimilarityIndex | None, SimilarityIndex], None]) -> None:
+    """
+    listener(previous, index) вызывается при каждой замене индекса (под блокировкой индекса).
+    index.changed is None — полная пересборка, изменения неизвестны.
+    """
+    _publish_listeners.append(listener)
+
+
+def _publish(index: SimilarityIndex, previous: SimilarityIndex | None) -> None:
+    global _index
+    _index = index
+    for v in [v for v in _local_changes if v <= index.version]:
+        del _local_changes[v]
+    for listener in _publish_listeners:
+        try:
+            listener(previous, index)
+        except Exception:
+            logger.exception("[similarity_index] Publish listener failed")
+
+
+def _record_changes(session, profile_ids: set[int], user_ids: set[int]) -> None:
+    version = bump_cache_version(CACHE_KEY, session)
+    session.info.setdefault(_PENDING_INFO_KEY, []).append((version, profile_ids, user_ids))
+
+
+def mark_similarity_dirty(profile_id: int, session=None) -> None:
+    """Для изменений анкеты мимо ORM-объектов (bulk DELETE): вызвать до commit."""
+    _record_changes(session or db.session, {profile_id}, set())
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    profile_ids, user_ids = set(), set()
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, (StudentInterest, StudentRole, StudentSkill)):
+            profile_ids.add(obj.student_id)
+        elif isinstance(obj, StudentProfile):
+            profile_ids.add(obj.id)
+    for obj in session.dirty:
+        if isinstance(obj, (StudentInterest, StudentRole, StudentSkill)) and session.is_modified(obj):
+            profile_ids.add(obj.student_id)
+        elif isinstance(obj, User) and inspect(obj).attrs.is_active.history.has_changes():
+            user_ids.add(obj.id)
+    if profile_ids or user_ids:
+        _record_changes(session, profile_ids, user_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_local_changes(session):
+    pending = session.info.pop(_PENDING_INFO_KEY, [])
+    # Пока индекс не построен, копить изменения незачем — его всё равно соберут целиком
+    if pending and _index is not None:
+        with _lock:
+            for version, profile_ids, user_ids in pending:
+                _local_changes[version] = (profile_ids, user_ids)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _drop_pending_changes(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(_PENDING_INFO_KEY, None)
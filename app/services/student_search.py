@@ -0,0 +1,121 @@
+"""
+Поиск студентов в админке по нормализованной строке student_profiles.search_text.
+
+search_text = email, имя, фамилия, отчество и группа в нижнем регистре с заменой «ё» на «е».
+Поддерживается обработчиком before_flush ниже (изменения профиля и email пользователя).
+Профиль создаётся лениво, поэтому у студента без профиля search_text нет — для таких строк
+(запрос с outerjoin User → StudentProfile) сравнивается lower(users.email).
+В Postgres по колонке строится GIN-индекс pg_trgm, поэтому LIKE '%…%' и префиксный поиск
+идут по индексу; в SQLite (локальный запуск) — тот же LIKE без индекса.
+
+Режимы:
+  - contains (по умолчанию): каждое слово запроса встречается в строке;
+  - prefix: каждое слово запроса — начало какого-либо слова строки (typeahead).
+"""
+
+from __future__ import annotations
+
+import re
+
+from sqlalchemy import and_, case, event, func, inspect, or_
+from sqlalchemy.orm import Session
+
+from ..models.student import StudentProfile
+from ..models.user import User
+
+
+SEARCH_MODES = ("contains", "prefix")
+
+_PROFILE_SEARCH_FIELDS = ("first_name", "last_name", "middle_name", "group_name", "user_id")
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_search_text(value: str | None) -> str:
+    """Нижний регистр, «ё» → «е», схлопнутые пробелы."""
+    if not value:
+        return ""
+    return _WHITESPACE_RE.sub(" ", value.lower().replace("ё", "е")).strip()
+
+
+def build_search_text(email: str | None, profile: StudentProfile) -> str:
+    parts = [email, profile.first_name, profile.last_name, profile.middle_name, profile.group_name]
+    return normalize_search_text(" ".join(part for part in parts if part))
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_terms(query: str) -> list[str]:
+    return [term for term in normalize_search_text(query).split(" ") if term]
+
+
+def _like_any(patterns: list[str]):
+    """search_text LIKE одного из шаблонов; без профиля — email LIKE."""
+    column = StudentProfile.search_text
+    email = func.lower(User.email)
+    return or_(
+        *(column.like(pattern, escape="\\") for pattern in patterns),
+        and_(column.is_(None), or_(*(email.like(pattern, escape="\\") for pattern in patterns))),
+    )
+
+
+def search_filter(query: str, mode: str = "contains"):
+    """Условие WHERE для строки поиска (None — пустой запрос)."""
+    terms = search_terms(query)
+    if not terms:
+        return None
+    clauses = []
+    for term in terms:
+        escaped = _escape_like(term)
+        if mode == "prefix":
+            clauses.append(_like_any([f"{escaped}%", f"% {escaped}%"]))
+        else:
+            clauses.append(_like_any([f"%{escaped}%"]))
+    return and_(*clauses)
+
+
+def search_rank_order(query: str, dialect_name: str) -> list:
+    """
+    ORDER BY по релевантности: сначала совпадение с началом строки, затем с началом слова,
+    затем остальное; в Postgres внутри группы — по similarity() из pg_trgm.
+    """
+    normalized = " ".join(search_terms(query))
+    escaped = _escape_like(normalized)
+    column = func.coalesce(StudentProfile.search_text, func.lower(User.email))
+    order = [
+        case(
+            (column.like(f"{escaped}%", escape="\\"), 0),
+            (column.like(f"% {escaped}%", escape="\\"), 1),
+            else_=2,
+        )
+    ]
+    if dialect_name == "postgresql":
+        order.append(func.similarity(column, normalized).desc())
+    return order
+
+
+def _profile_email(session, profile: StudentProfile) -> str | None:
+    if profile.user is not None:
+        return profile.user.email
+    if profile.user_id is not None:
+        user = session.get(User, profile.user_id)
+        return user.email if user else None
+    return None
+
+
+@event.listens_for(Session, "before_flush")
+def _update_search_text(session, flush_context, instances):
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, StudentProfile):
+            state = inspect(obj)
+            if obj in session.new or any(
+                state.attrs[name].history.has_changes() for name in _PROFILE_SEARCH_FIELDS
+            ):
+                obj.search_text = build_search_text(_profile_email(session, obj), obj)
+        elif isinstance(obj, User) and obj not in session.new:
+            if inspect(obj).attrs.email.history.has_changes():
+                profile = obj.student_profile
+                if profile is not None:
+                    profile.search_text = build_search_text(obj.email, profile)
@@ -0,0 +1,331 @@
+"""
+Автоматическое формирование команд (хакатоны): выбранные студенты делятся на команды,
+размеры которых отличаются не больше чем на одного, так чтобы в каждой команде были нужные
+роли и участники с похожими интересами.
+
+Оценка команды (каждая часть в [0, 1]):
+  - roles — доля покрытых обязательных ролей от min(размер команды, число обязательных ролей);
+  - interests — среднее по парам участников косинусное сходство интересов |A ∩ B| / √(|A|·|B|).
+score = weights["roles"] · roles + weights["interests"] · interests; итог разбиения — сумма
+по командам.
+
+Алгоритм:
+  1. Жадное распределение: первыми идут студенты с самыми редкими ролями, каждый — в ту
+     незаполненную команду, где прирост оценки больше (при равенстве — в менее заполненную);
+  2. Локальный поиск (local_search): обмены студентами между командами, пока обмен улучшает
+     оценку и не истекло TEAM_BUILDER_LOCAL_SEARCH_SECONDS (по умолчанию 0.5).
+Интересы хранятся нормированными строками матрицы, поэтому сумма сходств по парам команды —
+(‖S‖² − z) / 2, где S — сумма строк участников, z — число участников с интересами. Приросты
+считаются векторно: на шаге 1 — сразу для всех команд, на шаге 2 — для обмена студента со всеми
+остальными. Признаки студентов — из индекса services/similarity_index.py.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from ..extensions import db
+from ..models.student import StudentProfile
+from ..models.user import User
+from ..utils.constants import STUDENT_ROLES
+from .reference_catalog import get_reference_catalog
+from .similarity_index import bits_to_ids, get_similarity_index
+
+
+DEFAULT_TEAM_SIZE = 4
+MIN_TEAM_SIZE = 2
+MAX_TEAM_SIZE = 12
+# Роли, которые нужны каждой команде, если не указаны в запросе
+DEFAULT_REQUIRED_ROLES = STUDENT_ROLES[:4]
+DEFAULT_WEIGHTS = {"roles": 0.7, "interests": 0.3}
+
+DEFAULT_LOCAL_SEARCH_SECONDS = 0.5
+DEFAULT_MAX_STUDENTS = 5000
+
+# Обмен принимается, только если улучшает оценку больше погрешности вычислений
+_MIN_GAIN = 1e-9
+
+
+def get_local_search_seconds() -> float:
+    try:
+        return max(float(os.getenv("TEAM_BUILDER_LOCAL_SEARCH_SECONDS", DEFAULT_LOCAL_SEARCH_SECONDS)), 0.0)
+    except ValueError:
+        return DEFAULT_LOCAL_SEARCH_SECONDS
+
+
+def get_max_students() -> int:
+    try:
+        return int(os.getenv("TEAM_BUILDER_MAX_STUDENTS", str(DEFAULT_MAX_STUDENTS)))
+    except ValueError:
+        return DEFAULT_MAX_STUDENTS
+
+
+@dataclass
+class _Partition:
+    """Разбиение и суммы по командам, из которых считается оценка."""
+
+    interests: np.ndarray  # n × I, нормированные строки (нулевые — нет интересов)
+    has_interests: np.ndarray  # n, 0/1
+    roles: np.ndarray  # n × R, 0/1 по обязательным ролям
+    caps: np.ndarray  # T, размер каждой команды
+    weights: dict[str, float]
+    team: np.ndarray  # n, номер команды (−1 — ещё не распределён)
+    interest_sums: np.ndarray  # T × I
+    interest_counts: np.ndarray  # T
+    role_counts: np.ndarray  # T × R
+    sizes: np.ndarray  # T
+
+    @property
+    def role_norm(self) -> np.ndarray:
+        return np.maximum(np.minimum(self.caps, self.roles.shape[1]), 1).astype(np.float64)
+
+    @property
+    def pair_norm(self) -> np.ndarray:
+        return np.maximum(self.caps * (self.caps - 1) / 2, 1).astype(np.float64)
+
+    def coverage(self) -> np.ndarray:
+        return np.count_nonzero(self.role_counts, axis=1) / self.role_norm
+
+    def interest_overlap(self) -> np.ndarray:
+        squares = np.einsum("ij,ij->i", self.interest_sums, self.interest_sums)
+        return np.maximum(squares - self.interest_counts, 0) / 2 / self.pair_norm
+
+    def scores(self) -> np.ndarray:
+        return self.weights["roles"] * self.coverage() + self.weights["interests"] * self.interest_overlap()
+
+    def add(self, student: int, team: int) -> None:
+        self.team[student] = team
+        self.interest_sums[team] += self.interests[student]
+        self.interest_counts[team] += self.has_interests[student]
+        self.role_counts[team] += self.roles[student]
+        self.sizes[team] += 1
+
+    def remove(self, student: int) -> None:
+        team = self.team[student]
+        self.team[student] = -1
+        self.interest_sums[team] -= self.interests[student]
+        self.interest_counts[team] -= self.has_interests[student]
+        self.role_counts[team] -= self.roles[student]
+        self.sizes[team] -= 1
+
+
+def _team_caps(students: int, team_size: int) -> np.ndarray:
+    """Размеры команд: ceil(n / team_size) команд, размеры отличаются не больше чем на 1."""
+    teams = max(-(-students // team_size), 1)
+    base, extra = divmod(students, teams)
+    return np.array([base + 1] * extra + [base] * (teams - extra), dtype=np.int64)
+
+
+def _greedy(part: _Partition) -> None:
+    roles = part.roles.astype(bool)
+    frequency = part.roles.sum(axis=0)
+    rarity = np.where(roles, frequency, np.iinfo(np.int64).max).min(axis=1, initial=np.iinfo(np.int64).max)
+    order = np.lexsort((np.arange(len(roles)), -roles.sum(axis=1), rarity))
+
+    role_norm, pair_norm = part.role_norm, part.pair_norm
+    w_roles, w_interests = part.weights["roles"], part.weights["interests"]
+    for student in order:
+        gain = (
+            w_roles * ((part.role_counts == 0) & roles[student]).sum(axis=1) / role_norm
+            + w_interests * (part.interest_sums @ part.interests[student]) / pair_norm
+            - part.sizes * _MIN_GAIN
+        )
+        gain[part.sizes >= part.caps] = -np.inf
+        part.add(student, int(np.argmax(gain)))
+
+
+def _local_search(part: _Partition, deadline: float) -> tuple[int, int]:
+    """Обмены студентами между командами. Возвращает (число обменов, число проходов)."""
+    X, z, R = part.interests, part.has_interests, part.roles
+    role_norm, pair_norm = part.role_norm, part.pair_norm
+    w_roles, w_interests = part.weights["roles"], part.weights["interests"]
+    team_scores = part.scores()
+    swaps = passes = 0
+    improved = True
+    while improved and time.monotonic() < deadline:
+        improved = False
+        passes += 1
+        for a in range(len(X)):
+            if time.monotonic() >= deadline:
+                break
+            A, B = part.team[a], part.team
+            S = part.interest_sums
+            squares = np.einsum("ij,ij->i", S, S)
+            xa, za, ra = X[a], z[a], R[a]
+            cross = X @ xa  # xa·xb
+            own = np.einsum("ij,ij->i", X, S[B])  # xb·S_B
+
+            # Команда A: a уходит, b приходит; команда B (у каждого b своя) — наоборот
+            squares_a = squares[A] - 2 * (S[A] @ xa) + 2 * (X @ S[A]) + za + z - 2 * cross
+            overlap_a = np.maximum(squares_a - (part.interest_counts[A] - za + z), 0) / 2 / pair_norm[A]
+            squares_b = squares[B] - 2 * own + 2 * (S @ xa)[B] + za + z - 2 * cross
+            overlap_b = np.maximum(squares_b - (part.interest_counts[B] - z + za), 0) / 2 / pair_norm[B]
+            coverage_a = np.count_nonzero(part.role_counts[A] - ra + R, axis=1) / role_norm[A]
+            coverage_b = np.count_nonzero(part.role_counts[B] - R + ra, axis=1) / role_norm[B]
+
+            delta = (
+                w_roles * (coverage_a + coverage_b)
+                + w_interests * (overlap_a + overlap_b)
+                - team_scores[A]
+                - team_scores[B]
+            )
+            delta[B == A] = -np.inf
+            b = int(np.argmax(delta))
+            if delta[b] <= _MIN_GAIN:
+                continue
+            team_b = part.team[b]
+            part.remove(a)
+            part.remove(b)
+            part.add(a, team_b)
+            part.add(b, A)
+            team_scores = part.scores()
+            swaps += 1
+            improved = True
+    return swaps, passes
+
+
+def _resolve_required_roles(codes: list[str] | None, catalog) -> list[dict]:
+    by_code = {role["code"]: role for role in catalog.roles}
+    if codes is None:
+        required = [by_code[code] for code in DEFAULT_REQUIRED_ROLES if code in by_code]
+        return required or sorted(catalog.roles, key=lambda role: role["id"])
+    unknown = [code for code in codes if code not in by_code]
+    if unknown:
+        raise ValueError(f"unknown roles: {', '.join(unknown)}")
+    return [by_code[code] for code in dict.fromkeys(codes)]
+
+
+def _resolve_weights(weights: dict | None) -> dict[str, float]:
+    if weights is None:
+        return dict(DEFAULT_WEIGHTS)
+    if not isinstance(weights, dict) or set(weights) - set(DEFAULT_WEIGHTS):
+        raise ValueError(f"weights must be an object with keys: {', '.join(DEFAULT_WEIGHTS)}")
+    try:
+        resolved = {name: float(weights.get(name, 0)) for name in DEFAULT_WEIGHTS}
+    except (TypeError, ValueError):
+        raise ValueError("weights must be numbers")
+    if any(value < 0 for value in resolved.values()) or not any(resolved.values()):
+        raise ValueError("weights must be non-negative and not all zero")
+    return resolved
+
+
+def build_teams(
+    profile_ids: list[int],
+    team_size: int = DEFAULT_TEAM_SIZE,
+    required_roles: list[str] | None = None,
+    weights: dict | None = None,
+    local_search: bool = True,
+) -> dict:
+    """
+    Разбить студентов (profile_id активных студентов) на команды. ValueError — неверные
+    параметры. Неактивные и неизвестные profile_id пропускаются (skipped_student_ids).
+    """
+    if not MIN_TEAM_SIZE <= team_size <= MAX_TEAM_SIZE:
+        raise ValueError(f"team_size must be between {MIN_TEAM_SIZE} and {MAX_TEAM_SIZE}")
+    weights = _resolve_weights(weights)
+    catalog = get_reference_catalog()
+    required = _resolve_required_roles(required_roles, catalog)
+
+    started = time.monotonic()
+    index = get_similarity_index()
+    requested = sorted(set(profile_ids))
+    selected = [profile_id for profile_id in requested if index.is_active(profile_id)]
+    skipped = [profile_id for profile_id in requested if not index.is_active(profile_id)]
+    if not selected:
+        raise ValueError("no active students selected")
+    if len(selected) > get_max_students():
+        raise ValueError(f"too many students selected (max {get_max_students()})")
+
+    interest_ids = sorted({i for pid in selected for i in bits_to_ids(index.interest_bits(pid))})
+    interest_cols = {interest_id: col for col, interest_id in enumerate(interest_ids)}
+    interests = np.zeros((len(selected), len(interest_ids)), dtype=np.float64)
+    roles = np.zeros((len(selected), len(required)), dtype=np.int64)
+    role_bits = [1 << role["id"] for role in required]
+    for row, profile_id in enumerate(selected):
+        cols = [interest_cols[i] for i in bits_to_ids(index.interest_bits(profile_id))]
+        if cols:
+            interests[row, cols] = 1 / np.sqrt(len(cols))
+        my_roles = index.role_bits(profile_id)
+        roles[row] = [1 if my_roles & bit else 0 for bit in role_bits]
+
+    caps = _team_caps(len(selected), team_size)
+    part = _Partition(
+        interests=interests,
+        has_interests=np.count_nonzero(interests, axis=1).clip(max=1).astype(np.float64),
+        roles=roles,
+        caps=caps,
+        weights=weights,
+        team=np.full(len(selected), -1, dtype=np.int64),
+        interest_sums=np.zeros((len(caps), len(interest_ids)), dtype=np.float64),
+        interest_counts=np.zeros(len(caps), dtype=np.float64),
+        role_counts=np.zeros((len(caps), len(required)), dtype=np.int64),
+        sizes=np.zeros(len(caps), dtype=np.int64),
+    )
+    _greedy(part)
+    greedy_score = float(part.scores().sum())
+    swaps = passes = 0
+    if local_search and len(caps) > 1:
+        swaps, passes = _local_search(part, time.monotonic() + get_local_search_seconds())
+    elapsed = time.monotonic() - started
+
+    profiles = {
+        profile.id: (profile, user)
+        for profile, user in db.session.execute(
+            db.select(StudentProfile, User)
+            .join(User, StudentProfile.user_id == User.id)
+            .where(StudentProfile.id.in_(selected))
+        ).all()
+    }
+    coverage, overlap, scores = part.coverage(), part.interest_overlap(), part.scores()
+    teams = []
+    for number in range(len(caps)):
+        rows = np.flatnonzero(part.team == number)
+        members = []
+        for row in rows:
+            profile_id = selected[row]
+            if profile_id not in profiles:
+                continue
+            profile, user = profiles[profile_id]
+            members.append({
+                "student_id": profile.id,
+                "user_id": user.id,
+                "email": user.email,
+                "first_name": profile.first_name,
+                "last_name": profile.last_name,
+                "group_name": profile.group_name,
+                "roles": [
+                    dict(catalog.roles_by_id[role_id])
+                    for role_id in bits_to_ids(index.role_bits(profile_id))
+                    if role_id in catalog.roles_by_id
+                ],
+            })
+        covered = part.role_counts[number] > 0
+        teams.append({
+            "number": number + 1,
+            "members": members,
+            "covered_roles": [role["code"] for role, ok in zip(required, covered) if ok],
+            "missing_roles": [role["code"] for role, ok in zip(required, covered) if not ok],
+            "role_coverage": round(float(coverage[number]), 4),
+            "interest_overlap": round(float(overlap[number]), 4),
+            "score": round(float(scores[number]), 4),
+        })
+
+    return {
+        "teams": teams,
+        "skipped_student_ids": skipped,
+        "summary": {
+            "students": len(selected),
+            "teams": len(caps),
+            "team_size": team_size,
+            "required_roles": [role["code"] for role in required],
+            "weights": weights,
+            "score": round(float(scores.sum()), 4),
+            "greedy_score": round(greedy_score, 4),
+            "local_search": {"enabled": local_search, "swaps": swaps, "passes": passes},
+            "seconds": round(elapsed, 3),
+        },
+    }
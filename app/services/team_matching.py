@@ -0,0 +1,447 @@
+"""
+Командный режим рекомендаций (/students/me/recommendations?mode=team).
+
+Кандидат оценивается взвешенной суммой трёх сигналов, каждый в диапазоне [0, 1]:
+  - interests — сходство интересов, коэффициент Жаккара |A ∩ B| / |A ∪ B|;
+  - roles — доля ролей кандидата, которых нет у студента (1 — роли не пересекаются);
+  - skills — чем кандидат усиливает навыки студента с учётом уровня:
+    Σ max(0, уровень кандидата − уровень студента) / (5 · число навыков кандидата).
+
+Признаки всех активных студентов лежат в матрицах NumPy (uint8), построенных из индекса
+services/similarity_index.py. При частичном обновлении индекса (анкета изменена в этом
+процессе) в копии матриц переписываются только строки изменённых студентов; новые
+студенты или новые id интересов/ролей/навыков — полная пересборка. Оценка одного студента
+против всех — выборка нескольких столбцов (только его интересов/ролей/навыков) и сумма
+по строкам: max(0, c − m) = c − min(c, m), поэтому остальные столбцы не участвуют.
+
+Веса — именованные профили WEIGHT_PROFILES (параметр profile), по умолчанию
+TEAM_MATCH_PROFILE или "balanced"; TEAM_MATCH_WEIGHTS="interests=0.5,roles=0.3,skills=0.2"
+добавляет профиль "custom".
+
+Ранжированный список студента кэшируется (services/recommendation_cache.py) по ключу
+("team", profile_id, веса): при листании пересчёта нет.
+
+По тем же матрицам считаются и режимы interests/roles (rank_common_interests,
+rank_complementary_roles): число общих интересов / новых ролей — сумма выбранных столбцов,
+страница — top_rows.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+
+from ..extensions import db
+from ..models.student import StudentProfile
+from ..models.user import User
+from .recommendation_cache import get_ranked, register_kind
+from .reference_catalog import get_reference_catalog
+from .similarity_index import SimilarityIndex, bits_to_ids, get_similarity_index, ids_to_bits
+
+
+logger = logging.getLogger(__name__)
+
+MAX_SKILL_LEVEL = 5
+
+SIGNALS = ("interests", "roles", "skills")
+
+WEIGHT_PROFILES = {
+    "balanced": {"interests": 0.3, "roles": 0.4, "skills": 0.3},
+    "interests": {"interests": 0.6, "roles": 0.2, "skills": 0.2},
+    "skills": {"interests": 0.15, "roles": 0.35, "skills": 0.5},
+}
+DEFAULT_PROFILE = "balanced"
+
+
+def _custom_weights() -> dict[str, float] | None:
+    raw = os.getenv("TEAM_MATCH_WEIGHTS")
+    if not raw:
+        return None
+    weights = dict.fromkeys(SIGNALS, 0.0)
+    try:
+        for part in raw.split(","):
+            name, _, value = part.partition("=")
+            name = name.strip()
+            if name not in weights:
+                raise ValueError(name)
+            weights[name] = float(value)
+    except ValueError:
+        logger.warning("[team_matching] Invalid TEAM_MATCH_WEIGHTS=%r, ignored", raw)
+        return None
+    return weights
+
+
+def get_weight_profiles() -> dict[str, dict[str, float]]:
+    profiles = dict(WEIGHT_PROFILES)
+    custom = _custom_weights()
+    if custom is not None:
+        profiles["custom"] = custom
+    return profiles
+
+
+def get_weights(profile: str | None = None) -> tuple[str, dict[str, float]]:
+    """(имя профиля, веса). ValueError — неизвестный профиль."""
+    profiles = get_weight_profiles()
+    name = profile or os.getenv("TEAM_MATCH_PROFILE", DEFAULT_PROFILE)
+    if name not in profiles:
+        raise ValueError(f"profile must be one of: {', '.join(sorted(profiles))}")
+    return name, profiles[name]
+
+
+@dataclass
+class TeamFeatureMatrix:
+    """Признаки активных студентов: строка — студент (по возрастанию profile_id)."""
+
+    index: SimilarityIndex
+    profile_ids: np.ndarray
+    rows: dict[int, int]
+    interest_cols: dict[int, int]
+    role_cols: dict[int, int]
+    skill_cols: dict[int, int]
+    interests: np.ndarray  # N × I, 0/1
+    roles: np.ndarray  # N × R, 0/1
+    skills: np.ndarray  # N × S, уровень 0..5
+    # Суммы по строкам (_with_totals)
+    interest_counts: np.ndarray | None = None
+    role_counts: np.ndarray | None = None
+    skill_counts: np.ndarray | None = None
+    skill_level_sums: np.ndarray | None = None
+
+
+def _build_matrix(index: SimilarityIndex) -> TeamFeatureMatrix:
+    profile_ids = np.array(sorted(pid for pid, active in index.active.items() if active), dtype=np.int64)
+    rows = {int(pid): row for row, pid in enumerate(profile_ids)}
+
+    def fill(per_profile: dict, values_of):
+        # (строка, id, значение) для всех ячеек, затем одно векторное присваивание
+        cells = []
+        for profile_id, data in per_profile.items():
+            row = rows.get(profile_id)
+            if row is not None:
+                cells.extend((row, item_id, value) for item_id, value in values_of(data))
+        cols = {item_id: col for col, item_id in enumerate(sorted({item_id for _, item_id, _ in cells}))}
+        matrix = np.zeros((len(profile_ids), len(cols)), dtype=np.uint8)
+        if cells:
+            r, c, v = zip(*cells)
+            matrix[np.array(r), np.array([cols[item_id] for item_id in c])] = v
+        return matrix, cols
+
+    interests, interest_cols = fill(index.interests, _bit_cells)
+    roles, role_cols = fill(index.roles, _bit_cells)
+    skills, skill_cols = fill(index.skills, dict.items)
+    return _with_totals(TeamFeatureMatrix(
+        index=index,
+        profile_ids=profile_ids,
+        rows=rows,
+        interest_cols=interest_cols,
+        role_cols=role_cols,
+        skill_cols=skill_cols,
+        interests=interests,
+        roles=roles,
+        skills=skills,
+    ))
+
+
+def _bit_cells(bits: int):
+    return ((item_id, 1) for item_id in bits_to_ids(bits))
+
+
+def _with_totals(matrix: TeamFeatureMatrix) -> TeamFeatureMatrix:
+    matrix.interest_counts = matrix.interests.sum(axis=1, dtype=np.float64)
+    matrix.role_counts = matrix.roles.sum(axis=1, dtype=np.float64)
+    matrix.skill_counts = np.count_nonzero(matrix.skills, axis=1).astype(np.float64)
+    matrix.skill_level_sums = matrix.skills.sum(axis=1, dtype=np.float64)
+    return matrix
+
+
+def _patch_matrix(matrix: TeamFeatureMatrix, index: SimilarityIndex) -> TeamFeatureMatrix | None:
+    """
+    Матрица для index из матрицы предыдущего индекса: копия с переписанными строками
+    изменённых студентов. None — патч невозможен, нужна полная пересборка.
+    """
+    if index.changed is None or index.changed[0] != matrix.index.version:
+        return None
+    changed = index.changed[1]
+    for profile_id in changed:
+        if index.active.get(profile_id) and profile_id not in matrix.rows:
+            return None
+
+    patched = TeamFeatureMatrix(
+        index=index,
+        profile_ids=matrix.profile_ids,
+        rows=matrix.rows,
+        interest_cols=matrix.interest_cols,
+        role_cols=matrix.role_cols,
+        skill_cols=matrix.skill_cols,
+        interests=matrix.interests.copy(),
+        roles=matrix.roles.copy(),
+        skills=matrix.skills.copy(),
+    )
+    for profile_id in changed:
+        row = matrix.rows.get(profile_id)
+        if row is None:
+            continue
+        # Неактивный или удалённый студент остаётся пустой строкой — его оценка 0
+        active = index.active.get(profile_id, False)
+        for features, cols, cells in (
+            (patched.interests, patched.interest_cols, _bit_cells(index.interest_bits(profile_id))),
+            (patched.roles, patched.role_cols, _bit_cells(index.role_bits(profile_id))),
+            (patched.skills, patched.skill_cols, index.skills.get(profile_id, {}).items()),
+        ):
+            features[row] = 0
+            if not active:
+                continue
+            for item_id, value in cells:
+                if item_id not in cols:
+                    return None
+                features[row, cols[item_id]] = value
+    return _with_totals(patched)
+
+
+_lock = threading.Lock()
+_matrix: TeamFeatureMatrix | None = None
+
+
+def get_team_matrix() -> TeamFeatureMatrix:
+    """Матрица для текущего индекса (пересобирается, когда индекс обновился)."""
+    global _matrix
+    index = get_similarity_index()
+    matrix = _matrix
+    if matrix is not None and matrix.index is index:
+        return matrix
+    with _lock:
+        if _matrix is None or _matrix.index is not index:
+            patched = _patch_matrix(_matrix, index) if _matrix is not None else None
+            _matrix = patched if patched is not None else _build_matrix(index)
+        return _matrix
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    return np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator > 0)
+
+
+def score_candidates(matrix: TeamFeatureMatrix, profile_id: int, weights: dict[str, float]) -> dict[str, np.ndarray]:
+    """Оценки всех строк матрицы для студента: {"score", "interests", "roles", "skills"}."""
+    index = matrix.index
+    my_interests = bits_to_ids(index.interest_bits(profile_id))
+    my_roles = bits_to_ids(index.role_bits(profile_id))
+    my_skills = index.skills.get(profile_id, {})
+
+    def shared(features: np.ndarray, cols: dict[int, int], ids) -> np.ndarray:
+        selected = [cols[item_id] for item_id in ids if item_id in cols]
+        return features[:, selected].sum(axis=1, dtype=np.float64)
+
+    common = shared(matrix.interests, matrix.interest_cols, my_interests)
+    interests = _ratio(common, matrix.interest_counts + len(my_interests) - common)
+
+    roles = _ratio(matrix.role_counts - shared(matrix.roles, matrix.role_cols, my_roles), matrix.role_counts)
+
+    skill_ids = [skill_id for skill_id in my_skills if skill_id in matrix.skill_cols]
+    covered = np.zeros(len(matrix.profile_ids), dtype=np.float64)
+    if skill_ids:
+        cols = [matrix.skill_cols[skill_id] for skill_id in skill_ids]
+        my_levels = np.array([my_skills[skill_id] for skill_id in skill_ids], dtype=np.uint8)
+        covered = np.minimum(matrix.skills[:, cols], my_levels).sum(axis=1, dtype=np.float64)
+    skills = _ratio(matrix.skill_level_sums - covered, matrix.skill_counts * MAX_SKILL_LEVEL)
+
+    # Округление: равные по смыслу оценки не должны различаться в последнем знаке,
+    # иначе порядок «по id при равенстве» зависел бы от погрешности
+    score = np.round(
+        weights["interests"] * interests + weights["roles"] * roles + weights["skills"] * skills,
+        9,
+    )
+    row = matrix.rows.get(profile_id)
+    if row is not None:
+        score[row] = 0
+    return {"score": score, "interests": interests, "roles": roles, "skills": skills}
+
+
+def top_rows(score: np.ndarray, profile_ids: np.ndarray, offset: int, limit: int) -> tuple[int, np.ndarray]:
+    """
+    (число кандидатов с score > 0, строки страницы) по убыванию score, затем по profile_id.
+    argpartition отбирает offset + limit лучших без полной сортировки; строки, равные
+    по score границе отбора, берутся все — чтобы порядок по id был детерминированным.
+    """
+    candidates = np.flatnonzero(score > 0)
+    total = len(candidates)
+    wanted = offset + limit
+    if wanted <= 0 or offset >= total:
+        return total, candidates[:0]
+    if wanted < total:
+        part = candidates[np.argpartition(-score[candidates], wanted - 1)[:wanted]]
+        threshold = score[part].min()
+        candidates = candidates[score[candidates] >= threshold]
+    order = np.lexsort((profile_ids[candidates], -score[candidates]))
+    return total, candidates[order][offset:wanted]
+
+
+def _shared_counts(features: np.ndarray, cols: dict[int, int], ids) -> np.ndarray:
+    selected = [cols[item_id] for item_id in ids if item_id in cols]
+    return features[:, selected].sum(axis=1, dtype=np.int64)
+
+
+def _rank_counts(
+    matrix: TeamFeatureMatrix,
+    profile_id: int,
+    counts: np.ndarray,
+    inactive_matches: int,
+    offset: int,
+    limit: int,
+) -> tuple[int, list[tuple[int, int]]]:
+    row = matrix.rows.get(profile_id)
+    if row is not None:
+        counts[row] = 0
+    total, page_rows = top_rows(counts, matrix.profile_ids, offset, limit)
+    # total — как COUNT в SQL-пути: с неактивными студентами (их нет в матрице)
+    return total + inactive_matches, [
+        (int(matrix.profile_ids[row]), int(counts[row])) for row in page_rows
+    ]
+
+
+def _inactive_matches(index: SimilarityIndex, profile_id: int, count_of) -> int:
+    return sum(
+        1
+        for other_id, active in index.active.items()
+        if not active and other_id != profile_id and count_of(other_id)
+    )
+
+
+def rank_common_interests(
+    matrix: TeamFeatureMatrix, profile_id: int, interest_ids, offset: int, limit: int
+) -> tuple[int, list[tuple[int, int]]]:
+    """
+    Режим interests: (total, [(profile_id, число общих интересов с interest_ids)]) —
+    страница активных студентов по убыванию совпадений, затем по id.
+    """
+    index = matrix.index
+    mask = ids_to_bits(interest_ids)
+    counts = _shared_counts(matrix.interests, matrix.interest_cols, interest_ids)
+    inactive = _inactive_matches(index, profile_id, lambda pid: index.interest_bits(pid) & mask)
+    return _rank_counts(matrix, profile_id, counts, inactive, offset, limit)
+
+
+def rank_complementary_roles(
+    matrix: TeamFeatureMatrix, profile_id: int, role_ids, offset: int, limit: int
+) -> tuple[int, list[tuple[int, int]]]:
+    """Режим roles: то же по числу ролей кандидата, которых нет в role_ids."""
+    index = matrix.index
+    mask = ids_to_bits(role_ids)
+    counts = matrix.roles.sum(axis=1, dtype=np.int64) - _shared_counts(
+        matrix.roles, matrix.role_cols, role_ids
+    )
+    inactive = _inactive_matches(index, profile_id, lambda pid: index.role_bits(pid) & ~mask)
+    return _rank_counts(matrix, profile_id, counts, inactive, offset, limit)
+
+
+def _candidate_signature(index: SimilarityIndex, key: tuple, profile_id: int):
+    return (
+        index.interest_bits(profile_id),
+        index.role_bits(profile_id),
+        tuple(sorted(index.skills.get(profile_id, {}).items())),
+    )
+
+
+register_kind("team", _candidate_signature)
+
+
+def rank_candidates(
+    matrix: TeamFeatureMatrix, profile_id: int, weights: dict[str, float], offset: int, limit: int
+) -> tuple[int, list[tuple]]:
+    """(total, [(profile_id, score, interests, roles, skills)]) — страница без профилей."""
+    scores = score_candidates(matrix, profile_id, weights)
+    total, page_rows = top_rows(scores["score"], matrix.profile_ids, offset, limit)
+    return total, [
+        (int(matrix.profile_ids[row]), *(float(scores[name][row]) for name in ("score",) + SIGNALS))
+        for row in page_rows
+    ]
+
+
+def get_team_recommendations(
+    student_id: int, page: int = 1, per_page: int = 20, weight_profile: str | None = None
+) -> dict:
+    """Страница командных рекомендаций. ValueError — неизвестный профиль весов."""
+    profile_name, weights = get_weights(weight_profile)
+    matrix = get_team_matrix()
+    total, ranked = get_ranked(
+        matrix.index,
+        ("team", student_id, tuple(sorted(weights.items()))),
+        lambda offset, limit: rank_candidates(matrix, student_id, weights, offset, limit),
+        (page - 1) * per_page,
+        per_page,
+    )
+
+    page_ids = [profile_id for profile_id, *_ in ranked]
+    profiles = {}
+    if page_ids:
+        profiles = {
+            profile.id: (profile, user)
+            for profile, user in db.session.execute(
+                db.select(StudentProfile, User)
+                .join(User, StudentProfile.user_id == User.id)
+                .where(StudentProfile.id.in_(page_ids))
+            ).all()
+        }
+
+    index = matrix.index
+    catalog = get_reference_catalog()
+    my_interest_bits = index.interest_bits(student_id)
+    my_role_bits = index.role_bits(student_id)
+    my_skills = index.skills.get(student_id, {})
+
+    items = []
+    for profile_id, score, *signal_scores in ranked:
+        if profile_id not in profiles:
+            continue
+        profile, user = profiles[profile_id]
+        skills = index.skills.get(profile_id, {})
+        items.append({
+            "student_id": profile.id,
+            "user_id": user.id,
+            "email": user.email,
+            "first_name": profile.first_name,
+            "last_name": profile.last_name,
+            "group_name": profile.group_name,
+            "score": round(score, 4),
+            "scores": {signal: round(value, 4) for signal, value in zip(SIGNALS, signal_scores)},
+            "common_interests": [
+                catalog.interest_names[interest_id]
+                for interest_id in bits_to_ids(index.interest_bits(profile_id) & my_interest_bits)
+                if interest_id in catalog.interest_names
+            ],
+            "new_roles": [
+                dict(catalog.roles_by_id[role_id])
+                for role_id in bits_to_ids(index.role_bits(profile_id) & ~my_role_bits)
+                if role_id in catalog.roles_by_id
+            ],
+            "stronger_skills": [
+                {
+                    "id": skill_id,
+                    "name": catalog.skill_names[skill_id],
+                    "level": level,
+                    "my_level": my_skills.get(skill_id, 0),
+                }
+                for skill_id, level in sorted(skills.items())
+                if level > my_skills.get(skill_id, 0) and skill_id in catalog.skill_names
+            ],
+            "match_type": "team",
+        })
+
+    total_pages = (total + per_page - 1) // per_page if total > 0 else 0
+    return {
+        "mode": "team",
+        "profile": profile_name,
+        "weights": weights,
+        "recommendations": items,
+        "pagination": {
+            "page": page,
+            "per_page": per_page,
+            "total": total,
+            "pages": total_pages,
+            "has_next": page < total_pages,
+            "has_prev": page > 1,
+        },
+    }
@@ -0,0 +1,153 @@
+import base64
+import json
+from datetime import date, datetime
+
+from sqlalchemy import Column, Date, DateTime, and_, false, literal, or_, tuple_
+from sqlalchemy.sql.functions import FunctionElement
+
+
+def encode_cursor(values: dict) -> str:
+    """Непрозрачный курсор keyset-пагинации: urlsafe base64 от JSON."""
+    raw = json.dumps(values, separators=(",", ":"), sort_keys=True).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    """Обратное к encode_cursor. ValueError — если курсор повреждён."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError) as exc:
+        raise ValueError("invalid cursor") from exc
+    if not isinstance(values, dict):
+        raise ValueError("invalid cursor")
+    return values
+
+
+# ---------- keyset-пагинация ----------
+#
+# Ключ сортировки — список (name, column, direction), последний элемент — уникальный id.
+# NULL считается наибольшим значением: asc → NULLS LAST, desc → NULLS FIRST
+# (как по умолчанию в Postgres), поэтому keyset_order_by и keyset_predicate согласованы.
+# Если все колонки ключа NOT NULL и сортируются в одну сторону, условие курсора —
+# сравнение кортежей (a, b) < (:a, :b): Postgres использует его как границу
+# диапазона по составному индексу. Иначе — развёрнутое OR из AND по колонкам.
+
+
+def _keys_signature(keys) -> str:
+    return ",".join(f"{name}:{direction}" for name, _, direction in keys)
+
+
+def _is_not_null(column) -> bool:
+    """Колонка (или coalesce с NOT NULL аргументом) гарантированно не NULL."""
+    expression = getattr(column, "expression", column)
+    if isinstance(expression, Column):
+        return not expression.nullable
+    if isinstance(expression, FunctionElement) and expression.name == "coalesce":
+        return any(_is_not_null(argument) for argument in expression.clauses)
+    return False
+
+
+def keyset_order_by(keys) -> list:
+    order_by = []
+    for _, column, direction in keys:
+        if _is_not_null(column):
+            order_by.append(column.asc() if direction == "asc" else column.desc())
+        elif direction == "asc":
+            order_by.append(column.asc().nullslast())
+        else:
+            order_by.append(column.desc().nullsfirst())
+    return order_by
+
+
+def _after(column, direction, value):
+    """Строго «после» значения value в порядке direction (NULL — наибольшее)."""
+    if direction == "asc":
+        if value is None:
+            return false()
+        if _is_not_null(column):
+            return column > literal(value, column.type)
+        return or_(column > literal(value, column.type), column.is_(None))
+    if value is None:
+        return column.isnot(None)
+    return column < literal(value, column.type)
+
+
+def _equal(column, value):
+    return column.is_(None) if value is None else column == literal(value, column.type)
+
+
+def keyset_predicate(keys, values):
+    """Условие «строка идёт после курсора» для ORDER BY keyset_order_by(keys)."""
+    directions = {direction for _, _, direction in keys}
+    if (
+        len(keys) > 1
+        and len(directions) == 1
+        and all(_is_not_null(column) for _, column, _ in keys)
+        and all(value is not None for value in values)
+    ):
+        columns = tuple_(*(column for _, column, _ in keys))
+        bounds = tuple_(*(literal(value, column.type) for (_, column, _), value in zip(keys, values)))
+        return columns > bounds if directions == {"asc"} else columns < bounds
+
+    clauses = []
+    for i, (_, column, direction) in enumerate(keys):
+        prefix = [_equal(keys[j][1], values[j]) for j in range(i)]
+        clauses.append(and_(*prefix, _after(column, direction, values[i])))
+    return or_(*clauses)
+
+
+def _dump_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _load_value(column, value):
+    if value is None:
+        return None
+    if isinstance(column.type, DateTime):
+        return datetime.fromisoformat(value)
+    if isinstance(column.type, Date):
+        return date.fromisoformat(value)
+    return value
+
+
+def encode_keyset_cursor(keys, values, **extra) -> str:
+    """Курсор «после этой строки»; extra — дополнительные поля (например, смещение для rank)."""
+    return encode_cursor(
+        {"k": _keys_signature(keys), "v": [_dump_value(v) for v in values], **extra}
+    )
+
+
+def decode_keyset_cursor(keys, cursor: str) -> tuple[list, dict]:
+    """Возвращает (values, extra). ValueError — если курсор повреждён или от другой сортировки."""
+    payload = decode_cursor(cursor)
+    values = payload.pop("v", None)
+    if payload.pop("k", None) != _keys_signature(keys) or not isinstance(values, list):
+        raise ValueError("invalid cursor")
+    if len(values) != len(keys):
+        raise ValueError("invalid cursor")
+    try:
+        loaded = [_load_value(column, v) for (_, column, _), v in zip(keys, values)]
+    except (TypeError, ValueError) as exc:
+        raise ValueError("invalid cursor") from exc
+    return loaded, payload
+
+
+def apply_keyset(query, keys, values=None):
+    """ORDER BY по ключу и, если задан курсор, условие «после курсора». Работает и с select(), и с Query."""
+    query = query.order_by(*keyset_order_by(keys))
+    if values is not None:
+        query = query.where(keyset_predicate(keys, values))
+    return query
+
+
+def keyset_pagination(per_page: int, next_after: str | None, total: int | None = None) -> dict:
+    """Блок pagination ответа в режиме курсора. total — только если запрошен include_total."""
+    return {
+        "per_page": per_page,
+        "has_next": next_after is not None,
+        "next_after": next_after,
+        "total": total,
+    }
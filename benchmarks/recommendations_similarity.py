@@ -0,0 +1,217 @@
+"""
+Сравнение подсчёта рекомендаций: SQL (GROUP BY по student_interests/student_roles)
+и матрицы признаков в памяти (индекс app/services/similarity_index.py → NumPy-матрицы
+app/services/team_matching.py), а также замер командного режима
+(app/services/team_matching.py, цель — < 50 мс на 50k студентов). Страницы индексного пути
+замеряются дважды: первый запрос строит список в кэше рекомендаций
+(app/services/recommendation_cache.py), повторный — срез из кэша.
+
+Запуск (по умолчанию — временная SQLite-база, таблицы создаются через create_all):
+    python benchmarks/recommendations_similarity.py --students 10000 50000 100000
+
+Postgres — только на отдельной пустой базе с применёнными миграциями:
+    python benchmarks/recommendations_similarity.py --database-url postgresql://.../bench
+
+Скрипт заполняет базу синтетическими студентами, поэтому непустую базу не трогает.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--interests", type=int, default=60, help="размер справочника интересов")
+    parser.add_argument("--roles", type=int, default=12, help="размер справочника ролей")
+    parser.add_argument("--skills", type=int, default=150, help="размер справочника навыков")
+    parser.add_argument("--max-interests", type=int, default=6, help="интересов у студента, не больше")
+    parser.add_argument("--max-roles", type=int, default=3, help="ролей у студента, не больше")
+    parser.add_argument("--max-skills", type=int, default=8, help="навыков у студента, не больше")
+    parser.add_argument("--queries", type=int, default=30, help="замеров на каждый путь")
+    parser.add_argument("--per-page", type=int, default=20)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args()
+
+
+def _timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return (time.perf_counter() - started) * 1000, result
+
+
+def _fill(db, models, args, total: int, start: int) -> None:
+    """Добавляет студентов start..total-1 пачками через Core INSERT."""
+    rnd = random.Random(args.seed + start)
+    interest_ids = [row[0] for row in db.session.execute(db.select(models.Interest.id))]
+    role_ids = [row[0] for row in db.session.execute(db.select(models.Role.id))]
+    skill_ids = [row[0] for row in db.session.execute(db.select(models.Skill.id))]
+    batch = 5_000
+    for offset in range(start, total, batch):
+        ids = range(offset + 1, min(offset + batch, total) + 1)
+        db.session.execute(
+            db.insert(models.User),
+            [
+                {"id": i, "email": f"bench{i}@example.com", "password_hash": "-", "role": "student",
+                 "is_active": i % 50 != 0}
+                for i in ids
+            ],
+        )
+        db.session.execute(
+            db.insert(models.StudentProfile),
+            [{"id": i, "user_id": i, "first_name": f"Student{i}"} for i in ids],
+        )
+        db.session.execute(
+            db.insert(models.StudentInterest),
+            [
+                {"student_id": i, "interest_id": interest_id}
+                for i in ids
+                for interest_id in rnd.sample(interest_ids, rnd.randint(0, args.max_interests))
+            ],
+        )
+        db.session.execute(
+            db.insert(models.StudentRole),
+            [
+                {"student_id": i, "role_id": role_id}
+                for i in ids
+                for role_id in rnd.sample(role_ids, rnd.randint(0, args.max_roles))
+            ],
+        )
+        db.session.execute(
+            db.insert(models.StudentSkill),
+            [
+                {"student_id": i, "skill_id": skill_id, "level": rnd.randint(1, 5)}
+                for i in ids
+                for skill_id in rnd.sample(skill_ids, rnd.randint(0, args.max_skills))
+            ],
+        )
+        db.session.commit()
+
+
+def _report(label: str, samples: list[float]) -> None:
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"  {label:<32} median {statistics.median(samples):8.2f} ms   p95 {p95:8.2f} ms")
+
+
+def main() -> None:
+    args = _parse_args()
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        path = os.path.join(tempfile.mkdtemp(prefix="reco-bench-"), "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    from app import create_app, models
+    from app.extensions import db
+    from app.services import recommendations_service, similarity_index, team_matching
+
+    app = create_app(with_scheduler=False)
+    with app.app_context():
+        if not args.database_url:
+            db.create_all()
+        if db.session.execute(db.select(db.func.count(models.User.id))).scalar():
+            sys.exit("database is not empty — use a dedicated database for the benchmark")
+
+        db.session.add_all(models.Interest(name=f"interest-{i}") for i in range(args.interests))
+        db.session.add_all(models.Role(code=f"role-{i}", name=f"Role {i}") for i in range(args.roles))
+        category = models.SkillCategory(name="bench")
+        db.session.add(category)
+        db.session.flush()
+        db.session.add_all(
+            models.Skill(name=f"skill-{i}", category_id=category.id) for i in range(args.skills)
+        )
+        db.session.commit()
+
+        print(f"database: {db.engine.url.render_as_string(hide_password=True)}")
+        filled = 0
+        for total in sorted(args.students):
+            _fill(db, models, args, total, filled)
+            filled = total
+
+            rnd = random.Random(args.seed)
+            sample = [rnd.randint(1, total) for _ in range(args.queries)]
+            current = {
+                student_id: (
+                    db.session.execute(
+                        db.select(models.StudentInterest.interest_id)
+                        .where(models.StudentInterest.student_id == student_id)
+                    ).scalars().all(),
+                    db.session.execute(
+                        db.select(models.StudentRole.role_id)
+                        .where(models.StudentRole.student_id == student_id)
+                    ).scalars().all(),
+                )
+                for student_id in sample
+            }
+
+            print(f"\nstudents: {total}")
+            # Данные залиты Core INSERT мимо ORM-событий — индекс строим заново
+            similarity_index._index = None
+            build_ms, index = _timed(similarity_index.get_similarity_index)
+            print(f"  {'index build':<32} {build_ms:8.2f} ms")
+            build_ms, matrix = _timed(team_matching.get_team_matrix)
+            print(f"  {'matrix build':<32} {build_ms:8.2f} ms")
+
+            paths = (
+                (
+                    "interests",
+                    recommendations_service._get_recommendations_by_interests,
+                    recommendations_service._get_recommendations_by_interests_indexed,
+                    team_matching.rank_common_interests,
+                ),
+                (
+                    "roles",
+                    recommendations_service._get_recommendations_by_roles,
+                    recommendations_service._get_recommendations_by_roles_indexed,
+                    team_matching.rank_complementary_roles,
+                ),
+            )
+            for position, (label, sql_func, indexed_func, score_func) in enumerate(paths):
+                sql_samples, indexed_samples, cached_samples, score_samples = [], [], [], []
+                for student_id in sample:
+                    ids = current[student_id][position]
+                    if not ids:
+                        continue
+                    sql_samples.append(_timed(sql_func, student_id, ids, 1, args.per_page)[0])
+                    indexed_samples.append(_timed(indexed_func, student_id, ids, 1, args.per_page)[0])
+                    cached_samples.append(_timed(indexed_func, student_id, ids, 2, args.per_page)[0])
+                    score_samples.append(_timed(score_func, matrix, student_id, ids, 0, args.per_page)[0])
+                    db.session.rollback()
+                if sql_samples:
+                    _report(f"{label}: SQL page", sql_samples)
+                    _report(f"{label}: index page", indexed_samples)
+                    _report(f"{label}: index page, cached", cached_samples)
+                    _report(f"{label}: index scoring only", score_samples)
+
+            _, weights = team_matching.get_weights()
+            page_samples, cached_samples, score_samples = [], [], []
+            for student_id in sample:
+                page_samples.append(
+                    _timed(team_matching.get_team_recommendations, student_id, 1, args.per_page)[0]
+                )
+                cached_samples.append(
+                    _timed(team_matching.get_team_recommendations, student_id, 2, args.per_page)[0]
+                )
+                score_samples.append(_timed(
+                    lambda: team_matching.top_rows(
+                        team_matching.score_candidates(matrix, student_id, weights)["score"],
+                        matrix.profile_ids, 0, args.per_page,
+                    )
+                )[0])
+                db.session.rollback()
+            _report("team: page", page_samples)
+            _report("team: page, cached", cached_samples)
+            _report("team: scoring + top-k only", score_samples)
+
+
+if __name__ == "__main__":
+    main()
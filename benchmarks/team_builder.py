@@ -0,0 +1,118 @@
+"""
+Замер формирования команд (app/services/team_builder.py, цель — < 1 с на 1000 студентов):
+жадное распределение отдельно и вместе с локальным поиском.
+
+Запуск (по умолчанию — временная SQLite-база, таблицы создаются через create_all):
+    python benchmarks/team_builder.py --students 1000 5000 --team-size 4
+
+Postgres — только на отдельной пустой базе с применёнными миграциями:
+    python benchmarks/team_builder.py --database-url postgresql://.../bench
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, nargs="+", default=[1_000, 5_000])
+    parser.add_argument("--team-size", type=int, default=4)
+    parser.add_argument("--interests", type=int, default=60, help="размер справочника интересов")
+    parser.add_argument("--max-interests", type=int, default=6, help="интересов у студента, не больше")
+    parser.add_argument("--max-roles", type=int, default=2, help="ролей у студента, не больше")
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args()
+
+
+def _fill(db, models, args, total: int, start: int) -> None:
+    """Добавляет студентов start..total-1 через Core INSERT; роли — с перекосом, как в жизни."""
+    rnd = random.Random(args.seed + start)
+    interest_ids = [row[0] for row in db.session.execute(db.select(models.Interest.id))]
+    role_ids = [row[0] for row in db.session.execute(db.select(models.Role.id).order_by(models.Role.id))]
+    role_weights = [len(role_ids) - position for position in range(len(role_ids))]
+    ids = range(start + 1, total + 1)
+    db.session.execute(
+        db.insert(models.User),
+        [{"id": i, "email": f"bench{i}@example.com", "password_hash": "-", "role": "student"} for i in ids],
+    )
+    db.session.execute(
+        db.insert(models.StudentProfile),
+        [{"id": i, "user_id": i, "first_name": f"Student{i}", "group_name": "bench"} for i in ids],
+    )
+    db.session.execute(
+        db.insert(models.StudentInterest),
+        [
+            {"student_id": i, "interest_id": interest_id}
+            for i in ids
+            for interest_id in rnd.sample(interest_ids, rnd.randint(0, args.max_interests))
+        ],
+    )
+    db.session.execute(
+        db.insert(models.StudentRole),
+        [
+            {"student_id": i, "role_id": role_id}
+            for i in ids
+            for role_id in set(rnd.choices(role_ids, role_weights, k=rnd.randint(0, args.max_roles)))
+        ],
+    )
+    db.session.commit()
+
+
+def main() -> None:
+    args = _parse_args()
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        path = os.path.join(tempfile.mkdtemp(prefix="teams-bench-"), "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    from app import create_app, models
+    from app.extensions import db
+    from app.services import similarity_index, team_builder
+    from app.utils.constants import STUDENT_ROLES
+
+    app = create_app(with_scheduler=False)
+    with app.app_context():
+        if not args.database_url:
+            db.create_all()
+        if db.session.execute(db.select(db.func.count(models.User.id))).scalar():
+            sys.exit("database is not empty — use a dedicated database for the benchmark")
+
+        db.session.add_all(models.Interest(name=f"interest-{i}") for i in range(args.interests))
+        db.session.add_all(models.Role(code=code, name=code) for code in STUDENT_ROLES)
+        db.session.commit()
+
+        print(f"database: {db.engine.url.render_as_string(hide_password=True)}")
+        filled = 0
+        for total in sorted(args.students):
+            _fill(db, models, args, total, filled)
+            filled = total
+            # Данные залиты Core INSERT мимо ORM-событий — индекс строим заново
+            similarity_index._index = None
+            similarity_index.get_similarity_index()
+
+            print(f"\nstudents: {total}")
+            profile_ids = list(range(1, total + 1))
+            for label, local_search in (("greedy", False), ("greedy + local search", True)):
+                started = time.perf_counter()
+                result = team_builder.build_teams(profile_ids, args.team_size, local_search=local_search)
+                elapsed = (time.perf_counter() - started) * 1000
+                summary = result["summary"]
+                coverage = sum(team["role_coverage"] for team in result["teams"]) / summary["teams"]
+                overlap = sum(team["interest_overlap"] for team in result["teams"]) / summary["teams"]
+                print(
+                    f"  {label:<24} {elapsed:8.1f} ms   score {summary['score']:9.2f}"
+                    f"   roles {coverage:.3f}   interests {overlap:.3f}"
+                    f"   swaps {summary['local_search']['swaps']}"
+                )
+
+
+if __name__ == "__main__":
+    main()
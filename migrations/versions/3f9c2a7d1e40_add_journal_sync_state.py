@@ -0,0 +1,30 @@
+"""add journal_sync_state table
+
+Revision ID: 3f9c2a7d1e40
+Revises: a8f1b7c2d901
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "3f9c2a7d1e40"
+down_revision = "a8f1b7c2d901"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "journal_sync_state",
+        sa.Column("name", sa.String(length=64), primary_key=True),
+        sa.Column("issued_watermark", sa.DateTime(), nullable=True),
+        sa.Column("version_watermark", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table("journal_sync_state")
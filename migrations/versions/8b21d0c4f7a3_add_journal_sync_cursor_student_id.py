@@ -0,0 +1,26 @@
+"""add cursor_student_id to journal_sync_state
+
+Revision ID: 8b21d0c4f7a3
+Revises: 3f9c2a7d1e40
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "8b21d0c4f7a3"
+down_revision = "3f9c2a7d1e40"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("journal_sync_state") as batch_op:
+        batch_op.add_column(sa.Column("cursor_student_id", sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("journal_sync_state") as batch_op:
+        batch_op.drop_column("cursor_student_id")
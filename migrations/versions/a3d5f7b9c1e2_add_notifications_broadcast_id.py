@@ -0,0 +1,41 @@
+"""add notifications.broadcast_id
+
+Revision ID: a3d5f7b9c1e2
+Revises: e8a3c6f1d2b7
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "a3d5f7b9c1e2"
+down_revision = "e8a3c6f1d2b7"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("notifications") as batch_op:
+        batch_op.add_column(sa.Column("broadcast_id", sa.Integer(), nullable=True))
+        batch_op.create_foreign_key(
+            "fk_notifications_broadcast_id",
+            "broadcast_notifications",
+            ["broadcast_id"],
+            ["id"],
+            ondelete="SET NULL",
+        )
+    op.create_index(
+        "uq_notifications_user_broadcast",
+        "notifications",
+        ["user_id", "broadcast_id"],
+        unique=True,
+    )
+
+
+def downgrade():
+    op.drop_index("uq_notifications_user_broadcast", table_name="notifications")
+    with op.batch_alter_table("notifications") as batch_op:
+        batch_op.drop_constraint("fk_notifications_broadcast_id", type_="foreignkey")
+        batch_op.drop_column("broadcast_id")
@@ -0,0 +1,35 @@
+"""add unique tiebreaker to journal sync watermark
+
+Revision ID: a7c9e1b3d5f8
+Revises: f6b8d0e2a4c7
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "a7c9e1b3d5f8"
+down_revision = "f6b8d0e2a4c7"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Водяной знак (Issued, Version) дополняется (MarkSet.Id, EducationTaskId) до уникального
+    # ключа. Нули сохраняют прежнюю границу: оценки с тем же Issued и Version придут ещё раз
+    # и отсеются дедупликацией по journal_processed_marks
+    with op.batch_alter_table("journal_sync_state") as batch_op:
+        batch_op.add_column(
+            sa.Column("mark_set_watermark", sa.Integer(), nullable=False, server_default="0")
+        )
+        batch_op.add_column(
+            sa.Column("education_task_watermark", sa.Integer(), nullable=False, server_default="0")
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("journal_sync_state") as batch_op:
+        batch_op.drop_column("education_task_watermark")
+        batch_op.drop_column("mark_set_watermark")
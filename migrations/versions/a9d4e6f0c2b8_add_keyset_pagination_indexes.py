@@ -0,0 +1,47 @@
+"""add composite indexes for keyset pagination
+
+Revision ID: a9d4e6f0c2b8
+Revises: f1a6d9e2b3c4
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "a9d4e6f0c2b8"
+down_revision = "f1a6d9e2b3c4"
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ("ix_notifications_user_created_id", "notifications", ["user_id", "created_at", "id"]),
+    (
+        "ix_point_transactions_student_created_id",
+        "point_transactions",
+        ["student_id", "created_at", "id"],
+    ),
+    ("ix_forum_topics_pinned_created_id", "forum_topics", ["is_pinned", "created_at", "id"]),
+    (
+        "ix_student_profiles_rating_total",
+        "student_profiles",
+        ["total_points", "first_name", "id"],
+    ),
+    (
+        "ix_student_profiles_rating_month",
+        "student_profiles",
+        ["current_month_points", "first_name", "id"],
+    ),
+    ("ix_users_role_created_id", "users", ["role", "created_at", "id"]),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,54 @@
+"""add leaderboard snapshot tables
+
+Revision ID: b2f8e4a6d1c3
+Revises: a9d4e6f0c2b8
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "b2f8e4a6d1c3"
+down_revision = "a9d4e6f0c2b8"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "leaderboard_entries",
+        sa.Column("board", sa.String(length=16), nullable=False),
+        sa.Column("rank", sa.Integer(), nullable=False),
+        sa.Column("student_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("email", sa.String(length=255), nullable=True),
+        sa.Column("first_name", sa.String(length=120), nullable=True),
+        sa.Column("last_name", sa.String(length=120), nullable=True),
+        sa.Column("group_name", sa.String(length=120), nullable=True),
+        sa.Column("total_points", sa.Integer(), nullable=False),
+        sa.Column("total_som", sa.Integer(), nullable=False),
+        sa.Column("current_month_points", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("board", "rank"),
+        sa.UniqueConstraint("board", "student_id", name="uq_leaderboard_entries_board_student"),
+    )
+
+    op.create_table(
+        "leaderboard_state",
+        sa.Column("board", sa.String(length=16), primary_key=True),
+        sa.Column("is_stale", sa.Boolean(), nullable=False, server_default=sa.true()),
+        sa.Column("entries_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("refreshed_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+    # Снимки строятся при первом чтении рейтинга
+    op.execute(
+        "INSERT INTO leaderboard_state (board, is_stale, entries_count, updated_at) VALUES "
+        "('total', TRUE, 0, CURRENT_TIMESTAMP), ('month', TRUE, 0, CURRENT_TIMESTAMP)"
+    )
+
+
+def downgrade():
+    op.drop_table("leaderboard_state")
+    op.drop_table("leaderboard_entries")
@@ -0,0 +1,52 @@
+"""add broadcast notifications
+
+Revision ID: c4e7a1b9d2f5
+Revises: 8b21d0c4f7a3
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "c4e7a1b9d2f5"
+down_revision = "8b21d0c4f7a3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "broadcast_notifications",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("audience_role", sa.String(length=50), nullable=False),
+        sa.Column("exclude_user_id", sa.Integer(), nullable=True),
+        sa.Column("type", sa.String(length=64), nullable=False),
+        sa.Column("title", sa.String(length=255), nullable=False),
+        sa.Column("body", sa.Text(), nullable=True),
+        sa.Column("payload", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["exclude_user_id"], ["users.id"], ondelete="SET NULL"),
+    )
+    op.create_index(
+        "ix_broadcast_notifications_audience_role",
+        "broadcast_notifications",
+        ["audience_role"],
+    )
+
+    op.create_table(
+        "notification_broadcast_cursors",
+        sa.Column("user_id", sa.Integer(), primary_key=True),
+        sa.Column("last_broadcast_id", sa.Integer(), nullable=False, server_default="0"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+    )
+
+
+def downgrade():
+    op.drop_table("notification_broadcast_cursors")
+    op.drop_index(
+        "ix_broadcast_notifications_audience_role",
+        table_name="broadcast_notifications",
+    )
+    op.drop_table("broadcast_notifications")
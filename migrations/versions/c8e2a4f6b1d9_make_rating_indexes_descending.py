@@ -0,0 +1,36 @@
+"""make student rating indexes descending by points
+
+Revision ID: c8e2a4f6b1d9
+Revises: a3d5f7b9c1e2
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "c8e2a4f6b1d9"
+down_revision = "a3d5f7b9c1e2"
+branch_labels = None
+depends_on = None
+
+
+# Рейтинг и /students/me/rank сортируют по (баллы DESC, first_name ASC NULLS LAST, id ASC):
+# смешанное направление индекс (баллы, first_name, id) по возрастанию отдать не может
+INDEXES = [
+    ("ix_student_profiles_rating_total", "total_points"),
+    ("ix_student_profiles_rating_month", "current_month_points"),
+]
+
+
+def upgrade():
+    for name, points in INDEXES:
+        op.drop_index(name, table_name="student_profiles")
+        op.create_index(name, "student_profiles", [sa.text(f"{points} DESC"), "first_name", "id"])
+
+
+def downgrade():
+    for name, points in INDEXES:
+        op.drop_index(name, table_name="student_profiles")
+        op.create_index(name, "student_profiles", [points, "first_name", "id"])
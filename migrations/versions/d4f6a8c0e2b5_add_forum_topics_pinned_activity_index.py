@@ -0,0 +1,31 @@
+"""add (is_pinned, activity, id) index to forum_topics
+
+Revision ID: d4f6a8c0e2b5
+Revises: c8e2a4f6b1d9
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "d4f6a8c0e2b5"
+down_revision = "c8e2a4f6b1d9"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Список тем с sort=activity и pinned_first (по умолчанию) сортирует по
+    # is_pinned DESC, coalesce(last_message_at, created_at) DESC, id DESC —
+    # ix_forum_topics_activity без is_pinned такой порядок не отдаёт
+    op.create_index(
+        "ix_forum_topics_pinned_activity_id",
+        "forum_topics",
+        ["is_pinned", sa.text("coalesce(last_message_at, created_at)"), "id"],
+    )
+
+
+def downgrade():
+    op.drop_index("ix_forum_topics_pinned_activity_id", table_name="forum_topics")
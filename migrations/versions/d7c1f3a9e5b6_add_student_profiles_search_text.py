@@ -0,0 +1,68 @@
+"""add search_text to student_profiles with trigram index
+
+Revision ID: d7c1f3a9e5b6
+Revises: b2f8e4a6d1c3
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "d7c1f3a9e5b6"
+down_revision = "b2f8e4a6d1c3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("student_profiles") as batch_op:
+        batch_op.add_column(sa.Column("search_text", sa.Text(), nullable=True))
+
+    # Бэкфилл — та же нормализация, что в services/student_search.build_search_text:
+    # непустые части через пробел, нижний регистр, «ё» → «е», схлопнутые пробелы
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.execute(
+            """
+            UPDATE student_profiles AS p SET search_text = btrim(regexp_replace(
+                replace(lower(concat_ws(' ',
+                    nullif(u.email, ''), nullif(p.first_name, ''), nullif(p.last_name, ''),
+                    nullif(p.middle_name, ''), nullif(p.group_name, '')
+                )), 'ё', 'е'),
+                '\\s+', ' ', 'g'
+            ))
+            FROM users AS u
+            WHERE u.id = p.user_id
+            """
+        )
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.create_index(
+            "ix_student_profiles_search_text_trgm",
+            "student_profiles",
+            ["search_text"],
+            postgresql_using="gin",
+            postgresql_ops={"search_text": "gin_trgm_ops"},
+        )
+    else:
+        # lower() в SQLite не знает кириллицу — считаем в Python
+        rows = bind.execute(
+            sa.text(
+                "SELECT p.id, u.email, p.first_name, p.last_name, p.middle_name, p.group_name "
+                "FROM student_profiles p JOIN users u ON u.id = p.user_id"
+            )
+        ).all()
+        for profile_id, *parts in rows:
+            text = " ".join(" ".join(part for part in parts if part).lower().replace("ё", "е").split())
+            bind.execute(
+                sa.text("UPDATE student_profiles SET search_text = :text WHERE id = :id"),
+                {"text": text, "id": profile_id},
+            )
+        op.create_index("ix_student_profiles_search_text_trgm", "student_profiles", ["search_text"])
+
+
+def downgrade():
+    op.drop_index("ix_student_profiles_search_text_trgm", table_name="student_profiles")
+    with op.batch_alter_table("student_profiles") as batch_op:
+        batch_op.drop_column("search_text")
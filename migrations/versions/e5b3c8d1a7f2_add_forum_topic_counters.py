@@ -0,0 +1,63 @@
+"""add denormalized message counters to forum_topics
+
+Revision ID: e5b3c8d1a7f2
+Revises: c4e7a1b9d2f5
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "e5b3c8d1a7f2"
+down_revision = "c4e7a1b9d2f5"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("forum_topics") as batch_op:
+        batch_op.add_column(
+            sa.Column("messages_count", sa.Integer(), nullable=False, server_default="0")
+        )
+        batch_op.add_column(sa.Column("last_message_at", sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column("last_message_id", sa.Integer(), nullable=True))
+
+    op.create_index(
+        "ix_forum_messages_topic_id_created_at",
+        "forum_messages",
+        ["topic_id", "created_at"],
+    )
+    op.create_index(
+        "ix_forum_topics_activity",
+        "forum_topics",
+        [sa.text("coalesce(last_message_at, created_at)")],
+    )
+
+    # Бэкфилл по существующим сообщениям
+    op.execute(
+        """
+        UPDATE forum_topics SET
+            messages_count = (
+                SELECT count(*) FROM forum_messages m WHERE m.topic_id = forum_topics.id
+            ),
+            last_message_id = (
+                SELECT m.id FROM forum_messages m WHERE m.topic_id = forum_topics.id
+                ORDER BY m.created_at DESC, m.id DESC LIMIT 1
+            ),
+            last_message_at = (
+                SELECT m.created_at FROM forum_messages m WHERE m.topic_id = forum_topics.id
+                ORDER BY m.created_at DESC, m.id DESC LIMIT 1
+            )
+        """
+    )
+
+
+def downgrade():
+    op.drop_index("ix_forum_topics_activity", table_name="forum_topics")
+    op.drop_index("ix_forum_messages_topic_id_created_at", table_name="forum_messages")
+    with op.batch_alter_table("forum_topics") as batch_op:
+        batch_op.drop_column("last_message_id")
+        batch_op.drop_column("last_message_at")
+        batch_op.drop_column("messages_count")
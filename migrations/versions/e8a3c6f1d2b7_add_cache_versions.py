@@ -0,0 +1,29 @@
+"""add cache_versions table
+
+Revision ID: e8a3c6f1d2b7
+Revises: d7c1f3a9e5b6
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "e8a3c6f1d2b7"
+down_revision = "d7c1f3a9e5b6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "cache_versions",
+        sa.Column("key", sa.String(length=100), primary_key=True),
+        sa.Column("version", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table("cache_versions")
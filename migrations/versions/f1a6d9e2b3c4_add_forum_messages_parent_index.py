@@ -0,0 +1,27 @@
+"""add parent_id index to forum_messages
+
+Revision ID: f1a6d9e2b3c4
+Revises: e5b3c8d1a7f2
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "f1a6d9e2b3c4"
+down_revision = "e5b3c8d1a7f2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_forum_messages_parent_id_created_at",
+        "forum_messages",
+        ["parent_id", "created_at"],
+    )
+
+
+def downgrade():
+    op.drop_index("ix_forum_messages_parent_id_created_at", table_name="forum_messages")
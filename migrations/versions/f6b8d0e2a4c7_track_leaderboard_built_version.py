@@ -0,0 +1,33 @@
+"""track leaderboard snapshot freshness by change version
+
+Revision ID: f6b8d0e2a4c7
+Revises: d4f6a8c0e2b5
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "f6b8d0e2a4c7"
+down_revision = "d4f6a8c0e2b5"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Флаг is_stale заменён версией ключа "leaderboard" в cache_versions, с которой построен
+    # снимок: пишущие транзакции больше не обновляют строки leaderboard_state.
+    # NULL — снимок пересоберётся при первом чтении.
+    with op.batch_alter_table("leaderboard_state") as batch_op:
+        batch_op.add_column(sa.Column("built_version", sa.BigInteger(), nullable=True))
+        batch_op.drop_column("is_stale")
+
+
+def downgrade():
+    with op.batch_alter_table("leaderboard_state") as batch_op:
+        batch_op.add_column(
+            sa.Column("is_stale", sa.Boolean(), nullable=False, server_default=sa.true())
+        )
+        batch_op.drop_column("built_version")
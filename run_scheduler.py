@@ -0,0 +1,14 @@
+"""
+Отдельный процесс планировщика фоновых задач.
+
+Запуск: python run_scheduler.py
+Веб-воркеры при этом стартуют с SCHEDULER_ENABLED=false.
+"""
+
+from app import create_app
+from app.scheduler import init_scheduler
+
+app = create_app(with_scheduler=False)
+
+if __name__ == "__main__":
+    init_scheduler(app, blocking=True)
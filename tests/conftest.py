@@ -0,0 +1,40 @@
+import os
+import tempfile
+
+import pytest
+
+
+@pytest.fixture()
+def app():
+    """Приложение на временной SQLite-базе (таблицы — через create_all), без планировщика."""
+    path = os.path.join(tempfile.mkdtemp(prefix="app-tests-"), "test.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    from app import create_app
+    from app.extensions import db
+
+    app = create_app(with_scheduler=False)
+    app.config["TESTING"] = True
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture()
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture()
+def admin_headers(app):
+    from flask_jwt_extended import create_access_token
+
+    from app.extensions import db
+    from app.models import User
+
+    admin = User(email="admin@example.com", role="admin", is_active=True, password_hash="-")
+    db.session.add(admin)
+    db.session.commit()
+    return {"Authorization": f"Bearer {create_access_token(identity=str(admin.id))}"}
@@ -0,0 +1,80 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app.extensions import db
+from app.models import (
+    Interest,
+    Role,
+    Skill,
+    SkillCategory,
+    StudentInterest,
+    StudentProfile,
+    StudentRole,
+    StudentSkill,
+    User,
+)
+
+
+# Запросы на страницу списка: пользователь-админ, COUNT(*) и сама страница со счётчиками анкеты
+STUDENT_LIST_QUERIES = 3
+
+
+@contextmanager
+def count_queries():
+    counter = {"count": 0}
+
+    def before_cursor_execute(*args):
+        counter["count"] += 1
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+
+def _create_students(count: int) -> None:
+    category = SkillCategory(name="Разработка")
+    db.session.add(category)
+    db.session.flush()
+    skills = [Skill(name=f"skill-{i}", category_id=category.id) for i in range(3)]
+    interests = [Interest(name=f"interest-{i}") for i in range(3)]
+    roles = [Role(code=f"role-{i}", name=f"Роль {i}") for i in range(3)]
+    db.session.add_all(skills + interests + roles)
+    db.session.flush()
+
+    for i in range(count):
+        user = User(email=f"student{i}@example.com", role="student", is_active=True, password_hash="-")
+        db.session.add(user)
+        db.session.flush()
+        profile = StudentProfile(user_id=user.id, first_name=f"Имя{i}", last_name=f"Фамилия{i}")
+        db.session.add(profile)
+        db.session.flush()
+        db.session.add_all(
+            [StudentSkill(student_id=profile.id, skill_id=skill.id, level=3) for skill in skills[: i % 3 + 1]]
+            + [StudentInterest(student_id=profile.id, interest_id=interest.id) for interest in interests[: i % 2 + 1]]
+            + [StudentRole(student_id=profile.id, role_id=role.id) for role in roles[:1]]
+        )
+    db.session.commit()
+
+
+def test_student_list_query_count_does_not_depend_on_page_size(client, admin_headers):
+    _create_students(120)
+
+    for per_page in (10, 100):
+        db.session.expire_all()
+        with count_queries() as queries:
+            response = client.get(f"/api/v1/admins/students?per_page={per_page}", headers=admin_headers)
+
+        assert response.status_code == 200
+        students = response.json["students"]
+        assert len(students) == per_page
+        assert queries["count"] == STUDENT_LIST_QUERIES, f"per_page={per_page}"
+
+    # Счётчики анкеты пришли из того же запроса, что и страница
+    for student in students:
+        i = int(student["email"].removeprefix("student").split("@")[0])
+        assert student["skills_count"] == i % 3 + 1
+        assert student["interests_count"] == i % 2 + 1
+        assert student["roles_count"] == 1